@@ -11,6 +11,7 @@ from .main.controller import (
     auth_ns,
     database_ns,
     encryption_ns,
+    job_ns,
     password_ns,
     sql_log_ns,
     user_ns,
@@ -38,6 +39,7 @@ api.add_namespace(encryption_ns, path="/encryption")
 api.add_namespace(anonymization_ns, path="/anonymization")
 api.add_namespace(sql_log_ns, path="/sql_log")
 api.add_namespace(agent_ns, path="/agent")
+api.add_namespace(job_ns, path="/job")
 
 api.add_namespace(DefaultResponsesDTO.api)
 api.add_namespace(TableDTO.api)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -30,6 +31,50 @@ class Config:
     # Batch selection size
     BATCH_SELECTION_SIZE = 100
 
+    # Cell encryption mode of cloud databases ("rsa" or "envelope")
+    CELL_ENCRYPTION_MODE = "envelope"
+
+    # Max number of parsed keys kept in memory
+    KEYS_CACHE_SIZE = 128
+
+    # Table encryption pipeline
+    ENCRYPTION_BATCH_SIZE = 1000
+    ENCRYPTION_WORKERS = os.cpu_count() or 1
+    ENCRYPTION_QUEUE_SIZE = 2 * ENCRYPTION_WORKERS
+
+    # Cells of new cloud tables as base64 text ("text") or bytes ("binary")
+    CLOUD_STORAGE_FORMAT = "text"
+
+    # Generator of cpf, rg, e-mail and name anonymizers ("faker" or "keyed")
+    ANONYMIZATION_GENERATOR = "faker"
+    ANONYMIZATION_GENERATOR_KEY = os.getenv("ANONYMIZATION_GENERATOR_KEY")
+
+    # Directory of lookup tables built by anonymizers
+    ANONYMIZATION_CACHE_DIR = os.getenv(
+        "ANONYMIZATION_CACHE_DIR", os.path.join(tempfile.gettempdir(), "syspad")
+    )
+
+    # Parallel table anonymization: default workers of each client database,
+    # primary key ranges of each worker and how ranges are split ("min_max"
+    # or "quantiles")
+    ANONYMIZATION_WORKERS = 1
+    ANONYMIZATION_RANGES_PER_WORKER = 4
+    ANONYMIZATION_RANGE_SPLIT = "min_max"
+
+    # Rows of anonymization previews, by default and at most
+    ANONYMIZATION_PREVIEW_SIZE = 10
+    ANONYMIZATION_PREVIEW_MAX_SIZE = 100
+
+    # Rows partitioned together and processes of k-anonymity anonymizer
+    ANONYPY_PARTITION_SIZE = 10000
+    ANONYPY_WORKERS = os.cpu_count() or 1
+
+    # Max number of ip prefixes kept in memory by each CryptoPAn key
+    CRYPTOPAN_CACHE_SIZE = 65536
+
+    # Number of background jobs running at the same time
+    JOB_WORKERS = 2
+
 
 class DevelopmentConfig(Config):
     mysql_local_base = os.getenv("DATABASE_URL")
@@ -6,6 +6,7 @@ from .anonymization_type_controller import *
 from .auth_controller import *
 from .database_controller import *
 from .encryption_controller import *
+from .job_controller import *
 from .sql_log_controller import *
 from .table_controller import *
 from .user_controller import *
@@ -1,26 +1,36 @@
 from flask import request
 from flask_restx import Resource
 
+from app.main.config import Config
 from app.main.model import User
 from app.main.service import (
+    SAMPLE_TYPE_OPTIONS,
     anonymization_database_rows,
     anonymization_table,
+    enqueue_job,
     get_anonymization_progress,
     get_remove_anonymization_progress,
+    preview_table_anonymization,
     remove_table_anonymizaiton,
     token_required,
 )
-from app.main.util import AnonymizationDTO, DefaultResponsesDTO
+from app.main.util import AnonymizationDTO, DefaultResponsesDTO, JobDTO
 
 anonymization_ns = AnonymizationDTO.api
 api = anonymization_ns
 
 _anonymization_database_rows = AnonymizationDTO.anonymization_database_rows
 _anonymization_progress = AnonymizationDTO.anonymization_progress
+_anonymization_preview = AnonymizationDTO.anonymization_preview
+
+_job_created_response = JobDTO.job_created_response
 
 _default_message_response = DefaultResponsesDTO.message_response
 _validation_error_response = DefaultResponsesDTO.validation_error
 
+_ANONYMIZATION_PREVIEW_SIZE = Config.ANONYMIZATION_PREVIEW_SIZE
+_ANONYMIZATION_PREVIEW_MAX_SIZE = Config.ANONYMIZATION_PREVIEW_MAX_SIZE
+
 
 @api.route("/database/<int:database_id>/table/<int:table_id>/database_rows")
 class DatabaseRowsAnonymization(Resource):
@@ -50,45 +60,102 @@ class DatabaseRowsAnonymization(Resource):
 @api.route("/database/<int:database_id>/table/<int:table_id>")
 class DatabaseTableAnonymization(Resource):
     @api.doc("Anonymize database table")
-    @api.response(200, "table_anonymized", _default_message_response)
-    @api.response(400, "Input payload validation failed", _validation_error_response)
+    @api.response(202, "job_created", _job_created_response)
     @api.response(401, "token_not_found\ntoken_invalid", _default_message_response)
     @api.response(404, "database_not_found\ntable_not_found", _default_message_response)
-    @api.response(409, "database_not_conected", _default_message_response)
-    @api.response(500, "table_not_anonymized", _default_message_response)
+    @api.response(
+        409, "database_not_conected\njob_already_running", _default_message_response
+    )
     @token_required()
     def post(
         self, database_id: int, table_id: int, current_user: User
-    ) -> tuple[dict[str, str], int]:
-        """Anonymize database table"""
-        anonymization_table(
+    ) -> tuple[dict[str, any], int]:
+        """Anonymize database table on a background job"""
+        job = enqueue_job(
+            operation="anonymize_table",
+            function=anonymization_table,
             database_id=database_id,
             table_id=table_id,
             current_user=current_user,
         )
-        return {"message": "table_anonymized"}, 200
+        return {"message": "job_created", "job_id": job.id}, 202
+
+
+@api.route("/database/<int:database_id>/table/<int:table_id>/preview")
+class DatabaseTableAnonymizationPreview(Resource):
+    @api.doc(
+        "Preview database table anonymization",
+        params={
+            "sample_type": {
+                "description": "Random rows or rows in primary key order",
+                "default": SAMPLE_TYPE_OPTIONS[0],
+                "enum": SAMPLE_TYPE_OPTIONS,
+                "type": str,
+            },
+            "sample_size": {
+                "description": f"Rows of sample, at most {_ANONYMIZATION_PREVIEW_MAX_SIZE}",
+                "default": _ANONYMIZATION_PREVIEW_SIZE,
+                "type": int,
+            },
+            "after": {
+                "description": "Primary key the keyset sample starts after",
+                "type": str,
+            },
+        },
+    )
+    @api.marshal_with(
+        _anonymization_preview, code=200, description="anonymization_preview_info"
+    )
+    @api.response(400, "Input payload validation failed", _validation_error_response)
+    @api.response(
+        401,
+        "token_not_found\ntoken_invalid\nunauthorized_user",
+        _default_message_response,
+    )
+    @api.response(
+        404,
+        "database_not_found\ntable_not_found\nanonymization_record_not_found",
+        _default_message_response,
+    )
+    @api.response(
+        409, "database_not_conected\noutdated_table", _default_message_response
+    )
+    @api.response(500, "table_anonymization_not_previewed", _default_message_response)
+    @token_required()
+    def get(
+        self, database_id: int, table_id: int, current_user: User
+    ) -> tuple[dict[str, any], int]:
+        """Anonymize a sample of database table in memory, without writing it"""
+        return preview_table_anonymization(
+            database_id=database_id,
+            table_id=table_id,
+            params=request.args,
+            current_user=current_user,
+        )
 
 
 @api.route("/remove/database/<int:database_id>/table/<int:table_id>")
 class RemoveTableAnonymization(Resource):
     @api.doc("Remove table anonymization")
-    @api.response(200, "anonymization_removed", _default_message_response)
-    @api.response(400, "Input payload validation failed", _validation_error_response)
+    @api.response(202, "job_created", _job_created_response)
     @api.response(401, "token_not_found\ntoken_invalid", _default_message_response)
     @api.response(404, "database_not_found\ntable_not_found", _default_message_response)
-    @api.response(409, "database_not_conected", _default_message_response)
-    @api.response(500, "anonymization_not_removed", _default_message_response)
+    @api.response(
+        409, "database_not_conected\njob_already_running", _default_message_response
+    )
     @token_required()
     def post(
         self, database_id: int, table_id: int, current_user: User
-    ) -> tuple[dict[str, str], int]:
-        """Remove table anonymization"""
-        remove_table_anonymizaiton(
+    ) -> tuple[dict[str, any], int]:
+        """Remove table anonymization on a background job"""
+        job = enqueue_job(
+            operation="remove_anonymization",
+            function=remove_table_anonymizaiton,
             database_id=database_id,
             table_id=table_id,
             current_user=current_user,
         )
-        return {"message": "anonymization_removed"}, 200
+        return {"message": "job_created", "job_id": job.id}, 202
 
 
 @api.route("/database/<int:database_id>/table/<int:table_id>/progress")
@@ -1,15 +1,22 @@
+from functools import partial
+
 from flask import request
 from flask_restx import Resource
 
-from app.main.model import User
+from app.main.model import STORAGE_FORMAT_OPTIONS, User
 from app.main.service import (
     decrypt_row,
+    decrypt_rows,
     encrypt_database_row,
     encrypt_database_table,
+    enqueue_job,
     get_encryption_progress,
+    get_storage_format,
+    incremental_encrypt_database_table,
+    resume_encrypt_database_table,
     token_required,
 )
-from app.main.util import DefaultResponsesDTO, EncryptionDTO
+from app.main.util import DefaultResponsesDTO, EncryptionDTO, JobDTO
 
 encryption_ns = EncryptionDTO.api
 api = encryption_ns
@@ -17,6 +24,9 @@ api = encryption_ns
 _encryption_database_rows = EncryptionDTO.encryption_database_rows
 _encryption_progress = EncryptionDTO.encryption_progress
 _encryption_decrypt_row = EncryptionDTO.encryption_decrypt_row
+_encryption_decrypt_rows = EncryptionDTO.encryption_decrypt_rows
+
+_job_created_response = JobDTO.job_created_response
 
 _default_message_response = DefaultResponsesDTO.message_response
 _validation_error_response = DefaultResponsesDTO.validation_error
@@ -53,8 +63,17 @@ class DatabaseRowsEncryption(Resource):
 
 @api.route("/database/<int:database_id>/table/<int:table_id>")
 class DatabaseTableEncryption(Resource):
-    @api.doc("Encrypt database table")
-    @api.response(200, "table_encrypted", _default_message_response)
+    @api.doc(
+        "Encrypt database table",
+        params={
+            "storage_format": {
+                "description": "Storage format of encrypted cells on cloud table",
+                "enum": STORAGE_FORMAT_OPTIONS,
+                "type": str,
+            },
+        },
+    )
+    @api.response(202, "job_created", _job_created_response)
     @api.response(400, "Input payload validation failed", _validation_error_response)
     @api.response(
         401,
@@ -62,19 +81,81 @@ class DatabaseTableEncryption(Resource):
         _default_message_response,
     )
     @api.response(404, "database_not_found\ntable_not_found", _default_message_response)
-    @api.response(409, "database_not_conected", _default_message_response)
-    @api.response(500, "table_not_encrypted", _default_message_response)
+    @api.response(
+        409, "database_not_conected\njob_already_running", _default_message_response
+    )
     @token_required()
     def post(
         self, database_id: int, table_id: int, current_user: User
-    ) -> tuple[dict[str, str], int]:
-        """Encrypt database table"""
-        encrypt_database_table(
+    ) -> tuple[dict[str, any], int]:
+        """Encrypt database table on a background job"""
+        storage_format = get_storage_format(params=request.args)
+        job = enqueue_job(
+            operation="encrypt_table",
+            function=partial(encrypt_database_table, storage_format=storage_format),
             database_id=database_id,
             table_id=table_id,
             current_user=current_user,
         )
-        return {"message": "table_encrypted"}, 200
+        return {"message": "job_created", "job_id": job.id}, 202
+
+
+@api.route("/database/<int:database_id>/table/<int:table_id>/resume")
+class ResumeDatabaseTableEncryption(Resource):
+    @api.doc("Resume database table encryption")
+    @api.response(202, "job_created", _job_created_response)
+    @api.response(
+        401,
+        "token_not_found\ntoken_invalid\nunauthorized_user",
+        _default_message_response,
+    )
+    @api.response(404, "database_not_found\ntable_not_found", _default_message_response)
+    @api.response(
+        409,
+        "database_not_conected\njob_already_running",
+        _default_message_response,
+    )
+    @token_required()
+    def post(
+        self, database_id: int, table_id: int, current_user: User
+    ) -> tuple[dict[str, any], int]:
+        """Resume database table encryption from last checkpoint on a background job"""
+        job = enqueue_job(
+            operation="resume_encrypt_table",
+            function=resume_encrypt_database_table,
+            database_id=database_id,
+            table_id=table_id,
+            current_user=current_user,
+        )
+        return {"message": "job_created", "job_id": job.id}, 202
+
+
+@api.route("/database/<int:database_id>/table/<int:table_id>/incremental")
+class IncrementalDatabaseTableEncryption(Resource):
+    @api.doc("Encrypt new and changed rows of database table")
+    @api.response(202, "job_created", _job_created_response)
+    @api.response(
+        401,
+        "token_not_found\ntoken_invalid\nunauthorized_user",
+        _default_message_response,
+    )
+    @api.response(404, "database_not_found\ntable_not_found", _default_message_response)
+    @api.response(
+        409, "database_not_conected\njob_already_running", _default_message_response
+    )
+    @token_required()
+    def post(
+        self, database_id: int, table_id: int, current_user: User
+    ) -> tuple[dict[str, any], int]:
+        """Encrypt rows added or changed since last encryption on a background job"""
+        job = enqueue_job(
+            operation="incremental_encrypt_table",
+            function=incremental_encrypt_database_table,
+            database_id=database_id,
+            table_id=table_id,
+            current_user=current_user,
+        )
+        return {"message": "job_created", "job_id": job.id}, 202
 
 
 @api.route("/database/<int:database_id>/table/<int:table_id>/progress")
@@ -133,3 +214,36 @@ class DecryptDatabaseRow(Resource):
             current_user=current_user,
         )
         return {"decrypted_row": decrypted_row}, 200
+
+
+@api.route("/database/<int:database_id>/table/<int:table_id>/decrypt_rows")
+class DecryptDatabaseRows(Resource):
+    @api.doc("Decrypt database rows")
+    @api.expect(_encryption_decrypt_rows, validate=True)
+    @api.response(200, "rows_decrypted", _default_message_response)
+    @api.response(400, "Input payload validation failed", _validation_error_response)
+    @api.response(
+        401,
+        "token_not_found\ntoken_invalid\nunauthorized_user",
+        _default_message_response,
+    )
+    @api.response(
+        404,
+        "database_not_found\ntable_not_found\nrow_not_found",
+        _default_message_response,
+    )
+    @api.response(409, "database_not_conected", _default_message_response)
+    @api.response(500, "row_not_decrypted", _default_message_response)
+    @token_required()
+    def post(
+        self, database_id: int, table_id: int, current_user: User
+    ) -> tuple[dict[str, any], int]:
+        """Decrypt database rows by primary keys"""
+        data = request.json
+        decrypted_rows = decrypt_rows(
+            database_id=database_id,
+            table_id=table_id,
+            primary_keys=data.get("primary_keys"),
+            current_user=current_user,
+        )
+        return {"decrypted_rows": decrypted_rows}, 200
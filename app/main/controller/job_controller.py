@@ -0,0 +1,83 @@
+from flask import request
+from flask_restx import Resource
+
+from app.main.config import Config
+from app.main.model import User
+from app.main.model.job_model import STATUS_OPTIONS
+from app.main.service import get_job, get_job_result, get_jobs, token_required
+from app.main.util import DefaultResponsesDTO, JobDTO
+
+job_ns = JobDTO.api
+api = job_ns
+
+_job_response = JobDTO.job_response
+_job_result_response = JobDTO.job_result_response
+_job_list = JobDTO.job_list
+
+_default_message_response = DefaultResponsesDTO.message_response
+
+_CONTENT_PER_PAGE = Config.CONTENT_PER_PAGE
+_DEFAULT_CONTENT_PER_PAGE = Config.DEFAULT_CONTENT_PER_PAGE
+
+
+@api.route("")
+class Job(Resource):
+    @api.doc(
+        "List all jobs of each user",
+        params={
+            "page": {"description": "Page number", "default": 1, "type": int},
+            "per_page": {
+                "description": "Items per page",
+                "default": _DEFAULT_CONTENT_PER_PAGE,
+                "enum": _CONTENT_PER_PAGE,
+                "type": int,
+            },
+            "status": {
+                "description": "Job status",
+                "enum": STATUS_OPTIONS,
+                "type": str,
+            },
+        },
+        description=f"List all jobs of each user with pagination. {_DEFAULT_CONTENT_PER_PAGE} jobs per page.",
+    )
+    @api.marshal_with(_job_list, code=200, description="jobs_list")
+    @api.response(401, "token_not_found\ntoken_invalid", _default_message_response)
+    @token_required()
+    def get(self, current_user: User) -> tuple[dict[str, any], int]:
+        """List all jobs of each user"""
+        params = request.args
+        return get_jobs(params=params, current_user=current_user)
+
+
+@api.route("/<int:job_id>")
+class JobById(Resource):
+    @api.doc("Get job status by id")
+    @api.marshal_with(_job_response, code=200, description="job_info")
+    @api.response(
+        401,
+        "token_not_found\ntoken_invalid\nunauthorized_user",
+        _default_message_response,
+    )
+    @api.response(404, "job_not_found", _default_message_response)
+    @token_required()
+    def get(self, job_id: int, current_user: User):
+        """Get job status by id"""
+        return get_job(job_id=job_id, current_user=current_user)
+
+
+@api.route("/<int:job_id>/result")
+class JobResult(Resource):
+    @api.doc("Get job result by id")
+    @api.response(200, "job_result", _job_result_response)
+    @api.response(
+        401,
+        "token_not_found\ntoken_invalid\nunauthorized_user",
+        _default_message_response,
+    )
+    @api.response(404, "job_not_found", _default_message_response)
+    @api.response(409, "job_not_finished", _default_message_response)
+    @api.response(500, "error of failed job", _default_message_response)
+    @token_required()
+    def get(self, job_id: int, current_user: User) -> tuple[dict[str, any], int]:
+        """Get job result by id"""
+        return get_job_result(job_id=job_id, current_user=current_user), 200
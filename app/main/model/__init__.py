@@ -1,7 +1,9 @@
 from .anonymization_record_model import *
 from .anonymization_type_model import *
+from .data_key_model import *
 from .database_key_model import *
 from .database_model import *
+from .job_model import *
 from .sql_log_model import *
 from .table_model import *
 from .user_model import *
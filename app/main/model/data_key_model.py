@@ -0,0 +1,19 @@
+from sqlalchemy import func
+
+from app.main import db
+
+
+class DataKey(db.Model):
+    __tablename__ = "data_key"
+
+    id = db.Column(db.Integer, nullable=False, autoincrement=True, primary_key=True)
+    database_id = db.Column(db.Integer, db.ForeignKey("database.id"), nullable=False)
+
+    wrapped_key = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, onupdate=func.now())
+
+    database = db.relationship("Database", back_populates="data_keys")
+
+    def __repr__(self):
+        return f"<Data Key: {self.id} - {self.database_id}>"
@@ -28,6 +28,7 @@ class Database(db.Model):
     port = db.Column(db.Integer, nullable=False)
     password = db.Column(db.String(100), nullable=False)
     ssh = db.Column(db.String(100))
+    anonymization_workers = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, onupdate=func.now())
 
@@ -35,6 +36,7 @@ class Database(db.Model):
     valid_database = db.relationship("ValidDatabase", back_populates="databases")
     tables = db.relationship("Table", back_populates="database")
     database_key = db.relationship("DatabaseKey", back_populates="database")
+    data_keys = db.relationship("DataKey", back_populates="database")
     sql_logs = db.relationship("SqlLog", back_populates="database")
 
     @property
@@ -0,0 +1,34 @@
+from sqlalchemy import func
+
+from app.main import db
+
+STATUS_OPTIONS = ["queued", "running", "finished", "failed"]
+
+
+class Job(db.Model):
+    __tablename__ = "job"
+
+    id = db.Column(db.Integer, nullable=False, autoincrement=True, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    database_id = db.Column(db.Integer, nullable=False)
+    table_id = db.Column(db.Integer, nullable=False)
+    # Table ID while queued or running, so a table has one active job
+    active_table_id = db.Column(db.Integer, nullable=True, unique=True)
+
+    operation = db.Column(db.String(50), nullable=False)
+    status = db.Column(
+        db.Enum(*STATUS_OPTIONS, name="job_status_enum"),
+        nullable=False,
+        default="queued",
+    )
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, onupdate=func.now())
+
+    user = db.relationship("User", back_populates="jobs")
+
+    def __repr__(self):
+        return f"<Job: {self.id} - {self.operation} - {self.status}>"
@@ -2,6 +2,8 @@ from sqlalchemy import func
 
 from app.main import db
 
+STORAGE_FORMAT_OPTIONS = ["text", "binary"]
+
 
 class Table(db.Model):
     __tablename__ = "table"
@@ -11,6 +13,17 @@ class Table(db.Model):
     name = db.Column(db.String(100), nullable=False)
     encryption_progress = db.Column(db.Integer, nullable=False, default=0)
     anonymization_progress = db.Column(db.Integer, nullable=False, default=0)
+    encryption_checkpoint = db.Column(db.String(255), nullable=True)
+    # Primary key ranges left by an interrupted anonymization, the others
+    # are committed already
+    anonymization_ranges = db.Column(db.JSON, nullable=True)
+    # Data key of envelope cells, reused until next full encryption
+    data_key_id = db.Column(db.Integer, nullable=True)
+    cloud_storage_format = db.Column(
+        db.Enum(*STORAGE_FORMAT_OPTIONS, name="storage_format_enum"),
+        nullable=False,
+        server_default="text",
+    )
     create_at = db.Column(db.DateTime, server_default=func.now())
     update_at = db.Column(db.DateTime, onupdate=func.now())
 
@@ -25,6 +25,7 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, onupdate=func.now())
 
     databases = db.relationship("Database", back_populates="user")
+    jobs = db.relationship("Job", back_populates="user")
 
     def __repr__(self) -> str:
         return f"<User {self.username}>"
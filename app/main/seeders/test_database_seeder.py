@@ -92,6 +92,29 @@ def insert_data(engine_db, table_name, num_of_rows, seed):
     session_db.commit()
 
 
+def create_test_table(engine_db, table_name):
+    create_table = f"\
+        create table {table_name}(\
+        id INT NOT NULL, \
+        identificador VARCHAR(200) NOT NULL,\
+        nome VARCHAR(100) NOT NULL,\
+        rg VARCHAR(200) NOT NULL,\
+        cpf VARCHAR(200) NOT NULL,\
+        idade INT NOT NULL,\
+        altura INT NOT NULL,\
+        data_de_nascimento DATE,\
+        ipv4 VARCHAR(20),\
+        ipv6 VARCHAR(40),\
+        endereco VARCHAR(200),\
+        email VARCHAR(100),\
+        telefone VARCHAR(50),\
+        profissao VARCHAR(50),\
+        PRIMARY KEY (id)\
+        );"
+
+    engine_db.execute(create_table)
+
+
 def create_test_database(USER, DB_PW, HOST, DB_NAME):
     if not database_exists(
         "mysql+mysqlconnector://{}:{}@{}:3306/{}".format(USER, DB_PW, HOST, DB_NAME)
@@ -132,27 +155,8 @@ def create_test_database(USER, DB_PW, HOST, DB_NAME):
             CREATE_TABLE = True
 
         if CREATE_TABLE:
-            create_table = f"\
-                create table {TABLE_NAME}(\
-                id INT NOT NULL, \
-                identificador VARCHAR(200) NOT NULL,\
-                nome VARCHAR(100) NOT NULL,\
-                rg VARCHAR(200) NOT NULL,\
-                cpf VARCHAR(200) NOT NULL,\
-                idade INT NOT NULL,\
-                altura INT NOT NULL,\
-                data_de_nascimento DATE,\
-                ipv4 VARCHAR(20),\
-                ipv6 VARCHAR(40),\
-                endereco VARCHAR(200),\
-                email VARCHAR(100),\
-                telefone VARCHAR(50),\
-                profissao VARCHAR(50),\
-                PRIMARY KEY (id)\
-                );"
-
-            engine_db_test.execute(create_table)
-            engine_db_backup.execute(create_table)
+            create_test_table(engine_db=engine_db_test, table_name=TABLE_NAME)
+            create_test_table(engine_db=engine_db_backup, table_name=TABLE_NAME)
 
         # Insert fake data
         seed = 123
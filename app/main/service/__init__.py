@@ -1,14 +1,21 @@
 from .activation_service import *
 from .agent_service import *
+from .anonymization_context_service import *
 from .anonymization_record_service import *
 from .anonymization_service import *
 from .anonymization_type_service import *
+from .anonymizer_registry_service import *
 from .auth_service import *
+from .bulk_write_service import *
+from .data_key_service import *
 from .database_key_service import *
 from .database_service import *
 from .encryption_service import *
 from .global_service import *
+from .job_service import *
 from .password_service import *
+from .pipeline_service import *
+from .schema_service import *
 from .sql_log_service import *
 from .sse_service import *
 from .table_service import *
@@ -141,36 +141,29 @@ def process_updates(
         database_id=database_id, table_id=table.id
     )["sensitive_column_names"]
 
+    # Resolve anonymizers of table once for all rows
+    context = get_anonymization_context(table=table, primary_key_name=primary_key_name)
+
     try:
         # Get original rows ​​that have been updated
         rows_list = []
         update_log = {}
 
-        for primary_key_value in primary_key_list:
-            update_log["primary_key_value"] = primary_key_value
-
-            found_row = decrypt_row(
-                database_id=database_id,
-                table_id=table_id,
-                data={
-                    "search_type": "primary_key",
-                    "search_value": primary_key_value,
-                },
-            )
+        found_rows = decrypt_rows(
+            database_id=database_id,
+            table_id=table_id,
+            primary_keys=primary_key_list,
+        )
 
-            found_row = found_row
+        # Anonymize copies of original rows at once, to compare with client rows
+        anonymized_rows = context.anonymize_rows(
+            rows=[found_row.copy() for found_row in found_rows]
+        )
 
-            anonymized_row = found_row.copy()
-            anonymized_row = anonymization_database_rows(
-                database_id=database_id,
-                table_id=table_id,
-                data={
-                    "rows_to_anonymization": [anonymized_row],
-                    "insert_database": False,
-                },
-                current_user=current_user,
-            )["rows_anonymized"]
-            anonymized_row = anonymized_row[0]
+        for primary_key_value, found_row, anonymized_row in zip(
+            primary_key_list, found_rows, anonymized_rows
+        ):
+            update_log["primary_key_value"] = primary_key_value
 
             statement = select(client_table_connection.table).where(
                 client_table_connection.get_column(column_name=primary_key_name)
@@ -183,7 +176,8 @@ def process_updates(
             update_log["values"] = []
             for sensitive_column in sensitive_columns:
                 if type(client_row[sensitive_column]).__name__ == "date":
-                    if anonymized_row[sensitive_column] != client_row[
+                    # Date anonymizers return date objects or "YYYY-MM-DD"
+                    if str(anonymized_row[sensitive_column]) != client_row[
                         sensitive_column
                     ].strftime("%Y-%m-%d"):
                         found_row[sensitive_column] = client_row[sensitive_column]
@@ -296,8 +290,9 @@ def process_deletions(
 
 
 from app.main.service.anonymization_service import anonymization_database_rows
+from app.main.service.anonymizer_registry_service import get_anonymization_context
 from app.main.service.database_service import get_database
-from app.main.service.encryption_service import decrypt_row, encrypt_database_row
+from app.main.service.encryption_service import decrypt_rows, encrypt_database_row
 from app.main.service.global_service import (
     create_table_connection,
     get_cloud_database_url,
@@ -0,0 +1,44 @@
+class AnonymizationContext:
+    def __init__(
+        self,
+        database_id: int,
+        table_name: str,
+        primary_key_name: str,
+        table_anonymizers=None,
+    ):
+        # Set once per run and passed to every anonymizer, never shared
+        # between runs, so tables can be anonymized concurrently
+        self.database_id = database_id
+        self.table_name = table_name
+        self.primary_key_name = primary_key_name
+        self.table_anonymizers = table_anonymizers
+
+    @property
+    def table_seed(self) -> str:
+        return f"database{self.database_id}table{self.table_name}"
+
+    def row_seed(self, primary_key_value) -> str:
+        return f"{self.table_seed}primary_key{primary_key_value}"
+
+    def anonymize_rows(self, rows: list[dict], timings: list = None) -> list[dict]:
+        """
+        This function anonymizes the given rows in place with every
+        anonymizer of the run.
+
+        Parameters
+        ----------
+        rows : list[dict]
+            Rows to anonymize.
+
+        timings : list
+            If given, the time of each anonymizer is appended to it.
+
+        Returns
+        -------
+        list[dict]
+            Anonymized rows.
+        """
+
+        return self.table_anonymizers.anonymize_rows(
+            context=self, rows=rows, timings=timings
+        )
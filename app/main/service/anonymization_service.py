@@ -1,22 +1,25 @@
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable
+
 from sqlalchemy import bindparam, create_engine, func, insert, select, update
 from sqlalchemy_utils import create_database, database_exists, drop_database
+from werkzeug.datastructures import ImmutableMultiDict
 
 from app.main import db
 from app.main.config import app_config
-from app.main.exceptions import DefaultException
-from app.main.model import AnonymizationRecord, Table, User
-from app.main.service.anonymization_type_service import get_anonymization_type
-from app.main.service.anonymization_types import (
-    cpf_anonymizer_service,
-    date_anonymizer_service,
-    email_anonymizer_service,
-    ip_anonymizer_service,
-    named_entities_anonymizer_service,
-    rg_anonymizer_service,
-)
+from app.main.exceptions import DefaultException, ValidationException
+from app.main.model import Database, Table, User
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymizer_registry_service import get_anonymization_context
+from app.main.service.bulk_write_service import BulkUpdater, update_rows
 from app.main.service.database_service import get_database, get_database_tables_names
-from app.main.service.encryption_service import decrypt_row
+from app.main.service.encryption_service import decrypt_rows
 from app.main.service.global_service import (
+    TableConnection,
     create_table_connection,
     get_cloud_database_url,
     get_primary_key_name,
@@ -25,6 +28,21 @@ from app.main.service.sse_service import generate_hash_column
 from app.main.service.table_service import get_sensitive_columns, get_table
 
 _batch_selection_size = app_config.BATCH_SELECTION_SIZE
+_anonymization_workers = app_config.ANONYMIZATION_WORKERS
+_anonymization_ranges_per_worker = app_config.ANONYMIZATION_RANGES_PER_WORKER
+_anonymization_range_split = app_config.ANONYMIZATION_RANGE_SPLIT
+_anonymization_preview_size = app_config.ANONYMIZATION_PREVIEW_SIZE
+_anonymization_preview_max_size = app_config.ANONYMIZATION_PREVIEW_MAX_SIZE
+
+SAMPLE_TYPE_OPTIONS = ["random", "keyset"]
+
+# Workers of each client database, shared by all anonymization jobs
+_database_semaphores = {}
+_database_semaphores_lock = threading.Lock()
+_SEMAPHORE_TIMEOUT_SECONDS = 0.5
+
+# Range workers are spawned, as encryption pipeline workers
+_PROCESS_CONTEXT = multiprocessing.get_context("spawn")
 
 
 def _calculate_remove_anonymization_progress(
@@ -36,6 +54,295 @@ def _calculate_remove_anonymization_progress(
     db.session.commit()
 
 
+def _anonymization_range_rows(
+    client_table_connection: TableConnection,
+    context: AnonymizationContext,
+    primary_key_range: tuple = (None, None),
+    on_batch: Callable = None,
+) -> int:
+    primary_key_name = context.primary_key_name
+    columns_names = context.table_anonymizers.columns_names
+    primary_key_column = client_table_connection.get_column(
+        column_name=primary_key_name
+    )
+
+    # Staging table is created before the scan and reused by all batches
+    bulk_updater = BulkUpdater(
+        connection=client_table_connection.session.connection(),
+        table=client_table_connection.table,
+        primary_key_name=primary_key_name,
+        columns_names=columns_names,
+    )
+
+    # Single scan of table, only with anonymized columns
+    statement = select(
+        *[
+            client_table_connection.get_column(column_name=column_name)
+            for column_name in [primary_key_name, *columns_names]
+        ]
+    )
+
+    # Primary key range, lower bound included and upper bound excluded
+    lower_bound, upper_bound = primary_key_range
+
+    if lower_bound is not None:
+        statement = statement.where(primary_key_column >= lower_bound)
+
+    if upper_bound is not None:
+        statement = statement.where(primary_key_column < upper_bound)
+
+    results_proxy = client_table_connection.session.execute(statement)
+
+    results = results_proxy.fetchmany(_batch_selection_size)
+    number_row_anonymized = 0
+
+    try:
+        while results:
+            # Run every anonymizer of table on the same batch
+            anonymized_rows = context.anonymize_rows(
+                rows=[row._asdict() for row in results]
+            )
+
+            bulk_updater.update(rows=anonymized_rows)
+
+            number_row_anonymized += len(results)
+
+            if on_batch is not None:
+                on_batch(len(results))
+
+            results = results_proxy.fetchmany(_batch_selection_size)
+
+    finally:
+        # Pending cursor would hold the staging table on SQLite
+        results_proxy.close()
+        bulk_updater.close()
+
+    return number_row_anonymized
+
+
+def _calculate_anonymization_progress(
+    table: Table, number_row_anonymized: int, number_row_total: int
+) -> None:
+    table.anonymization_progress = int((number_row_anonymized / number_row_total) * 50)
+    db.session.commit()
+
+
+def _anonymization_table_rows(
+    client_table_connection: TableConnection,
+    context: AnonymizationContext,
+    table: Table,
+) -> None:
+    number_row_total = client_table_connection.session.execute(
+        select(func.count()).select_from(client_table_connection.table)
+    ).scalar()
+
+    number_row_anonymized = 0
+
+    def on_batch(number_row_batch: int) -> None:
+        nonlocal number_row_anonymized
+
+        number_row_anonymized += number_row_batch
+        _calculate_anonymization_progress(
+            table=table,
+            number_row_anonymized=number_row_anonymized,
+            number_row_total=number_row_total,
+        )
+
+    _anonymization_range_rows(
+        client_table_connection=client_table_connection,
+        context=context,
+        on_batch=on_batch,
+    )
+
+
+def _get_primary_key_ranges(
+    client_table_connection: TableConnection,
+    primary_key_name: str,
+    number_ranges: int,
+    number_row_total: int,
+) -> list[tuple]:
+    primary_key_column = client_table_connection.get_column(
+        column_name=primary_key_name
+    )
+    session = client_table_connection.session
+
+    minimum, maximum = session.execute(
+        select(func.min(primary_key_column), func.max(primary_key_column))
+    ).one()
+
+    if minimum is None:
+        return []
+
+    # Even split of key values, from two index reads
+    if (
+        _anonymization_range_split == "min_max"
+        and isinstance(minimum, int)
+        and isinstance(maximum, int)
+    ):
+        step = (maximum - minimum + 1) / number_ranges
+        boundaries = [minimum + int(step * index) for index in range(1, number_ranges)]
+
+    # Quantiles of keys, for skewed or non integer keys
+    else:
+        boundaries = [
+            session.execute(
+                select(primary_key_column)
+                .order_by(primary_key_column)
+                .offset(number_row_total * index // number_ranges)
+                .limit(1)
+            ).scalar()
+            for index in range(1, number_ranges)
+        ]
+
+    # First and last ranges are open, so no row is left out
+    bounds = [None, *sorted(set(boundaries) - {None, minimum}), None]
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _get_database_semaphore(database_id: int, workers: int) -> threading.Semaphore:
+    # Shared by all jobs of a database, a new degree of parallelism only
+    # applies to jobs started after the change
+    with _database_semaphores_lock:
+        return _database_semaphores.setdefault(
+            (database_id, workers), threading.BoundedSemaphore(workers)
+        )
+
+
+def _anonymization_range(
+    database_url: str,
+    context: AnonymizationContext,
+    primary_key_range: tuple,
+) -> int:
+    # Run on process pool, each range on its own connection and transaction
+    client_table_connection = create_table_connection(
+        database_url=database_url, table_name=context.table_name
+    )
+
+    try:
+        number_row_anonymized = _anonymization_range_rows(
+            client_table_connection=client_table_connection,
+            context=context,
+            primary_key_range=primary_key_range,
+        )
+
+        client_table_connection.session.commit()
+
+        return number_row_anonymized
+
+    except:
+        client_table_connection.session.rollback()
+        raise
+
+    finally:
+        client_table_connection.close()
+
+
+def _anonymization_table_rows_parallel(
+    client_table_connection: TableConnection,
+    client_database: Database,
+    context: AnonymizationContext,
+    table: Table,
+    workers: int,
+) -> None:
+    number_row_total = client_table_connection.session.execute(
+        select(func.count()).select_from(client_table_connection.table)
+    ).scalar()
+
+    # Each range commits on its own, so ranges are saved before the first
+    # one runs and a retry only runs the ones left
+    if table.anonymization_ranges is None:
+        table.anonymization_ranges = [
+            [_to_json_value(lower_bound), _to_json_value(upper_bound)]
+            for lower_bound, upper_bound in _get_primary_key_ranges(
+                client_table_connection=client_table_connection,
+                primary_key_name=context.primary_key_name,
+                number_ranges=workers * _anonymization_ranges_per_worker,
+                number_row_total=number_row_total,
+            )
+        ]
+        db.session.commit()
+
+    primary_key_ranges = [
+        tuple(primary_key_range) for primary_key_range in table.anonymization_ranges
+    ]
+
+    semaphore = _get_database_semaphore(database_id=client_database.id, workers=workers)
+    number_row_anonymized = 0
+    pending = {}
+
+    def collect(timeout: float = None, raise_error: bool = True) -> None:
+        nonlocal number_row_anonymized
+
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        error = None
+
+        # Every finished range is saved before an error of another is raised
+        for future in done:
+            primary_key_range = pending.pop(future)
+
+            if future.cancelled():
+                continue
+
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+
+            number_row_anonymized += future.result()
+            table.anonymization_ranges = [
+                list(left_range)
+                for left_range in map(tuple, table.anonymization_ranges)
+                if left_range != primary_key_range
+            ]
+
+        if done:
+            _calculate_anonymization_progress(
+                table=table,
+                number_row_anonymized=number_row_anonymized,
+                number_row_total=number_row_total,
+            )
+
+        if error is not None and raise_error:
+            raise error
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=_PROCESS_CONTEXT
+    ) as executor:
+        try:
+            for primary_key_range in primary_key_ranges:
+                # Wait for a worker of database, also used by other jobs,
+                # counting finished ranges meanwhile
+                while not semaphore.acquire(timeout=_SEMAPHORE_TIMEOUT_SECONDS):
+                    collect(timeout=0)
+
+                try:
+                    future = executor.submit(
+                        _anonymization_range,
+                        client_database.url,
+                        context,
+                        primary_key_range,
+                    )
+                except:
+                    semaphore.release()
+                    raise
+
+                future.add_done_callback(lambda _: semaphore.release())
+                pending[future] = primary_key_range
+
+                collect(timeout=0)
+
+            while pending:
+                collect()
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+            # Ranges already running still commit, so they are saved too
+            while pending:
+                collect(raise_error=False)
+
+
 def anonymization_database_rows(
     database_id: int, table_id: int, data: dict[str, str], current_user: User
 ) -> dict:
@@ -62,29 +369,21 @@ def anonymization_database_rows(
         database_url=client_database.url, table_name=table.name
     )
 
-    # Get sensitive columns
-    anonymization_records = AnonymizationRecord.query.filter_by(table_id=table.id).all()
-
-    if not anonymization_records:
-        raise DefaultException("anonymization_record_not_found", code=404)
+    # Resolve anonymizers of table once for all rows
+    context = get_anonymization_context(
+        table=table, primary_key_name=client_table_connection.get_primary_key_name()
+    )
 
-    # Run anonymization for each anonymization types
     try:
-        for anonymization_record in anonymization_records:
-            if not anonymization_record.columns:
-                continue
-
-            anonymization_type = get_anonymization_type(
-                anonymization_type_id=anonymization_record.anonymization_type_id
-            )
-
-            eval(
-                f"{anonymization_type.name}_service.anonymization_database_rows(\
-                    client_table_connection=client_table_connection,\
-                    columns_to_anonymize=anonymization_record.columns,\
-                    rows_to_anonymize=rows_to_anonymization,\
-                    insert_database=insert_database,\
-                    )"
+        context.anonymize_rows(rows=rows_to_anonymization)
+
+        if insert_database:
+            update_rows(
+                connection=client_table_connection.session.connection(),
+                table=client_table_connection.table,
+                primary_key_name=context.primary_key_name,
+                columns_names=context.table_anonymizers.columns_names,
+                rows=rows_to_anonymization,
             )
 
         client_table_connection.session.commit()
@@ -99,7 +398,139 @@ def anonymization_database_rows(
         client_table_connection.close()
 
 
-def anonymization_table(database_id: int, table_id: int, current_user: User) -> int:
+def _get_preview_params(params: ImmutableMultiDict) -> tuple[str, int, str]:
+    sample_type = params.get("sample_type", type=str, default=SAMPLE_TYPE_OPTIONS[0])
+    sample_size = params.get(
+        "sample_size", type=int, default=_anonymization_preview_size
+    )
+
+    if not sample_type in SAMPLE_TYPE_OPTIONS:
+        raise ValidationException(
+            errors={"sample_type": "invalid sample type"},
+            message="Input payload validation failed",
+        )
+
+    if not 0 < sample_size <= _anonymization_preview_max_size:
+        raise ValidationException(
+            errors={"sample_size": "invalid sample size"},
+            message="Input payload validation failed",
+        )
+
+    return sample_type, sample_size, params.get("after", type=str)
+
+
+def _select_keyset_sample(
+    client_table_connection: TableConnection,
+    columns: list,
+    sample_size: int,
+    after: str = None,
+) -> list[dict]:
+    primary_key_column = columns[0]
+
+    statement = select(*columns).order_by(primary_key_column).limit(sample_size)
+
+    if after is not None:
+        try:
+            after = primary_key_column.type.python_type(after)
+        except (NotImplementedError, ValueError):
+            raise ValidationException(
+                errors={"after": "invalid primary key value"},
+                message="Input payload validation failed",
+            )
+
+        statement = statement.where(primary_key_column > after)
+
+    return [
+        row._asdict()
+        for row in client_table_connection.session.execute(statement).fetchall()
+    ]
+
+
+def _select_random_sample(
+    client_table_connection: TableConnection, columns: list, sample_size: int
+) -> list[dict]:
+    primary_key_column = columns[0]
+    session = client_table_connection.session
+
+    minimum, maximum = session.execute(
+        select(func.min(primary_key_column), func.max(primary_key_column))
+    ).one()
+
+    if minimum is None:
+        return []
+
+    statement = select(*columns).order_by(primary_key_column).limit(1)
+
+    # One index probe per row on integer keys, duplicated rows on key gaps
+    # are dropped, so sample may be smaller than asked
+    if isinstance(minimum, int) and isinstance(maximum, int):
+        starts = random.sample(
+            range(minimum, maximum + 1), min(sample_size, maximum - minimum + 1)
+        )
+        statements = [
+            statement.where(primary_key_column >= start) for start in sorted(starts)
+        ]
+
+    # Random offsets on other keys
+    else:
+        number_row_total = session.execute(
+            select(func.count()).select_from(client_table_connection.table)
+        ).scalar()
+        offsets = random.sample(
+            range(number_row_total), min(sample_size, number_row_total)
+        )
+        statements = [statement.offset(offset) for offset in sorted(offsets)]
+
+    rows = {}
+    for sample_statement in statements:
+        row = session.execute(sample_statement).first()
+
+        if row is not None:
+            rows[row[0]] = row._asdict()
+
+    return list(rows.values())
+
+
+def _to_json_value(value) -> any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    if isinstance(value, bytes):
+        return value.hex()
+
+    return str(value)
+
+
+def preview_table_anonymization(
+    database_id: int, table_id: int, params: ImmutableMultiDict, current_user: User
+) -> dict[str, any]:
+    """
+    This function runs the anonymizers of a table on a sample of rows, in
+    memory, without writing them back.
+
+    Parameters
+    ----------
+    database_id : int
+        Database ID.
+
+    table_id : int
+        Table ID.
+
+    params : ImmutableMultiDict
+        Query parameters: sample_type ("random" or "keyset"), sample_size
+        and, for keyset samples, the primary key the sample starts after.
+
+    current_user : User
+        User of request.
+
+    Returns
+    -------
+    dict[str, any]
+        Rows before and after anonymization, and time of each anonymizer.
+    """
+
+    sample_type, sample_size, after = _get_preview_params(params=params)
+
     table = get_table(
         database_id=database_id, table_id=table_id, current_user=current_user
     )
@@ -119,35 +550,132 @@ def anonymization_table(database_id: int, table_id: int, current_user: User) ->
         database_url=client_database.url, table_name=table.name
     )
 
-    anonymization_records = AnonymizationRecord.query.filter_by(table_id=table.id).all()
-
-    if not anonymization_records:
-        raise DefaultException("anonymization_record_not_found", code=404)
+    primary_key_name = client_table_connection.get_primary_key_name()
 
     try:
-        for index, anonymization_record in enumerate(anonymization_records):
-            if not anonymization_record.columns:
-                continue
+        context = get_anonymization_context(
+            table=table, primary_key_name=primary_key_name
+        )
 
-            anonymization_type = get_anonymization_type(
-                anonymization_type_id=anonymization_record.anonymization_type_id
+        # Only primary key and anonymized columns
+        columns = [
+            client_table_connection.get_column(column_name=column_name)
+            for column_name in [
+                primary_key_name,
+                *context.table_anonymizers.columns_names,
+            ]
+        ]
+
+        if sample_type == "keyset":
+            rows = _select_keyset_sample(
+                client_table_connection=client_table_connection,
+                columns=columns,
+                sample_size=sample_size,
+                after=after,
             )
-
-            eval(
-                f"{anonymization_type.name}_service.anonymization_database(\
-                database_id=client_database.id,\
-                client_table_connection=client_table_connection,\
-                columns_to_anonymize=anonymization_record.columns,\
-                )"
+        else:
+            rows = _select_random_sample(
+                client_table_connection=client_table_connection,
+                columns=columns,
+                sample_size=sample_size,
             )
 
-            table.anonymization_progress = int(
-                ((index + 1) / len(anonymization_records)) * 50
+        rows_before = [dict(row) for row in rows]
+        timings = []
+
+        started = time.perf_counter()
+        context.anonymize_rows(rows=rows, timings=timings)
+        seconds = time.perf_counter() - started
+
+    except (DefaultException, ValidationException):
+        raise
+
+    except:
+        raise DefaultException("table_anonymization_not_previewed", code=500)
+
+    finally:
+        # Nothing is written on preview
+        client_table_connection.session.rollback()
+        client_table_connection.close()
+
+    return {
+        "sample_type": sample_type,
+        "primary_key_name": primary_key_name,
+        "last_primary_key": _to_json_value(
+            rows_before[-1][primary_key_name] if rows_before else None
+        ),
+        "seconds": seconds,
+        "anonymizers": timings,
+        "rows": [
+            {
+                "before": {
+                    column_name: _to_json_value(value)
+                    for column_name, value in row_before.items()
+                },
+                "after": {
+                    column_name: _to_json_value(value)
+                    for column_name, value in row.items()
+                },
+            }
+            for row_before, row in zip(rows_before, rows)
+        ],
+    }
+
+
+def anonymization_table(database_id: int, table_id: int, current_user: User) -> int:
+    table = get_table(
+        database_id=database_id, table_id=table_id, current_user=current_user
+    )
+
+    client_database = get_database(
+        database_id=database_id, current_user=current_user, verify_connection=True
+    )
+
+    database_tables_names = get_database_tables_names(
+        database_id=database_id, current_user=current_user
+    )
+
+    if not table.name in database_tables_names["table_names"]:
+        raise DefaultException("outdated_table", code=409)
+
+    client_table_connection = create_table_connection(
+        database_url=client_database.url, table_name=table.name
+    )
+
+    context = get_anonymization_context(
+        table=table, primary_key_name=client_table_connection.get_primary_key_name()
+    )
+
+    # Degree of parallelism of client database, SQLite has a single writer
+    workers = client_database.anonymization_workers or _anonymization_workers
+
+    try:
+        if table.anonymization_ranges == []:
+            # Rows were anonymized by an interrupted run, only hashes are left
+            pass
+
+        elif (
+            workers > 1 or table.anonymization_ranges
+        ) and client_table_connection.engine.dialect.name != "sqlite":
+            _anonymization_table_rows_parallel(
+                client_table_connection=client_table_connection,
+                client_database=client_database,
+                context=context,
+                table=table,
+                workers=workers,
+            )
+        else:
+            _anonymization_table_rows(
+                client_table_connection=client_table_connection,
+                context=context,
+                table=table,
             )
-            db.session.commit()
 
         table.anonimyzation_progress = 50
         client_table_connection.session.commit()
+
+        # No range is left to anonymize on a retry
+        table.anonymization_ranges = []
         db.session.commit()
 
         cloud_table_connection = generate_hash_column(
@@ -159,6 +687,7 @@ def anonymization_table(database_id: int, table_id: int, current_user: User) ->
         client_table_connection.session.commit()
         cloud_table_connection.session.commit()
         table.anonymization_progress = 100
+        table.anonymization_ranges = None
 
     except:
         if client_table_connection is not None:
@@ -232,23 +761,20 @@ def remove_table_anonymizaiton(
 
         # Encrypt database table
         while results:
-            decrypted_rows = []
             primary_key_values = [row[0] for row in results]
 
-            for primary_key_value in primary_key_values:
-                decrypted_row = decrypt_row(
-                    database_id=database_id,
-                    table_id=table_id,
-                    data={
-                        "search_type": "primary_key",
-                        "search_value": str(primary_key_value),
-                    },
-                    current_user=current_user,
-                )
+            decrypted_rows = decrypt_rows(
+                database_id=database_id,
+                table_id=table_id,
+                primary_keys=primary_key_values,
+                current_user=current_user,
+            )
 
+            for primary_key_value, decrypted_row in zip(
+                primary_key_values, decrypted_rows
+            ):
                 decrypted_row[f"b_{primary_key_name}"] = primary_key_value
                 decrypted_row.pop(primary_key_name, None)
-                decrypted_rows.append(decrypted_row)
 
             client_table_connection.session.execute(
                 update(client_table_connection.table).where(
@@ -271,6 +797,7 @@ def remove_table_anonymizaiton(
 
         table.encryption_progress = 0
         table.anonymization_progress = 0
+        table.anonymization_ranges = None
         client_table_connection.session.commit()
 
     except:
@@ -1,138 +1,397 @@
-import anonypy
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterator
+
+import numpy as np
 import pandas as pd
-from service.database_service import create_table_session, get_primary_key
+from anonypy import Mondrian, anonymity
+from sqlalchemy import select
 
+from app.main.config import app_config
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.bulk_write_service import BulkUpdater, update_rows
+from app.main.service.global_service import TableConnection
+from app.main.service.pipeline_service import run_batch_pipeline
 
-def anonymization_database_rows(
-    src_client_db_path, table_name, columns_to_anonymization, rows_to_anonymization
-):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
-
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
-
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
-    )
+_anonypy_partition_size = app_config.ANONYPY_PARTITION_SIZE
+_anonypy_workers = app_config.ANONYPY_WORKERS
+
+# Rows of each generalized group and max distance of its distribution
+_K_ANONYMITY = 3
+_T_CLOSENESS = 0.2
+
+_INT64_MIN = np.iinfo(np.int64).min
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+class _Mondrian(Mondrian):
+    def __init__(self, df, feature_columns, sensitive_column=None):
+        super().__init__(df, feature_columns, sensitive_column)
+
+        # Same for every split, Mondrian.is_valid recomputes it each time
+        self._global_freqs = anonymity.get_global_freq(df, sensitive_column)
+
+    def is_valid(self, partition, k=2, l=0, p=0.0):
+        if not anonymity.is_k_anonymous(partition, k):
+            return False
+
+        if l > 0 and not anonymity.is_l_diverse(
+            self.df, partition, self.sensitive_column, l
+        ):
+            return False
+
+        if p > 0.0 and not anonymity.is_t_close(
+            self.df, partition, self.sensitive_column, self._global_freqs, p
+        ):
+            return False
+
+        return True
+
+
+def _column_kind(values: list) -> tuple[str, any]:
+    # Kind of non NULL values of a column and what is needed to convert
+    # group means back to it
+    values = [value for value in values if value is not None]
 
-    # Transform rows database to dataframe
-    dataframe_to_anonymization = pd.DataFrame(data=rows_to_anonymization)
-    dataframe_to_anonymization = dataframe_to_anonymization[columns_to_anonymization]
+    if any(isinstance(value, bool) for value in values):
+        return "other", None
 
-    # Remove primary key of columns_to_anonymization list
-    # but save elements in save_primary_key_elements
-    save_primary_key_elements = dataframe_to_anonymization[primary_key]
-    dataframe_to_anonymization = dataframe_to_anonymization.drop(primary_key, axis=1)
-    columns_to_anonymization.remove(primary_key)
+    if all(isinstance(value, int) for value in values):
+        # Out of int64, as BIGINT UNSIGNED, means are not exact
+        if any(not _INT64_MIN <= value <= _INT64_MAX for value in values):
+            return "other", None
 
-    # Convert columns_to_anonymization to category
-    for column in columns_to_anonymization:
-        dataframe_to_anonymization[column] = dataframe_to_anonymization[column].astype(
-            "category"
+        return "integer", None
+
+    if all(isinstance(value, (int, float)) for value in values):
+        return "float", None
+
+    if all(isinstance(value, (int, Decimal)) for value in values):
+        # Scale of column, as NUMERIC(p, s)
+        return "decimal", max(
+            [0]
+            + [
+                -value.as_tuple().exponent
+                for value in values
+                if isinstance(value, Decimal)
+            ]
         )
 
-    # Run anonymization
-    anonymization_dataframe = pd.DataFrame()
+    if all(isinstance(value, datetime) for value in values):
+        if all(value.tzinfo is None for value in values):
+            return "datetime", datetime(1970, 1, 1)
+
+        if all(value.tzinfo is not None for value in values):
+            return "datetime", datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+        return "other", None
+
+    if all(isinstance(value, date) for value in values):
+        return "date", None
+
+    if all(isinstance(value, str) for value in values):
+        return "text", None
+
+    return "other", None
+
+
+def _to_number(value, kind: str, reference) -> any:
+    if value is None:
+        return None
+
+    if kind == "date":
+        return value.toordinal()
+
+    if kind == "datetime":
+        return (value - reference) // timedelta(microseconds=1)
+
+    return value
+
 
-    for column in columns_to_anonymization:
-        from_anonymization_dataframe = []
+def _from_number(value, kind: str, reference) -> any:
+    if kind == "integer":
+        return int(np.rint(value))
 
-        p = anonypy.Preserver(dataframe_to_anonymization, [str(column)], str(column))
-        rows = p.anonymize_t_closeness(k=3, p=0.2)
-        dataframe_aux = pd.DataFrame(rows)
+    if kind == "decimal":
+        return Decimal(value).quantize(Decimal(1).scaleb(-reference))
 
-        for row in range(0, len(dataframe_aux)):
-            from_anonymization_dataframe = (
-                from_anonymization_dataframe
-                + [dataframe_aux[str(column)][row]] * dataframe_aux["count"][row]
+    if kind == "date":
+        return date.fromordinal(int(np.rint(value)))
+
+    if kind == "datetime":
+        return reference + timedelta(microseconds=int(np.rint(value)))
+
+    return float(value)
+
+
+def _to_dataframe(
+    rows: list[dict], primary_key_name: str, columns_names: list[str]
+) -> pd.DataFrame:
+    dataframe = pd.DataFrame(
+        {primary_key_name: [row[primary_key_name] for row in rows]}
+    )
+    columns_kinds = {}
+
+    # Numbers of numeric, decimal and date columns and categorical codes of
+    # text columns, also on worker pickles
+    for column_name in columns_names:
+        values = [row[column_name] for row in rows]
+        kind, reference = _column_kind(values=values)
+
+        if kind in ["integer", "date", "datetime"]:
+            dataframe[column_name] = pd.array(
+                [_to_number(value, kind, reference) for value in values],
+                dtype="Int64",
+            )
+        elif kind in ["float", "decimal"]:
+            dataframe[column_name] = np.array(
+                [np.nan if value is None else float(value) for value in values],
+                dtype=np.float64,
             )
+        elif kind == "text":
+            dataframe[column_name] = pd.Series(values, dtype="category")
+        else:
+            dataframe[column_name] = pd.Series(values, dtype=object)
+
+        columns_kinds[column_name] = (kind, reference)
 
-        anonymization_dataframe[str(column)] = from_anonymization_dataframe
+    dataframe.attrs["columns_kinds"] = columns_kinds
 
-    # Reorganize primary key elements
-    anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
+    return dataframe
 
-    # Get anonymized data to update
-    dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
 
-    # Update data
-    for row_anonymized in dictionary_anonymized_data:
-        session_client_db.query(table_client_db).filter(
-            table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-        ).update(row_anonymized)
+def _anonymize_series(series: pd.Series, kind: str, reference) -> np.ndarray:
+    new_values = np.full(len(series), None, dtype=object)
 
-    session_client_db.commit()
-    session_client_db.close()
+    # Other types are kept, generalized values would not fit their column
+    if kind == "other":
+        new_values[:] = series.tolist()
+        return new_values
 
+    # NULL values are kept, and not part of any group
+    positions = np.flatnonzero(series.notna().to_numpy())
 
-def anonymization_database(src_client_db_path, table_name, columns_to_anonymization):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
+    if not len(positions):
+        return new_values
 
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
+    dataframe = pd.DataFrame({"value": series.iloc[positions].reset_index(drop=True)})
+    if kind == "text":
+        dataframe["value"] = dataframe["value"].cat.remove_unused_categories()
+    elif dataframe["value"].dtype.name == "Int64":
+        dataframe["value"] = dataframe["value"].astype(np.int64)
 
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
+    partitions = _Mondrian(
+        df=dataframe, feature_columns=["value"], sensitive_column="value"
+    ).partition(k=_K_ANONYMITY, p=_T_CLOSENESS)
+
+    values = dataframe["value"]
+
+    if kind == "text":
+        # Categories of group joined, as anonypy generalizes them, but in
+        # a stable order
+        labels = [
+            ",".join(sorted(map(str, values[partition].unique())))
+            for partition in partitions
+        ]
+    else:
+        # Mean of group, converted back to the type of column
+        labels = [
+            _from_number(values[partition].mean(), kind, reference)
+            for partition in partitions
+        ]
+
+    # Each group label repeated over its rows, placed back by position
+    groups_positions = np.concatenate(
+        [np.asarray(partition) for partition in partitions]
     )
+    groups_labels = np.empty(len(labels), dtype=object)
+    groups_labels[:] = labels
+
+    new_values[positions[groups_positions]] = np.repeat(
+        groups_labels, [len(partition) for partition in partitions]
+    )
+
+    return new_values
+
 
-    # Get data to dataframe
-    from_dataframe = session_client_db.query(table_client_db).all()
+def _anonymize_partition(
+    dataframe: pd.DataFrame, columns_names: list[str]
+) -> dict[str, list]:
+    # Run on process pool, one call per partition of table
+    columns_kinds = dataframe.attrs["columns_kinds"]
 
-    # Transform rows database to dataframe
-    dataframe_to_anonymization = pd.DataFrame(data=from_dataframe)
-    dataframe_to_anonymization = dataframe_to_anonymization[columns_to_anonymization]
+    return {
+        column_name: _anonymize_series(
+            dataframe[column_name], *columns_kinds[column_name]
+        ).tolist()
+        for column_name in columns_names
+    }
 
-    # Remove primary key of columns_to_anonymization list
-    # but save elements in save_primary_key_elements
-    save_primary_key_elements = dataframe_to_anonymization[primary_key]
-    dataframe_to_anonymization = dataframe_to_anonymization.drop(primary_key, axis=1)
-    columns_to_anonymization.remove(primary_key)
 
-    # Convert columns_to_anonymization to category
-    for column in columns_to_anonymization:
-        dataframe_to_anonymization[column] = dataframe_to_anonymization[column].astype(
-            "category"
+def _to_rows(
+    dataframe: pd.DataFrame, primary_key_name: str, new_values: dict[str, list]
+) -> list[dict]:
+    return [
+        {primary_key_name: primary_key, **dict(zip(new_values.keys(), values))}
+        for primary_key, values in zip(
+            dataframe[primary_key_name].tolist(), zip(*new_values.values())
         )
+    ]
+
+
+def anonymization_database_rows(
+    context: AnonymizationContext,
+    client_table_connection: TableConnection,
+    columns_to_anonymize: list[str],
+    rows_to_anonymize: list[dict],
+    insert_database: bool = True,
+) -> list[dict]:
+    """
+    This function anonymizes each the given rows with the
+    Anonypy Anonymizer, generalized among the given rows only.
+
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
+
+    client_table_connection : TableConnection
+        Connection of Client Database table.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    rows_to_anonymize : list[dict]
+        Rows provided for anonymization.
+
+    insert_database : bool
+        Flag to indicate if anonymized rows will be inserted or returned.
+
+    Returns
+    -------
+    list[dict]
+        Anonymized rows
+    """
+
+    if not rows_to_anonymize:
+        return rows_to_anonymize
 
     # Run anonymization
-    anonymization_dataframe = pd.DataFrame()
+    new_values = _anonymize_partition(
+        dataframe=_to_dataframe(
+            rows=rows_to_anonymize,
+            primary_key_name=context.primary_key_name,
+            columns_names=columns_to_anonymize,
+        ),
+        columns_names=columns_to_anonymize,
+    )
 
-    for column in columns_to_anonymization:
-        from_anonymization_dataframe = []
+    for column_name, values in new_values.items():
+        for row, value in zip(rows_to_anonymize, values):
+            row[column_name] = value
+
+    # Insert anonymized rows in database
+    if insert_database:
+        update_rows(
+            connection=client_table_connection.session.connection(),
+            table=client_table_connection.table,
+            primary_key_name=context.primary_key_name,
+            columns_names=columns_to_anonymize,
+            rows=rows_to_anonymize,
+        )
 
-        p = anonypy.Preserver(dataframe_to_anonymization, [str(column)], str(column))
-        rows = p.anonymize_t_closeness(k=3, p=0.2)
-        dfn = pd.DataFrame(rows)
+    return rows_to_anonymize
 
-        for row in range(0, len(dfn)):
-            from_anonymization_dataframe = (
-                from_anonymization_dataframe
-                + [dfn[str(column)][row]] * dfn["count"][row]
-            )
 
-        anonymization_dataframe[str(column)] = from_anonymization_dataframe
+def _read_partitions(
+    client_table_connection: TableConnection,
+    primary_key_name: str,
+    columns_names: list[str],
+) -> Iterator[pd.DataFrame]:
+    # Run on pipeline reader thread, with its own connection
+    primary_key_column = client_table_connection.get_column(
+        column_name=primary_key_name
+    )
 
-    # Reorganize primary key elements
-    anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
+    statement = (
+        select(
+            primary_key_column,
+            *[
+                client_table_connection.get_column(column_name=column_name)
+                for column_name in columns_names
+            ],
+        )
+        .order_by(primary_key_column)
+        .limit(_anonypy_partition_size)
+    )
+
+    with client_table_connection.engine.connect() as connection:
+        # Keyset pagination, so no cursor is left open between partitions
+        results = connection.execute(statement).fetchall()
 
-    # Get anonymized data to update
-    dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
+        while results:
+            yield _to_dataframe(
+                rows=[row._asdict() for row in results],
+                primary_key_name=primary_key_name,
+                columns_names=columns_names,
+            )
 
-    # Update data
-    for row_anonymized in dictionary_anonymized_data:
-        session_client_db.query(table_client_db).filter(
-            table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-        ).update(row_anonymized)
+            results = connection.execute(
+                statement.where(primary_key_column > results[-1][0])
+            ).fetchall()
+
+
+def anonymization_database(
+    context: AnonymizationContext,
+    client_table_connection: TableConnection,
+    columns_to_anonymize: list[str],
+) -> None:
+    """
+    This function anonymizes a table with the
+    Anonypy Anonymizer, on partitions of table run by a process pool.
+
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
+
+    client_table_connection : TableConnection
+        Connection of Client Database table.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    Returns
+    -------
+    None
+    """
+
+    # Staging table is reused by all partitions of the scan
+    bulk_updater = BulkUpdater(
+        connection=client_table_connection.session.connection(),
+        table=client_table_connection.table,
+        primary_key_name=context.primary_key_name,
+        columns_names=columns_to_anonymize,
+    )
 
-    session_client_db.commit()
-    session_client_db.close()
+    try:
+        run_batch_pipeline(
+            batches=_read_partitions(
+                client_table_connection=client_table_connection,
+                primary_key_name=context.primary_key_name,
+                columns_names=columns_to_anonymize,
+            ),
+            process_batch=_anonymize_partition,
+            process_args=(columns_to_anonymize,),
+            write_batch=lambda dataframe, new_values: bulk_updater.update(
+                rows=_to_rows(
+                    dataframe=dataframe,
+                    primary_key_name=context.primary_key_name,
+                    new_values=new_values,
+                )
+            ),
+            workers=_anonypy_workers,
+            queue_size=2 * _anonypy_workers,
+        )
+    finally:
+        bulk_updater.close()
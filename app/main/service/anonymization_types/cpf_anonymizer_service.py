@@ -1,13 +1,10 @@
 from faker import Faker
-from sqlalchemy import select
 
 from app.main.config import app_config
-from app.main.service.global_service import TableConnection, get_primary_key_name
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymization_types.keyed_generator_service import generate_cpf
 
-_batch_selection_size = app_config.BATCH_SELECTION_SIZE
-
-DATABASE_ID = None
-TABLE_NAME = None
+_anonymization_generator = app_config.ANONYMIZATION_GENERATOR
 
 
 def anonymization_cpf(seed: str) -> str:
@@ -25,179 +22,52 @@ def anonymization_cpf(seed: str) -> str:
         New cpf generated.
     """
 
-    # Define generator seed
-    Faker.seed(seed)
+    # Keyed generator, without a new Faker instance per row
+    if _anonymization_generator == "keyed":
+        return generate_cpf(seed=seed)
 
     # Create cpf generator and define data language
     faker = Faker(["pt_BR"])
 
+    # Define generator seed, of this instance only
+    faker.seed_instance(seed)
+
     # Generate new cpf
     new_cpf = faker.cpf()
 
     return str(new_cpf)
 
 
-def anonymization_data(
-    primary_key_name: str,
-    rows_to_anonymize: list[dict],
-    columns_to_anonymize: list[str],
-) -> list[dict]:
+def anonymization_columns(
+    context: AnonymizationContext, primary_keys: list, columns: dict[str, list]
+) -> dict[str, list]:
     """
-    This function anonymizes each column of each given row with
+    This function anonymizes the given columns of a batch of rows with
     the CPF Anonymizar.
 
     Parameters
     ----------
-    primary_key_name : str
-        Primary key column name.
-
-    row_to_anonymize : list[dict]
-        Rows provided for anonymization.
-
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
-
-    Returns
-    -------
-    list[dict]
-        Anonymized rows
-    """
-
-    for number_row in range(len(rows_to_anonymize)):
-        # Get primary key value
-        primary_key_value = rows_to_anonymize[number_row][primary_key_name]
-
-        # Generate new cpf
-        new_email = anonymization_cpf(
-            seed=f"database{DATABASE_ID}table{TABLE_NAME}primary_key{primary_key_value}"
-        )
-
-        # Add new cpf in chosen columns to anonymize
-        for column in columns_to_anonymize:
-            rows_to_anonymize[number_row][column] = new_email
-
-    return rows_to_anonymize
-
-
-def anonymization_database_rows(
-    client_table_connection: TableConnection,
-    columns_to_anonymize: list[str],
-    rows_to_anonymize: list[dict],
-    insert_database: bool = True,
-) -> list[dict]:
-    """
-    This function anonymizes each the given rows with the
-    CPF Anonymizar.
-
-    Parameters
-    ----------
-    database_url : str
-        Connection URI of Client Database.
-
-    table_name : str
-        Table name where anonymization will be performed.
-
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
-
-    rows_to_anonymize : list[dict]
-        Rows provided for anonymization.
-
-    insert_database : bool
-        Flag to indicate if anonymized rows will be inserted or returned.
-
-    Returns
-    -------
-    list[dict]
-        Anonymized rows
-    """
-
-    # Get primary key column name of Client Database
-    primary_key_name = get_primary_key_name(
-        database_url=client_table_connection.engine.url,
-        table_name=client_table_connection.table_name,
-    )
-
-    # Run anonymization
-    anonymized_rows = anonymization_data(
-        primary_key_name=primary_key_name,
-        rows_to_anonymize=rows_to_anonymize,
-        columns_to_anonymize=columns_to_anonymize,
-    )
-
-    # Insert anonymized rows in database
-    if insert_database:
-        for anonymized_row in anonymized_rows:
-            client_table_connection.session.query(client_table_connection.table).filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == anonymized_row[f"{primary_key_name}"]
-            ).update({key: anonymized_row[key] for key in columns_to_anonymize})
-
-        client_table_connection.session.flush()
-
-    return anonymized_rows
-
-
-def anonymization_database(
-    database_id,
-    client_table_connection: TableConnection,
-    columns_to_anonymize: list[str],
-) -> None:
-    """
-    This function anonymizes a table with the
-    CPF Anonymizer.
-
-    Parameters
-    ----------
-    database_url : str
-        Connection URI of Client Database
+    context : AnonymizationContext
+        Context of anonymization run.
 
-    table_name : str
-        Table name where anonymization will be performed
+    primary_keys : list
+        Primary key values of rows.
 
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
+    columns : dict[str, list]
+        Values of each column chosen for anonymization, in the order of
+        primary keys.
 
     Returns
     -------
-    None
+    dict[str, list]
+        Anonymized values of each column.
     """
 
-    DATABASE_ID = database_id
-    TABLE_NAME = client_table_connection.table_name
-
-    # Get primary key column name of Client Database
-    primary_key_name = get_primary_key_name(
-        database_url=client_table_connection.engine.url,
-        table_name=client_table_connection.table_name,
-    )
-
-    # Get rows on batch for anonymization
-    results_proxy = client_table_connection.session.execute(
-        select(client_table_connection.table)
-    )
-
-    results = results_proxy.fetchmany(_batch_selection_size)  # Getting rows database
-
-    while results:
-        # Transform rows from tuples to dictionary
-        rows_to_anonymize = [row._asdict() for row in results]
-
-        # Run anonymization
-        anonymized_rows = anonymization_data(
-            primary_key_name=primary_key_name,
-            rows_to_anonymize=rows_to_anonymize,
-            columns_to_anonymize=columns_to_anonymize,
-        )
-
-        # Insert anonymized rows in database
-        for anonymized_row in anonymized_rows:
-            client_table_connection.session.query(client_table_connection.table).filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == anonymized_row[f"{primary_key_name}"]
-            ).update({key: anonymized_row[key] for key in columns_to_anonymize})
-
-        client_table_connection.session.flush()
+    # Generate new cpf of each row
+    new_cpfs = [
+        anonymization_cpf(seed=context.row_seed(primary_key_value=primary_key_value))
+        for primary_key_value in primary_keys
+    ]
 
-        # Getting rows for anonymization
-        results = results_proxy.fetchmany(_batch_selection_size)
+    # Same new cpf in all chosen columns of row
+    return {column: list(new_cpfs) for column in columns}
@@ -0,0 +1,295 @@
+import logging
+import sys
+import threading
+from array import array
+from functools import reduce
+
+import numpy as np
+from Crypto.Cipher import AES
+
+from app.main.config import app_config
+from app.main.service.database_key_service import KeyCache
+
+if sys.version_info < (3, 3):
+    import netaddr
+else:
+    import ipaddress
+
+_logger = logging.getLogger(__name__)
+
+_cryptopan_cache_size = app_config.CRYPTOPAN_CACHE_SIZE
+
+# Prefix lengths whose flip bits are cached, by ip version
+_CACHED_PREFIXES = {4: (8, 16, 24), 6: (16, 32, 48, 64)}
+
+# Max number of blocks encrypted by a single AES call of a batch
+_BATCH_BLOCKS = 65536
+
+# Key of ip and date anonymizers
+CRYPTOPAN_KEY = bytes(range(32))
+
+# Process-wide CryptoPAn instances by key
+_cryptopan_instances = {}
+_cryptopan_instances_lock = threading.Lock()
+
+
+class AddressValueError(ValueError):
+    """Exception class raised when the IP address parser (the netaddr
+    module in Python < 3.3 or ipaddress module) failed.
+    """
+
+    pass
+
+
+class CryptoPAn(object):
+    """Anonymize IP addresses keepting prefix consitency."""
+
+    def __init__(self, key):
+        """Initialize a CryptoPAn() instance.
+        Args:
+            key: a 32 bytes object used for AES key and padding when
+                 performing a block cipher operation. The first 16 bytes
+                 are used for the AES key, and the latter for padding.
+        Changelog: A bytes object (not string) is required for python3.
+        """
+        assert len(key) == 32
+        if sys.version_info.major < 3:
+            assert type(key) is str
+        else:
+            assert type(key) is bytes
+        self._cipher = AES.new(key[:16], AES.MODE_ECB)
+        self._padding = array("B")
+        if sys.version_info.major == 2:
+            # for Python2
+            self._padding.fromstring(self._cipher.encrypt(key[16:]))
+        else:
+            # for Python3 (and later?)
+            self._padding.frombytes(self._cipher.encrypt(key[16:]))
+        self._padding_int = self._to_int(self._padding)
+        self._gen_masks()
+
+        # Flip bits of address prefixes by (version, prefix length, prefix)
+        self._prefixes_cache = KeyCache(max_size=_cryptopan_cache_size)
+
+        # Padding and prefix masks as bytes, for batches of addresses
+        self._padding_bytes = np.frombuffer(self._padding.tobytes(), dtype=np.uint8)
+        self._prefix_masks = np.array(
+            [
+                np.frombuffer(
+                    (self._masks[0] ^ self._masks[pos]).to_bytes(16, "big"),
+                    dtype=np.uint8,
+                )
+                for pos in range(128)
+            ]
+        )
+
+    def _gen_masks(self):
+        """Generates an array of bit masks to calculate n-bits padding data."""
+        mask128 = reduce(lambda x, y: (x << 1) | y, [1] * 128)
+        self._masks = [0] * 128
+        for l in range(128):
+            # self._masks[0]   <- 128bits all 1
+            # self._masks[127] <- 1
+            self._masks[l] = mask128 >> l
+
+    def _to_array(self, int_value, int_value_len):
+        """Convert an int value to a byte array."""
+        return array("B", int_value.to_bytes(int_value_len, "big"))
+
+    def _to_int(self, byte_array):
+        """Convert a byte array to an int value."""
+        return reduce(lambda x, y: (x << 8) | y, byte_array)
+
+    def anonymize(self, addr):
+        """Anonymize an IP address represented as a text string.
+        Args:
+            addr: an IP address string.
+        Returns:
+            An anoymized IP address string.
+        """
+        aaddr = None
+        if sys.version_info < (3, 3):
+            # for Python before 3.3
+            try:
+                ip = netaddr.IPNetwork(addr)
+            except netaddr.AddrFormatError:
+                raise AddressValueError
+            aaddr = self.anonymize_bin(ip.value, ip.version)
+        else:
+            # for newer Python3 (and later?)
+            try:
+                ip = ipaddress.ip_address(addr)
+            except (ValueError, ipaddress.AddressValueError) as e:
+                raise AddressValueError
+            aaddr = self.anonymize_bin(int(ip), ip.version)
+        return self._to_text(aaddr, ip.version)
+
+    def _to_text(self, aaddr, version):
+        """Format an anonymized IP address value as a text string."""
+        if version == 4:
+            return "%d.%d.%d.%d" % (
+                aaddr >> 24,
+                (aaddr >> 16) & 0xFF,
+                (aaddr >> 8) & 0xFF,
+                aaddr & 0xFF,
+            )
+        else:
+            return "%x:%x:%x:%x:%x:%x:%x:%x" % (
+                aaddr >> 112,
+                (aaddr >> 96) & 0xFFFF,
+                (aaddr >> 80) & 0xFFFF,
+                (aaddr >> 64) & 0xFFFF,
+                (aaddr >> 48) & 0xFFFF,
+                (aaddr >> 32) & 0xFFFF,
+                (aaddr >> 16) & 0xFFFF,
+                aaddr & 0xFFFF,
+            )
+
+    def anonymize_bin(self, addr, version):
+        """Anonymize an IP address represented as an integer value.
+        Args:
+            addr: an IP address value.
+            version: the version of the address (either 4 or 6)
+        Returns:
+            An anoymized IP address value.
+        """
+        assert version == 4 or version == 6
+        if version == 4:
+            pos_max = 32
+            ext_addr = addr << 96
+        else:
+            pos_max = 128
+            ext_addr = addr
+
+        # Resume from flip bits of the longest cached prefix of address
+        pos_start = 0
+        result = 0
+        for prefix_length in reversed(_CACHED_PREFIXES[version]):
+            cached_result = self._prefixes_cache.get(
+                (version, prefix_length, ext_addr >> (128 - prefix_length))
+            )
+            if cached_result is not None:
+                pos_start = prefix_length
+                result = cached_result
+                break
+
+        for pos in range(pos_start, pos_max):
+            # Flip bits before pos only depend on the first pos bits of address
+            if pos > pos_start and pos in _CACHED_PREFIXES[version]:
+                self._prefixes_cache.put(
+                    (version, pos, ext_addr >> (128 - pos)), result
+                )
+
+            prefix = ext_addr >> (128 - pos) << (128 - pos)
+            padded_addr = prefix | (self._padding_int & self._masks[pos])
+            if sys.version_info.major == 2:
+                # for Python2
+                f = self._cipher.encrypt(self._to_array(padded_addr, 16).tostring())
+            else:
+                # for Python3 (and later?)
+                f = self._cipher.encrypt(self._to_array(padded_addr, 16).tobytes())
+            result = (result << 1) | (bytearray(f)[0] >> 7)
+
+        return addr ^ result
+
+    def anonymize_batch(self, addrs):
+        """Anonymize a batch of IP addresses represented as text strings.
+        Args:
+            addrs: a list of IP address strings, IPv4 and IPv6 may be mixed.
+        Returns:
+            A list of anoymized IP address strings, the same as anonymize
+            returns for each address.
+        """
+        ips = []
+        for addr in addrs:
+            try:
+                ips.append(ipaddress.ip_address(addr))
+            except (ValueError, ipaddress.AddressValueError) as e:
+                raise AddressValueError
+
+        anonymized_addrs = [None] * len(ips)
+        for version in (4, 6):
+            indexes = [index for index, ip in enumerate(ips) if ip.version == version]
+            if not indexes:
+                continue
+
+            aaddrs = self.anonymize_bin_batch(
+                [int(ips[index]) for index in indexes], version
+            )
+            for index, aaddr in zip(indexes, aaddrs):
+                anonymized_addrs[index] = self._to_text(aaddr, version)
+
+        return anonymized_addrs
+
+    def anonymize_bin_batch(self, addrs, version):
+        """Anonymize a batch of IP addresses represented as integer values.
+        Args:
+            addrs: a list of IP address values of the same version.
+            version: the version of the addresses (either 4 or 6)
+        Returns:
+            A list of anoymized IP address values.
+        """
+        assert version == 4 or version == 6
+        if version == 4:
+            pos_max = 32
+            ext_shift = 96
+        else:
+            pos_max = 128
+            ext_shift = 0
+
+        # Repeated addresses are encrypted once
+        unique_addrs = list(dict.fromkeys(addrs))
+        ext_addrs = np.frombuffer(
+            b"".join((addr << ext_shift).to_bytes(16, "big") for addr in unique_addrs),
+            dtype=np.uint8,
+        ).reshape(-1, 16)
+
+        prefix_masks = self._prefix_masks[:pos_max]
+        padding = self._padding_bytes & ~prefix_masks
+
+        results = []
+        batch_size = max(_BATCH_BLOCKS // pos_max, 1)
+        for start in range(0, len(unique_addrs), batch_size):
+            batch = ext_addrs[start : start + batch_size]
+
+            # One padded block for each address and bit position
+            blocks = (batch[:, None, :] & prefix_masks) | padding
+            encrypted = np.frombuffer(
+                self._cipher.encrypt(blocks.tobytes()), dtype=np.uint8
+            ).reshape(len(batch), pos_max, 16)
+
+            # Flip bit is the first bit of each encrypted block
+            flips = np.packbits(encrypted[:, :, 0] >> 7, axis=1)
+            results += [int.from_bytes(flip.tobytes(), "big") for flip in flips]
+
+        anonymized = {
+            addr: addr ^ result for addr, result in zip(unique_addrs, results)
+        }
+
+        return [anonymized[addr] for addr in addrs]
+
+
+def get_cryptopan(key: bytes = CRYPTOPAN_KEY) -> CryptoPAn:
+    """
+    This function returns the process-wide CryptoPAn instance of a key,
+    creating it on first use.
+
+    Parameters
+    ----------
+    key : bytes
+        32 bytes key of CryptoPAn.
+
+    Returns
+    -------
+    CryptoPAn
+        CryptoPAn instance shared by all threads.
+    """
+
+    with _cryptopan_instances_lock:
+        cryptopan = _cryptopan_instances.get(key)
+
+        if cryptopan is None:
+            cryptopan = CryptoPAn(key)
+            _cryptopan_instances[key] = cryptopan
+
+    return cryptopan
@@ -1,208 +1,134 @@
-import datetime
+import hashlib
+import hmac
 
-from faker import Faker
-from sqlalchemy import select
+import numpy as np
 
 from app.main.config import app_config
-from app.main.service.global_service import TableConnection, get_primary_key_name
-
-_batch_selection_size = app_config.BATCH_SELECTION_SIZE
-
-DATABASE_ID = None
-TABLE_NAME = None
-
-
-def anonymization_date(seed: str) -> str:
-    """
-    This function generates new date.
-
-    Parameters
-    ----------
-    seed : str
-        Seed value.
-
-    Returns
-    -------
-    str
-        New date generated.
-    """
-
-    # Define generator seed
-    Faker.seed(seed)
-
-    # Create date generator and define data language
-    faker = Faker(["pt_BR"])
-
-    # Generate new date
-    new_date = faker.date_between(
-        start_date=datetime.datetime(1950, 1, 1),
-        end_date=datetime.datetime(2022, 12, 31),
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymization_types.keyed_generator_service import (
+    get_generator_key,
+    has_generator_key,
+)
+
+_keyed_generator = app_config.ANONYMIZATION_GENERATOR == "keyed"
+
+# Range of new dates
+_START_DATE = np.datetime64("1950-01-01", "D")
+_END_DATE = np.datetime64("2022-12-31", "D")
+
+_UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def _splitmix64(values: np.ndarray) -> np.ndarray:
+    # Bijective 64 bits mix, applied to all values at once
+    with np.errstate(over="ignore"):
+        values = values + np.uint64(0x9E3779B97F4A7C15)
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+
+    return values ^ (values >> np.uint64(31))
+
+
+def _primary_keys_as_integers(primary_keys: list) -> np.ndarray:
+    if all(
+        isinstance(primary_key, int) and not isinstance(primary_key, bool)
+        for primary_key in primary_keys
+    ):
+        try:
+            return np.array(primary_keys, dtype=np.int64).astype(np.uint64)
+        except OverflowError:
+            # Keys out of int64, as BIGINT UNSIGNED, masked to 64 bits, the
+            # same bits as the int64 path for the other keys
+            return np.array(
+                [primary_key & _UINT64_MASK for primary_key in primary_keys],
+                dtype=np.uint64,
+            )
+
+    # Other primary key types are hashed one by one
+    return np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(str(primary_key).encode(), digest_size=8).digest(),
+                "big",
+            )
+            for primary_key in primary_keys
+        ],
+        dtype=np.uint64,
     )
 
-    return str(new_date)
 
-
-def anonymization_data(
-    primary_key_name: str,
-    rows_to_anonymize: list[dict],
-    columns_to_anonymize: list[str],
-) -> list[dict]:
+def anonymization_dates(
+    context: AnonymizationContext, primary_keys: list
+) -> np.ndarray:
     """
-    This function anonymizes each column of each given row with
-    the Date Anonymizar.
+    This function generates a new date for each row, between 1950-01-01
+    and 2022-12-31, from its primary key and the database and table of
+    the run.
 
     Parameters
     ----------
-    primary_key_name : str
-        Primary key column name.
-
-    row_to_anonymize : list[dict]
-        Rows provided for anonymization.
+    context : AnonymizationContext
+        Context of anonymization run.
 
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
+    primary_keys : list
+        Primary key values of rows.
 
     Returns
     -------
-    list[dict]
-        Anonymized rows
+    np.ndarray
+        New dates generated, as datetime64[D].
     """
 
-    for number_row in range(len(rows_to_anonymize)):
-        # Get primary key value
-        primary_key_value = rows_to_anonymize[number_row][primary_key_name]
+    # Seed of rows of table, keyed with the generator key when it is set,
+    # as required by the keyed generator
+    if _keyed_generator or has_generator_key():
+        digest = hmac.new(
+            get_generator_key(),
+            context.table_seed.encode(),
+            hashlib.sha256,
+        ).digest()
 
-        # Generate new date
-        new_date = anonymization_date(
-            seed=f"database{DATABASE_ID}table{TABLE_NAME}primary_key{primary_key_value}"
-        )
+    # Unkeyed seed otherwise, as the seeds of faker generator
+    else:
+        digest = hashlib.sha256(context.table_seed.encode()).digest()
 
-        # Add new date in chosen columns to anonymize
-        for column in columns_to_anonymize:
-            rows_to_anonymize[number_row][column] = new_date
+    table_seed = np.uint64(int.from_bytes(digest[:8], "big"))
 
-    return rows_to_anonymize
-
-
-def anonymization_database_rows(
-    client_table_connection: TableConnection,
-    columns_to_anonymize: list[str],
-    rows_to_anonymize: list[dict],
-    insert_database: bool = True,
-) -> list[dict]:
-    """
-    This function anonymizes each the given rows with the
-    Date Anonymizar.
-
-    Parameters
-    ----------
-    database_url : str
-        Connection URI of Client Database.
+    hashes = _splitmix64(_primary_keys_as_integers(primary_keys) ^ table_seed)
 
-    table_name : str
-        Table name where anonymization will be performed.
+    number_days = int((_END_DATE - _START_DATE).astype(np.int64)) + 1
+    offsets = (hashes % np.uint64(number_days)).astype(np.int64)
 
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
+    return _START_DATE + offsets
 
-    rows_to_anonymize : list[dict]
-        Rows provided for anonymization.
 
-    insert_database : bool
-        Flag to indicate if anonymized rows will be inserted or returned.
-
-    Returns
-    -------
-    list[dict]
-        Anonymized rows
+def anonymization_columns(
+    context: AnonymizationContext, primary_keys: list, columns: dict[str, list]
+) -> dict[str, list]:
     """
-
-    # Get primary key column name of Client Database
-    primary_key_name = get_primary_key_name(
-        database_url=client_table_connection.engine.url,
-        table_name=client_table_connection.table_name,
-    )
-
-    # Run anonymization
-    anonymized_rows = anonymization_data(
-        primary_key_name=primary_key_name,
-        rows_to_anonymize=rows_to_anonymize,
-        columns_to_anonymize=columns_to_anonymize,
-    )
-
-    # Insert anonymized rows in database
-    if insert_database:
-        for anonymized_row in anonymized_rows:
-            client_table_connection.session.query(client_table_connection.table).filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == anonymized_row[f"{primary_key_name}"]
-            ).update({key: anonymized_row[key] for key in columns_to_anonymize})
-
-        client_table_connection.session.flush()
-
-    return anonymized_rows
-
-
-def anonymization_database(
-    database_id,
-    client_table_connection: TableConnection,
-    columns_to_anonymize: list[str],
-) -> None:
-    """
-    This function anonymizes a table with the
-    Date Anonymizer.
+    This function anonymizes the given columns of a batch of rows with
+    the Date Anonymizar.
 
     Parameters
     ----------
-    database_url : str
-        Connection URI of Client Database
+    context : AnonymizationContext
+        Context of anonymization run.
 
-    table_name : str
-        Table name where anonymization will be performed
+    primary_keys : list
+        Primary key values of rows.
 
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
+    columns : dict[str, list]
+        Values of each column chosen for anonymization, in the order of
+        primary keys.
 
     Returns
     -------
-    None
+    dict[str, list]
+        Anonymized values of each column.
     """
 
-    DATABASE_ID = database_id
-    TABLE_NAME = client_table_connection.table_name
-
-    # Get primary key column name of Client Database
-    primary_key_name = get_primary_key_name(
-        database_url=client_table_connection.engine.url,
-        table_name=client_table_connection.table_name,
-    )
-
-    # Get rows on batch for anonymization
-    results_proxy = client_table_connection.session.execute(
-        select(client_table_connection.table)
-    )
-
-    results = results_proxy.fetchmany(_batch_selection_size)  # Getting rows database
-
-    while results:
-        # Transform rows from tuples to dictionary
-        rows_to_anonymize = [row._asdict() for row in results]
-
-        # Run anonymization
-        anonymized_rows = anonymization_data(
-            primary_key_name=primary_key_name,
-            rows_to_anonymize=rows_to_anonymize,
-            columns_to_anonymize=columns_to_anonymize,
-        )
-
-        # Insert anonymized rows in database
-        for anonymized_row in anonymized_rows:
-            client_table_connection.session.query(client_table_connection.table).filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == anonymized_row[f"{primary_key_name}"]
-            ).update({key: anonymized_row[key] for key in columns_to_anonymize})
-
-        client_table_connection.session.flush()
+    # Generate new dates of all rows, as date objects
+    new_dates = anonymization_dates(context=context, primary_keys=primary_keys).tolist()
 
-        # Getting rows for anonymization
-        results = results_proxy.fetchmany(_batch_selection_size)
+    # Same new date in all chosen columns of row
+    return {column: list(new_dates) for column in columns}
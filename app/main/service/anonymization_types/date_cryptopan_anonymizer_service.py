@@ -1,158 +1,30 @@
-import logging
-import sys
-from array import array
+import hashlib
+import os
+import threading
+from datetime import date as datetime_date
 from datetime import datetime
-from functools import reduce
 
-from Crypto.Cipher import AES
+import numpy as np
 
 from app.main.config import app_config
-from app.main.service.global_service import TableConnection, get_primary_key_name
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymization_types.cryptopan_service import (
+    CRYPTOPAN_KEY,
+    get_cryptopan,
+)
 
-_batch_selection_size = app_config.BATCH_SELECTION_SIZE
+_anonymization_cache_dir = app_config.ANONYMIZATION_CACHE_DIR
 
-DATABASE_ID = None
-TABLE_NAME = None
+# Calendar days of the lookup table, others are anonymized one by one
+_TABLE_START = datetime_date(1900, 1, 1)
+_TABLE_END = datetime_date(2099, 12, 31)
 
-from sqlalchemy import select
+# Lookup tables by key, as year * 10000 + month * 100 + day
+_date_tables = {}
+_date_tables_lock = threading.Lock()
 
-if sys.version_info < (3, 3):
-    import netaddr
-else:
-    import ipaddress
 
-_logger = logging.getLogger(__name__)
-
-
-class AddressValueError(ValueError):
-    """Exception class raised when the IP address parser (the netaddr
-    module in Python < 3.3 or ipaddress module) failed.
-    """
-
-    pass
-
-
-class CryptoPAn(object):
-    """Anonymize IP addresses keepting prefix consitency."""
-
-    def __init__(self, key):
-        """Initialize a CryptoPAn() instance.
-        Args:
-            key: a 32 bytes object used for AES key and padding when
-                 performing a block cipher operation. The first 16 bytes
-                 are used for the AES key, and the latter for padding.
-        Changelog: A bytes object (not string) is required for python3.
-        """
-        assert len(key) == 32
-        if sys.version_info.major < 3:
-            assert type(key) is str
-        else:
-            assert type(key) is bytes
-        self._cipher = AES.new(key[:16], AES.MODE_ECB)
-        self._padding = array("B")
-        if sys.version_info.major == 2:
-            # for Python2
-            self._padding.fromstring(self._cipher.encrypt(key[16:]))
-        else:
-            # for Python3 (and later?)
-            self._padding.frombytes(self._cipher.encrypt(key[16:]))
-        self._padding_int = self._to_int(self._padding)
-        self._gen_masks()
-
-    def _gen_masks(self):
-        """Generates an array of bit masks to calculate n-bits padding data."""
-        mask128 = reduce(lambda x, y: (x << 1) | y, [1] * 128)
-        self._masks = [0] * 128
-        for l in range(128):
-            # self._masks[0]   <- 128bits all 1
-            # self._masks[127] <- 1
-            self._masks[l] = mask128 >> l
-
-    def _to_array(self, int_value, int_value_len):
-        """Convert an int value to a byte array."""
-        byte_array = array("B")
-        for i in range(int_value_len):
-            byte_array.insert(0, (int_value >> (i * 8)) & 0xFF)
-        return byte_array
-
-    def _to_int(self, byte_array):
-        """Convert a byte array to an int value."""
-        return reduce(lambda x, y: (x << 8) | y, byte_array)
-
-    def anonymize(self, addr):
-        """Anonymize an IP address represented as a text string.
-        Args:
-            addr: an IP address string.
-        Returns:
-            An anoymized IP address string.
-        """
-        aaddr = None
-        if sys.version_info < (3, 3):
-            # for Python before 3.3
-            try:
-                ip = netaddr.IPNetwork(addr)
-            except netaddr.AddrFormatError:
-                raise AddressValueError
-            aaddr = self.anonymize_bin(ip.value, ip.version)
-        else:
-            # for newer Python3 (and later?)
-            try:
-                ip = ipaddress.ip_address(addr)
-            except (ValueError, ipaddress.AddressValueError) as e:
-                raise AddressValueError
-            aaddr = self.anonymize_bin(int(ip), ip.version)
-        if ip.version == 4:
-            return "%d.%d.%d.%d" % (
-                aaddr >> 24,
-                (aaddr >> 16) & 0xFF,
-                (aaddr >> 8) & 0xFF,
-                aaddr & 0xFF,
-            )
-        else:
-            return "%x:%x:%x:%x:%x:%x:%x:%x" % (
-                aaddr >> 112,
-                (aaddr >> 96) & 0xFFFF,
-                (aaddr >> 80) & 0xFFFF,
-                (aaddr >> 64) & 0xFFFF,
-                (aaddr >> 48) & 0xFFFF,
-                (aaddr >> 32) & 0xFFFF,
-                (aaddr >> 16) & 0xFFFF,
-                aaddr & 0xFFFF,
-            )
-
-    def anonymize_bin(self, addr, version):
-        """Anonymize an IP address represented as an integer value.
-        Args:
-            addr: an IP address value.
-            version: the version of the address (either 4 or 6)
-        Returns:
-            An anoymized IP address value.
-        """
-        assert version == 4 or version == 6
-        if version == 4:
-            pos_max = 32
-            ext_addr = addr << 96
-        else:
-            pos_max = 128
-            ext_addr = addr
-
-        flip_array = []
-        for pos in range(pos_max):
-            prefix = ext_addr >> (128 - pos) << (128 - pos)
-            padded_addr = prefix | (self._padding_int & self._masks[pos])
-            if sys.version_info.major == 2:
-                # for Python2
-                f = self._cipher.encrypt(self._to_array(padded_addr, 16).tostring())
-            else:
-                # for Python3 (and later?)
-                f = self._cipher.encrypt(self._to_array(padded_addr, 16).tobytes())
-            flip_array.append(bytearray(f)[0] >> 7)
-        result = reduce(lambda x, y: (x << 1) | y, flip_array)
-
-        return addr ^ result
-
-
-def anonymize_date(date):
+def _anonymize_date(date):
     # Convert from date to string
     date = str(date)
 
@@ -184,7 +56,7 @@ def anonymize_date(date):
     date_as_ip = f"{day}.{month}.{year_part1}.{year_part2}"
 
     # Run anonymization ip
-    cp = CryptoPAn("".join([chr(x) for x in range(0, 32)]).encode())
+    cp = get_cryptopan(key=CRYPTOPAN_KEY)
     anonymized_ip = cp.anonymize(str(date_as_ip))
 
     # Split ip by '.'
@@ -234,155 +106,155 @@ def anonymize_date(date):
     return datetime_str
 
 
-def anonymization_data(
-    rows_to_anonymize: list,
-    columns_to_anonymize: list,
-) -> list:
-    """
-    This function anonymizes each column of each given row with
-    the Date Cryptopan Anonymizer.
+def _date_ordinal(date) -> int | None:
+    # Calendar day of date objects and "YYYY-MM-DD" strings
+    if isinstance(date, datetime):
+        return None
 
-    Parameters
-    ----------
-    row_to_anonymize : list
-        Rows provided for anonymization.
+    if isinstance(date, datetime_date):
+        return date.toordinal()
 
-    columns_to_anonymize : list
-        Column names chosen for anonymization.
+    if isinstance(date, str) and len(date) == 10:
+        try:
+            return datetime_date.fromisoformat(date).toordinal()
+        except ValueError:
+            return None
 
-    Returns
-    -------
-    list
-        Anonymized rows
-    """
+    return None
 
-    for number_row in range(len(rows_to_anonymize)):
-        # Anonymize_date
-        for column in columns_to_anonymize:
-            rows_to_anonymize[number_row][column] = anonymize_date(
-                rows_to_anonymize[number_row][column]
-            )
 
-    return rows_to_anonymize
+def _build_date_table(cp) -> np.ndarray:
+    days = np.arange(
+        np.datetime64(_TABLE_START),
+        np.datetime64(_TABLE_END) + 1,
+        dtype="datetime64[D]",
+    )
+    years = days.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    month_days = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
 
+    # Same ip of _anonymize_date: day.month.century.year of century
+    date_as_ips = (
+        (month_days << 24) | (months << 16) | (years // 100 << 8) | years % 100
+    )
+    anonymized_ips = np.array(
+        cp.anonymize_bin_batch(date_as_ips.tolist(), 4), dtype=np.int64
+    )
 
-def anonymization_database_rows(
-    client_table_connection: TableConnection,
-    columns_to_anonymize: list[str],
-    rows_to_anonymize: list[dict],
-    insert_database: bool = True,
-) -> list[dict]:
-    """
-    This function anonymizes each the given rows with the
-    Date Anonymizar.
+    day = (anonymized_ips >> 24) % 30 + 1
+    month = (anonymized_ips >> 16 & 0xFF) % 12 + 1
+    year_part1 = (anonymized_ips >> 8 & 0xFF) % 99 + 1
+    year_part2 = (anonymized_ips & 0xFF) % 99 + 1
 
-    Parameters
-    ----------
-    database_url : str
-        Connection URI of Client Database.
+    # One digit first part of year is completed with a zero on the right
+    year_part1 = np.where(year_part1 < 10, year_part1 * 10, year_part1)
+    year = year_part1 * 100 + year_part2
 
-    table_name : str
-        Table name where anonymization will be performed.
+    # Error with 30 and 29 on February
+    day = np.where((month == 2) & (day >= 29), 28, day)
 
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
+    return (year * 10000 + month * 100 + day).astype(np.int32)
 
-    rows_to_anonymize : list[dict]
-        Rows provided for anonymization.
 
-    insert_database : bool
-        Flag to indicate if anonymized rows will be inserted or returned.
+def _get_date_table(key: bytes) -> np.ndarray:
+    with _date_tables_lock:
+        date_table = _date_tables.get(key)
 
-    Returns
-    -------
-    list[dict]
-        Anonymized rows
-    """
+        if date_table is not None:
+            return date_table
 
-    # Get primary key column name of Client Database
-    primary_key_name = get_primary_key_name(
-        database_url=client_table_connection.engine.url,
-        table_name=client_table_connection.table_name,
-    )
+        # Table file is named by a hash of key, as the table maps real dates
+        file_path = os.path.join(
+            _anonymization_cache_dir,
+            "date_cryptopan_{}_{}_{}.npy".format(
+                hashlib.sha256(key).hexdigest()[:16],
+                _TABLE_START.isoformat(),
+                _TABLE_END.isoformat(),
+            ),
+        )
 
-    # Run anonymization
-    anonymized_rows = anonymization_data(
-        rows_to_anonymize=rows_to_anonymize,
-        columns_to_anonymize=columns_to_anonymize,
-    )
+        if not os.path.exists(file_path):
+            os.makedirs(_anonymization_cache_dir, mode=0o700, exist_ok=True)
 
-    # Insert anonymized rows in database
-    if insert_database:
-        for anonymized_row in anonymized_rows:
-            client_table_connection.session.query(client_table_connection.table).filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == anonymized_row[f"{primary_key_name}"]
-            ).update({key: anonymized_row[key] for key in columns_to_anonymize})
+            temporary_file_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(temporary_file_path, "wb") as temporary_file:
+                np.save(temporary_file, _build_date_table(cp=get_cryptopan(key=key)))
+            os.chmod(temporary_file_path, 0o600)
+            os.replace(temporary_file_path, file_path)
 
-        client_table_connection.session.flush()
+        date_table = np.load(file_path, mmap_mode="r")
+        _date_tables[key] = date_table
 
-    return anonymized_rows
+    return date_table
 
 
-def anonymization_database(
-    database_id,
-    client_table_connection: TableConnection,
-    columns_to_anonymize: list[str],
-) -> None:
+def anonymize_dates(dates: list) -> list[str]:
     """
-    This function anonymizes a table with the
-    Date Cryptopan Anonymizer.
+    This function anonymizes a batch of dates with a lookup table of
+    the Date Cryptopan Anonymizer, built or loaded on first use.
 
     Parameters
     ----------
-    database_url : str
-        Connection URI of Client Database
-
-    table_name : str
-        Table name where anonymization will be performed
-
-    columns_to_anonymize : list[str]
-        Column names chosen for anonymization.
+    dates : list
+        Dates, as date objects or strings.
 
     Returns
     -------
-    None
+    list[str]
+        Anonymized dates, the same as anonymize_date returns for each date.
     """
 
-    DATABASE_ID = database_id
-    TABLE_NAME = client_table_connection.table_name
-
-    # Get primary key column name of Client Database
-    primary_key_name = get_primary_key_name(
-        database_url=client_table_connection.engine.url,
-        table_name=client_table_connection.table_name,
+    # Index of each date on lookup table, -1 if not a calendar day
+    indexes = (
+        np.array([_date_ordinal(date) or -1 for date in dates], dtype=np.int64)
+        - _TABLE_START.toordinal()
     )
-
-    # Get rows on batch for anonymization
-    results_proxy = client_table_connection.session.execute(
-        select(client_table_connection.table)
+    in_table = (indexes >= 0) & (
+        indexes < _TABLE_END.toordinal() - _TABLE_START.toordinal() + 1
     )
 
-    results = results_proxy.fetchmany(_batch_selection_size)  # Getting rows database
-
-    while results:
-        # Transform rows from tuples to dictionary
-        rows_to_anonymize = [row._asdict() for row in results]
+    anonymized_dates = np.zeros(len(dates), dtype=np.int32)
+    anonymized_dates[in_table] = _get_date_table(key=CRYPTOPAN_KEY)[indexes[in_table]]
 
-        # Run anonymization
-        anonymized_rows = anonymization_data(
-            rows_to_anonymize=rows_to_anonymize,
-            columns_to_anonymize=columns_to_anonymize,
+    return [
+        (
+            "{}-{}-{}".format(value // 10000, value // 100 % 100, value % 100)
+            if found
+            else _anonymize_date(date)
+        )
+        for date, value, found in zip(
+            dates, anonymized_dates.tolist(), in_table.tolist()
         )
+    ]
+
+
+def anonymize_date(date):
+    return anonymize_dates([date])[0]
 
-        # Insert anonymized rows in database
-        for anonymized_row in anonymized_rows:
-            client_table_connection.session.query(client_table_connection.table).filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == anonymized_row[f"{primary_key_name}"]
-            ).update({key: anonymized_row[key] for key in columns_to_anonymize})
 
-        client_table_connection.session.flush()
+def anonymization_columns(
+    context: AnonymizationContext, primary_keys: list, columns: dict[str, list]
+) -> dict[str, list]:
+    """
+    This function anonymizes the given columns of a batch of rows with
+    the Date Cryptopan Anonymizer.
+
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
+
+    primary_keys : list
+        Primary key values of rows.
+
+    columns : dict[str, list]
+        Values of each column chosen for anonymization, in the order of
+        primary keys.
+
+    Returns
+    -------
+    dict[str, list]
+        Anonymized values of each column.
+    """
 
-        # Getting rows for anonymization
-        results = results_proxy.fetchmany(_batch_selection_size)
+    return {column: anonymize_dates(values) for column, values in columns.items()}
@@ -0,0 +1,186 @@
+import hashlib
+import hmac
+import random
+
+from app.main.config import app_config
+from app.main.exceptions import DefaultException
+
+_generator_key = app_config.ANONYMIZATION_GENERATOR_KEY
+
+_FIRST_NAMES = (
+    "Ana Antônio Beatriz Bruno Camila Carlos Clara Daniel Eduarda Eduardo "
+    "Fernanda Felipe Gabriela Gabriel Helena Gustavo Isabela Igor Júlia "
+    "João Larissa José Letícia Lucas Luana Luiz Mariana Marcelo Maria "
+    "Mateus Natália Miguel Paula Paulo Rafaela Pedro Sophia Rafael Vitória "
+    "Thiago Yasmin Vinícius"
+).split()
+
+_LAST_NAMES = (
+    "Almeida Alves Araújo Barbosa Barros Cardoso Carvalho Castro Costa "
+    "Cunha Dias Fernandes Ferreira Freitas Gomes Lima Lopes Martins Melo "
+    "Mendes Monteiro Moraes Moreira Nascimento Nunes Oliveira Pereira Pinto "
+    "Ribeiro Rocha Rodrigues Santos Silva Souza Teixeira Vieira"
+).split()
+
+_EMAIL_DOMAINS = [
+    "bol.com.br",
+    "gmail.com",
+    "hotmail.com",
+    "ig.com.br",
+    "outlook.com",
+    "uol.com.br",
+    "yahoo.com.br",
+]
+
+# Accented letters of vocabularies, replaced on e-mail user names
+_ASCII_TABLE = str.maketrans("áâãàéêíóôõúüç", "aaaaeeiooouuc")
+
+
+def has_generator_key() -> bool:
+    return bool(_generator_key)
+
+
+def get_generator_key() -> bytes:
+    """
+    This function returns the key of keyed generators, which must be set,
+    otherwise generated values are a public function of primary keys.
+
+    Returns
+    -------
+    bytes
+        Generator key.
+    """
+
+    if not _generator_key:
+        raise DefaultException("anonymization_generator_key_not_found", code=500)
+
+    return _generator_key.encode()
+
+
+def _random(seed, label: str) -> random.Random:
+    # Keyed hash of seed, so values can not be reproduced without the key
+    digest = hmac.new(
+        get_generator_key(), f"{label}:{seed}".encode(), hashlib.sha256
+    ).digest()
+
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+def _cpf_checksum(digits: list[int]) -> int:
+    weight = len(digits) + 1
+    remainder = sum(digit * (weight - index) for index, digit in enumerate(digits))
+    remainder %= 11
+
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def generate_cpf(seed) -> str:
+    """
+    This function generates a checksum-valid cpf, formatted as
+    nnn.nnn.nnn-nn.
+
+    Parameters
+    ----------
+    seed : any
+        Seed value.
+
+    Returns
+    -------
+    str
+        New cpf generated.
+    """
+
+    # Independent digits, repeated digits are valid cpf numbers too
+    generator = _random(seed=seed, label="cpf")
+    digits = [generator.randrange(10) for _ in range(9)]
+    digits.append(_cpf_checksum(digits))
+    digits.append(_cpf_checksum(digits))
+
+    cpf = "".join(map(str, digits))
+
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+def generate_rg(seed) -> str:
+    """
+    This function generates a checksum-valid rg, as plain numbers.
+
+    Parameters
+    ----------
+    seed : any
+        Seed value.
+
+    Returns
+    -------
+    str
+        New rg generated.
+    """
+
+    generator = _random(seed=seed, label="rg")
+    digits = [generator.randrange(10) for _ in range(8)]
+    check_digit = 11 - sum(weight * digits[weight - 2] for weight in range(2, 10)) % 11
+
+    if check_digit == 10:
+        digits.append("X")
+    elif check_digit == 11:
+        digits.append(0)
+    else:
+        digits.append(check_digit)
+
+    return "".join(map(str, digits))
+
+
+def generate_name(seed) -> str:
+    """
+    This function generates a name with one or two last names.
+
+    Parameters
+    ----------
+    seed : any
+        Seed value.
+
+    Returns
+    -------
+    str
+        New name generated.
+    """
+
+    generator = _random(seed=seed, label="name")
+
+    names = [generator.choice(_FIRST_NAMES)]
+    names += generator.sample(_LAST_NAMES, generator.randint(1, 2))
+
+    return " ".join(names)
+
+
+def generate_email(seed) -> str:
+    """
+    This function generates an e-mail from a name and a free e-mail
+    domain.
+
+    Parameters
+    ----------
+    seed : any
+        Seed value.
+
+    Returns
+    -------
+    str
+        New e-mail generated.
+    """
+
+    generator = _random(seed=seed, label="email")
+
+    first_name = generator.choice(_FIRST_NAMES).lower().translate(_ASCII_TABLE)
+    last_name = generator.choice(_LAST_NAMES).lower().translate(_ASCII_TABLE)
+
+    user_name = generator.choice(
+        [
+            f"{first_name}.{last_name}",
+            f"{first_name}{last_name}",
+            f"{first_name[0]}{last_name}",
+            f"{first_name}{generator.randint(1, 99)}",
+        ]
+    )
+
+    return f"{user_name}@{generator.choice(_EMAIL_DOMAINS)}"
@@ -1,237 +1,118 @@
 import numpy as np
-import pandas as pd
-import scipy.linalg as la
-from service.database_service import create_table_session, get_primary_key
-from sqlalchemy import MetaData, Table, create_engine, select
-from sqlalchemy.orm import sessionmaker
 
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymization_types.streaming_pca_service import (
+    anonymization_rows,
+    anonymization_table,
+    fit_projection,
+)
+from app.main.service.bulk_write_service import update_rows
+from app.main.service.global_service import TableConnection
 
-def anonymization_database_rows(
-    src_client_db_path, table_name, columns_to_anonymization, rows_to_anonymization
-):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
-
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
-
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
-    )
-
-    # Transform rows database to dataframe
-    dataframe_to_anonymization = pd.DataFrame(data=rows_to_anonymization)
-    dataframe_to_anonymization = dataframe_to_anonymization[columns_to_anonymization]
-
-    # Remove primary key of columns_to_anonymization list
-    # but save elements in save_primary_key_elements
-    save_primary_key_elements = dataframe_to_anonymization[primary_key]
-    dataframe_to_anonymization = dataframe_to_anonymization.drop(primary_key, axis=1)
-    columns_to_anonymization.remove(primary_key)
-
-    # Run anonymization
-    anonymization_dataframe = dataframe_to_anonymization[
-        columns_to_anonymization
-    ].astype("int")
-    anonymization_dataframe = anonymization_dataframe.to_numpy()
-    anonymization_dataframe = anonymization_data(anonymization_dataframe)
-    anonymization_dataframe = pd.DataFrame(
-        data=anonymization_dataframe, columns=columns_to_anonymization
-    )
-
-    # Reorganize primary key elements
-    anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
 
-    # Get anonymized data to update
-    dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
+def anonymization_data(data: np.ndarray) -> np.ndarray:
+    """
+    This function anonymizes the given data with a randomized PCA
+    projection, keeping float values.
 
-    # Update data
-    for row_anonymized in dictionary_anonymized_data:
-        session_client_db.query(table_client_db).filter(
-            table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-        ).update(row_anonymized)
+    Parameters
+    ----------
+    data : np.ndarray
+        Rows provided for anonymization, one column per anonymized column.
 
-    session_client_db.commit()
-    session_client_db.close()
+    Returns
+    -------
+    np.ndarray
+        Anonymized rows.
+    """
 
+    data = np.asarray(data, dtype=np.float64)
 
-def anonymization_database(src_client_db_path, table_name, columns_to_anonymization):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
+    return fit_projection(data=data).transform(data=data)
 
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
-
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
-    )
 
-    # Get data to dataframe
-    from_dataframe = session_client_db.query(table_client_db).all()
-
-    # Transform rows database to dataframe
-    dataframe_to_anonymization = pd.DataFrame(
-        data=from_dataframe, columns=columns_to_anonymization
-    )
-    dataframe_to_anonymization = dataframe_to_anonymization[columns_to_anonymization]
-
-    # Remove primary key of columns_to_anonymization list
-    # but save elements in save_primary_key_elements
-    save_primary_key_elements = dataframe_to_anonymization[primary_key]
-    dataframe_to_anonymization = dataframe_to_anonymization.drop(primary_key, axis=1)
-    columns_to_anonymization.remove(primary_key)
+def anonymization_database_rows(
+    context: AnonymizationContext,
+    client_table_connection: TableConnection,
+    columns_to_anonymize: list[str],
+    rows_to_anonymize: list[dict],
+    insert_database: bool = True,
+) -> list[dict]:
+    """
+    This function anonymizes each the given rows with the
+    PPCBTF Anonymizer, fitted on the given rows only.
+
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
+
+    client_table_connection : TableConnection
+        Connection of Client Database table.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    rows_to_anonymize : list[dict]
+        Rows provided for anonymization.
+
+    insert_database : bool
+        Flag to indicate if anonymized rows will be inserted or returned.
+
+    Returns
+    -------
+    list[dict]
+        Anonymized rows
+    """
 
     # Run anonymization
-    anonymization_dataframe = dataframe_to_anonymization[
-        columns_to_anonymization
-    ].astype("int")
-    anonymization_dataframe = anonymization_dataframe.to_numpy()
-    anonymization_dataframe = anonymization_data(anonymization_dataframe)
-    anonymization_dataframe = pd.DataFrame(
-        data=anonymization_dataframe, columns=columns_to_anonymization
+    anonymized_rows = anonymization_rows(
+        primary_key_name=context.primary_key_name,
+        rows_to_anonymize=rows_to_anonymize,
+        columns_to_anonymize=columns_to_anonymize,
     )
 
-    # Reorganize primary key elements
-    anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
-
-    # Get anonymized data to update
-    dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
-
-    # Update data
-    for row_anonymized in dictionary_anonymized_data:
-        session_client_db.query(table_client_db).filter(
-            table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-        ).update(row_anonymized)
-
-    # Commit changes
-    session_client_db.commit()
-    session_client_db.close()
-
-
-def anonymization_data(data):
-    # calculate the mean of each column
-    mean = np.array(np.mean(data, axis=0).T)
-
-    # center data
-    data_centered = data - mean
-
-    # calculate the covariance matrix
-    cov_matrix = np.cov(data_centered, rowvar=False)
-
-    # calculate the eignvalues and eignvectors
-    evals, evecs = la.eigh(cov_matrix)
-
-    # sort them
-    idx = np.argsort(evals)[::-1]
-
-    # Each columns of this matrix is an eingvector
-    evecs = evecs[:, idx]
-    evals = evals[idx]
-
-    # explained variance
-    variance_retained = np.cumsum(evals) / np.sum(evals)
+    # Insert anonymized rows in database
+    if insert_database:
+        update_rows(
+            connection=client_table_connection.session.connection(),
+            table=client_table_connection.table,
+            primary_key_name=context.primary_key_name,
+            columns_names=columns_to_anonymize,
+            rows=anonymized_rows,
+        )
 
-    # calculate the transformed data
-    data_transformed = np.dot(evecs.T, data_centered.T).T
+    return anonymized_rows
 
-    # randomize eignvectors
-    new_evecs = evecs.copy().T
-    for i in range(len(new_evecs)):
-        np.random.shuffle(new_evecs[i])
-    new_evecs = np.array(new_evecs).T
 
-    # go back to the original dimension
-    data_original_dimension = np.dot(data_transformed, new_evecs.T)
-    data_original_dimension += mean
+def anonymization_database(
+    context: AnonymizationContext,
+    client_table_connection: TableConnection,
+    columns_to_anonymize: list[str],
+) -> None:
+    """
+    This function anonymizes a table with the
+    PPCBTF Anonymizer.
 
-    return data_original_dimension
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
 
+    client_table_connection : TableConnection
+        Connection of Client Database table.
 
-def anonymization_database(src_client_db_path, table_name, columns_to_anonymization):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
 
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
+    Returns
+    -------
+    None
+    """
 
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
+    # Run anonymization, fitted on whole table
+    anonymization_table(
+        client_table_connection=client_table_connection,
+        primary_key_name=context.primary_key_name,
+        columns_to_anonymize=columns_to_anonymize,
     )
-
-    # Run anonymization
-    query_size = 1000
-    statement = select(table_client_db)
-    proxy_client_database = session_client_db.execute(
-        statement
-    )  # Proxy to get data on batch
-    results_query_client_database = proxy_client_database.fetchmany(
-        query_size
-    )  # Getting data
-
-    while results_query_client_database:
-        # Get data to dataframe
-        from_dataframe = []
-
-        for row in results_query_client_database:
-            from_dataframe.append(row)
-
-        # Transform rows database to dataframe
-        dataframe_to_anonymization = pd.DataFrame(
-            data=from_dataframe, columns=columns_to_anonymization
-        )
-        dataframe_to_anonymization = dataframe_to_anonymization[
-            columns_to_anonymization
-        ]
-
-        # Remove primary key of columns_to_anonymization list
-        # but save elements in save_primary_key_elements
-        save_primary_key_elements = dataframe_to_anonymization[primary_key]
-        dataframe_to_anonymization = dataframe_to_anonymization.drop(
-            primary_key, axis=1
-        )
-        columns_to_anonymization.remove(primary_key)
-
-        # Run anonymization
-        anonymization_dataframe = dataframe_to_anonymization[
-            columns_to_anonymization
-        ].astype("int")
-        anonymization_dataframe = anonymization_dataframe.to_numpy()
-        anonymization_dataframe = anonymization_data(anonymization_dataframe)
-        anonymization_dataframe = pd.DataFrame(
-            data=anonymization_dataframe, columns=columns_to_anonymization
-        )
-
-        # Reorganize primary key elements
-        anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
-
-        # Get anonymized data to update
-        dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
-
-        # Update data
-        for row_anonymized in dictionary_anonymized_data:
-            session_client_db.query(table_client_db).filter(
-                table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-            ).update(row_anonymized)
-
-        # Commit changes
-        session_client_db.commit()
-
-        # Getting rows of Client Database
-        results_query_client_database = proxy_client_database.fetchmany(query_size)
-
-        # Get primary key of Client Database in columns_to_anonymization only query
-        columns_to_anonymization.insert(0, primary_key)
-
-    session_client_db.close()
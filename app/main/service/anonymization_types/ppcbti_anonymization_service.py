@@ -1,161 +1,120 @@
 import numpy as np
-import pandas as pd
-import scipy.linalg as la
-from service.database_service import create_table_session, get_primary_key
-from sqlalchemy import MetaData, Table, create_engine
-from sqlalchemy.orm import sessionmaker
 
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymization_types.streaming_pca_service import (
+    anonymization_rows,
+    anonymization_table,
+    fit_projection,
+)
+from app.main.service.bulk_write_service import update_rows
+from app.main.service.global_service import TableConnection
 
-def anonymization_database_rows(
-    src_client_db_path, table_name, columns_to_anonymization, rows_to_anonymization
-):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
-
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
-
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
-    )
-
-    # Transform rows database to dataframe
-    dataframe_to_anonymization = pd.DataFrame(data=rows_to_anonymization)
-    dataframe_to_anonymization = dataframe_to_anonymization[columns_to_anonymization]
-
-    # Remove primary key of columns_to_anonymization list
-    # but save elements in save_primary_key_elements
-    save_primary_key_elements = dataframe_to_anonymization[primary_key]
-    dataframe_to_anonymization = dataframe_to_anonymization.drop(primary_key, axis=1)
-    columns_to_anonymization.remove(primary_key)
-
-    # Run anonymization
-    anonymization_dataframe = dataframe_to_anonymization[
-        columns_to_anonymization
-    ].astype("int")
-    anonymization_dataframe = anonymization_dataframe.to_numpy()
-    anonymization_dataframe = anonymization_data(anonymization_dataframe)
-    anonymization_dataframe = pd.DataFrame(
-        data=anonymization_dataframe, columns=columns_to_anonymization
-    )
-
-    # Apply round function
-    anonymization_dataframe.round(0)
 
-    # Reorganize primary key elements
-    anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
+def anonymization_data(data: np.ndarray) -> np.ndarray:
+    """
+    This function anonymizes the given data with a randomized PCA
+    projection, rounded to integers.
 
-    # Get anonymized data to update
-    dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
+    Parameters
+    ----------
+    data : np.ndarray
+        Rows provided for anonymization, one column per anonymized column.
 
-    # Update data
-    for row_anonymized in dictionary_anonymized_data:
-        session_client_db.query(table_client_db).filter(
-            table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-        ).update(row_anonymized)
+    Returns
+    -------
+    np.ndarray
+        Anonymized rows.
+    """
 
-    session_client_db.commit()
-    session_client_db.close()
+    data = np.asarray(data, dtype=np.float64)
 
+    return np.rint(fit_projection(data=data).transform(data=data)).astype(np.int64)
 
-def anonymization_database(src_client_db_path, table_name, columns_to_anonymization):
-    # Get primary key of Client Database
-    primary_key = get_primary_key(src_client_db_path, table_name)
 
-    # Get primary key of Client Database in columns_to_anonymization only query
-    columns_to_anonymization.insert(0, primary_key)
-
-    # Create table object of Client Database and
-    # session of Client Database to run sql operations
-    table_client_db, session_client_db = create_table_session(
-        src_db_path=src_client_db_path,
-        table_name=table_name,
-        columns_list=columns_to_anonymization,
-    )
-
-    # Get data to dataframe
-    from_dataframe = session_client_db.query(table_client_db).all()
-
-    # Transform rows database to dataframe
-    dataframe_to_anonymization = pd.DataFrame(
-        data=from_dataframe, columns=columns_to_anonymization
-    )
-    dataframe_to_anonymization = dataframe_to_anonymization[columns_to_anonymization]
-
-    # Remove primary key of columns_to_anonymization list
-    # but save elements in save_primary_key_elements
-    save_primary_key_elements = dataframe_to_anonymization[primary_key]
-    dataframe_to_anonymization = dataframe_to_anonymization.drop(primary_key, axis=1)
-    columns_to_anonymization.remove(primary_key)
+def anonymization_database_rows(
+    context: AnonymizationContext,
+    client_table_connection: TableConnection,
+    columns_to_anonymize: list[str],
+    rows_to_anonymize: list[dict],
+    insert_database: bool = True,
+) -> list[dict]:
+    """
+    This function anonymizes each the given rows with the
+    PPCBTI Anonymizer, fitted on the given rows only.
+
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
+
+    client_table_connection : TableConnection
+        Connection of Client Database table.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    rows_to_anonymize : list[dict]
+        Rows provided for anonymization.
+
+    insert_database : bool
+        Flag to indicate if anonymized rows will be inserted or returned.
+
+    Returns
+    -------
+    list[dict]
+        Anonymized rows
+    """
 
     # Run anonymization
-    anonymization_dataframe = dataframe_to_anonymization[
-        columns_to_anonymization
-    ].astype("int")
-    anonymization_dataframe = anonymization_dataframe.to_numpy()
-    anonymization_dataframe = anonymization_data(anonymization_dataframe)
-    anonymization_dataframe = pd.DataFrame(
-        data=anonymization_dataframe, columns=columns_to_anonymization
+    anonymized_rows = anonymization_rows(
+        primary_key_name=context.primary_key_name,
+        rows_to_anonymize=rows_to_anonymize,
+        columns_to_anonymize=columns_to_anonymize,
+        round_values=True,
     )
 
-    # Apply round function
-    anonymization_dataframe.round(0)
-
-    # Reorganize primary key elements
-    anonymization_dataframe[f"{primary_key}"] = save_primary_key_elements
-
-    # Get anonymized data to update
-    dictionary_anonymized_data = anonymization_dataframe.to_dict(orient="records")
-
-    # Update data
-    for row_anonymized in dictionary_anonymized_data:
-        session_client_db.query(table_client_db).filter(
-            table_client_db.c[0] == row_anonymized[f"{primary_key}"]
-        ).update(row_anonymized)
-
-    # Commit changes
-    session_client_db.commit()
-    session_client_db.close()
-
-
-def anonymization_data(data):
-    # calculate the mean of each column
-    mean = np.array(np.mean(data, axis=0).T)
-
-    # center data
-    data_centered = data - mean
-
-    # calculate the covariance matrix
-    cov_matrix = np.cov(data_centered, rowvar=False)
-
-    # calculate the eignvalues and eignvectors
-    evals, evecs = la.eigh(cov_matrix)
-
-    # sort them
-    idx = np.argsort(evals)[::-1]
-
-    # Each columns of this matrix is an eingvector
-    evecs = evecs[:, idx]
-    evals = evals[idx]
-
-    # explained variance
-    variance_retained = np.cumsum(evals) / np.sum(evals)
-
-    # calculate the transformed data
-    data_transformed = np.dot(evecs.T, data_centered.T).T
-
-    # randomize eignvectors
-    new_evecs = evecs.copy().T
-    for i in range(len(new_evecs)):
-        np.random.shuffle(new_evecs[i])
-    new_evecs = np.array(new_evecs).T
-
-    # go back to the original dimension
-    data_original_dimension = np.dot(data_transformed, new_evecs.T)
-    data_original_dimension += mean
-
-    return data_original_dimension
+    # Insert anonymized rows in database
+    if insert_database:
+        update_rows(
+            connection=client_table_connection.session.connection(),
+            table=client_table_connection.table,
+            primary_key_name=context.primary_key_name,
+            columns_names=columns_to_anonymize,
+            rows=anonymized_rows,
+        )
+
+    return anonymized_rows
+
+
+def anonymization_database(
+    context: AnonymizationContext,
+    client_table_connection: TableConnection,
+    columns_to_anonymize: list[str],
+) -> None:
+    """
+    This function anonymizes a table with the
+    PPCBTI Anonymizer.
+
+    Parameters
+    ----------
+    context : AnonymizationContext
+        Context of anonymization run.
+
+    client_table_connection : TableConnection
+        Connection of Client Database table.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    Returns
+    -------
+    None
+    """
+
+    # Run anonymization, fitted on whole table
+    anonymization_table(
+        client_table_connection=client_table_connection,
+        primary_key_name=context.primary_key_name,
+        columns_to_anonymize=columns_to_anonymize,
+        round_values=True,
+    )
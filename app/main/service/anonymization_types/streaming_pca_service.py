@@ -0,0 +1,269 @@
+from typing import Iterator
+
+import numpy as np
+import scipy.linalg as la
+from sqlalchemy import and_, select
+
+from app.main.config import app_config
+from app.main.service.bulk_write_service import BulkUpdater
+from app.main.service.global_service import TableConnection
+
+_batch_selection_size = app_config.BATCH_SELECTION_SIZE
+
+
+class StreamingCovariance:
+    def __init__(self, number_columns: int):
+        self.count = 0
+        self.mean = np.zeros(number_columns)
+        self._comoment = np.zeros((number_columns, number_columns))
+
+    def update(self, data: np.ndarray) -> None:
+        """
+        This function adds a batch of rows to the running mean and
+        covariance, merged with the pairwise update of Chan et al.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            Batch of rows, one column per anonymized column.
+
+        Returns
+        -------
+        None
+        """
+
+        count = data.shape[0]
+
+        if not count:
+            return
+
+        mean = data.mean(axis=0)
+        centered = data - mean
+
+        delta = mean - self.mean
+        total = self.count + count
+
+        # Centered on each side, so large values do not cancel out
+        self._comoment += centered.T @ centered
+        self._comoment += np.outer(delta, delta) * (self.count * count / total)
+        self.mean += delta * (count / total)
+        self.count = total
+
+    @property
+    def covariance(self) -> np.ndarray:
+        # Sample covariance, as np.cov
+        return self._comoment / max(self.count - 1, 1)
+
+
+class PcaProjection:
+    def __init__(self, mean: np.ndarray, covariance: np.ndarray, generator=None):
+        generator = generator or np.random.default_rng()
+
+        # Eigenvectors as columns, by decreasing eigenvalue
+        evals, evecs = la.eigh(covariance)
+        evecs = evecs[:, np.argsort(evals)[::-1]]
+
+        # Randomize components of each eigenvector, once for a whole run
+        new_evecs = evecs.T.copy()
+        for new_evec in new_evecs:
+            generator.shuffle(new_evec)
+
+        # Projection on eigenvectors and back on randomized ones, as a
+        # single matrix applied to every batch
+        self.mean = mean
+        self.matrix = evecs @ new_evecs
+
+    def transform(self, data: np.ndarray) -> np.ndarray:
+        return (data - self.mean) @ self.matrix + self.mean
+
+
+def fit_projection(data: np.ndarray) -> PcaProjection:
+    """
+    This function fits the randomized PCA projection of rows in memory.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        Rows, one column per anonymized column.
+
+    Returns
+    -------
+    PcaProjection
+        Projection of rows.
+    """
+
+    covariance = StreamingCovariance(number_columns=data.shape[1])
+    covariance.update(data=data)
+
+    return PcaProjection(mean=covariance.mean, covariance=covariance.covariance)
+
+
+def _to_array(rows: list[dict], columns_names: list[str]) -> np.ndarray:
+    return np.array(
+        [[row[column_name] for column_name in columns_names] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(columns_names))
+
+
+def _to_values(data: np.ndarray, round_values: bool) -> np.ndarray:
+    if round_values:
+        return np.rint(data).astype(np.int64)
+
+    return data
+
+
+def anonymization_rows(
+    primary_key_name: str,
+    rows_to_anonymize: list[dict],
+    columns_to_anonymize: list[str],
+    round_values: bool = False,
+) -> list[dict]:
+    """
+    This function anonymizes the given rows in place with a randomized
+    PCA projection fitted on themselves.
+
+    Parameters
+    ----------
+    primary_key_name : str
+        Primary key column name.
+
+    rows_to_anonymize : list[dict]
+        Rows provided for anonymization.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    round_values : bool
+        True to round anonymized values to integers.
+
+    Returns
+    -------
+    list[dict]
+        Anonymized rows
+    """
+
+    # Rows with a NULL on any chosen column are kept as they are
+    rows = [
+        row
+        for row in rows_to_anonymize
+        if all(row[column_name] is not None for column_name in columns_to_anonymize)
+    ]
+
+    if not rows:
+        return rows_to_anonymize
+
+    data = _to_array(rows=rows, columns_names=columns_to_anonymize)
+    anonymized_data = _to_values(
+        data=fit_projection(data=data).transform(data=data),
+        round_values=round_values,
+    )
+
+    for row, values in zip(rows, anonymized_data.tolist()):
+        row.update(zip(columns_to_anonymize, values))
+
+    return rows_to_anonymize
+
+
+def _read_batches(
+    client_table_connection: TableConnection,
+    primary_key_name: str,
+    columns_names: list[str],
+) -> Iterator[list[dict]]:
+    primary_key_column = client_table_connection.get_column(
+        column_name=primary_key_name
+    )
+    columns = [
+        client_table_connection.get_column(column_name=column_name)
+        for column_name in columns_names
+    ]
+
+    statement = (
+        select(primary_key_column, *columns)
+        .where(and_(*[column.isnot(None) for column in columns]))
+        .order_by(primary_key_column)
+        .limit(_batch_selection_size)
+    )
+
+    # Keyset pagination, so no cursor is left open between batch updates
+    results = client_table_connection.session.execute(statement).fetchall()
+
+    while results:
+        yield [row._asdict() for row in results]
+
+        results = client_table_connection.session.execute(
+            statement.where(primary_key_column > results[-1][0])
+        ).fetchall()
+
+
+def anonymization_table(
+    client_table_connection: TableConnection,
+    primary_key_name: str,
+    columns_to_anonymize: list[str],
+    round_values: bool = False,
+) -> None:
+    """
+    This function anonymizes a table with a randomized PCA projection,
+    in two passes holding a single batch of rows at a time.
+
+    Parameters
+    ----------
+    client_table_connection : TableConnection
+        Connection of Client Database table.
+
+    primary_key_name : str
+        Primary key column name.
+
+    columns_to_anonymize : list[str]
+        Column names chosen for anonymization.
+
+    round_values : bool
+        True to round anonymized values to integers.
+
+    Returns
+    -------
+    None
+    """
+
+    # First pass, mean and covariance of whole table
+    covariance = StreamingCovariance(number_columns=len(columns_to_anonymize))
+
+    for rows in _read_batches(
+        client_table_connection=client_table_connection,
+        primary_key_name=primary_key_name,
+        columns_names=columns_to_anonymize,
+    ):
+        covariance.update(data=_to_array(rows=rows, columns_names=columns_to_anonymize))
+
+    if not covariance.count:
+        return
+
+    projection = PcaProjection(mean=covariance.mean, covariance=covariance.covariance)
+
+    # Staging table is reused by all batches of the scan
+    bulk_updater = BulkUpdater(
+        connection=client_table_connection.session.connection(),
+        table=client_table_connection.table,
+        primary_key_name=primary_key_name,
+        columns_names=columns_to_anonymize,
+    )
+
+    try:
+        # Second pass, project each batch and write it back
+        for rows in _read_batches(
+            client_table_connection=client_table_connection,
+            primary_key_name=primary_key_name,
+            columns_names=columns_to_anonymize,
+        ):
+            anonymized_data = _to_values(
+                data=projection.transform(
+                    data=_to_array(rows=rows, columns_names=columns_to_anonymize)
+                ),
+                round_values=round_values,
+            )
+
+            for row, values in zip(rows, anonymized_data.tolist()):
+                row.update(zip(columns_to_anonymize, values))
+
+            bulk_updater.update(rows=rows)
+    finally:
+        bulk_updater.close()
@@ -0,0 +1,266 @@
+import time
+from typing import Callable
+
+from app.main.config import app_config
+from app.main.exceptions import DefaultException
+from app.main.model import AnonymizationRecord, AnonymizationType, Table
+from app.main.service.anonymization_context_service import AnonymizationContext
+from app.main.service.anonymization_types import (
+    cpf_anonymizer_service,
+    date_anonymizer_service,
+    date_cryptopan_anonymizer_service,
+    email_anonymizer_service,
+    ip_anonymizer_service,
+    named_entities_anonymizer_service,
+    rg_anonymizer_service,
+)
+from app.main.service.anonymization_types.keyed_generator_service import (
+    get_generator_key,
+)
+
+# Anonymizers of generated values are keyed only on "keyed" generator
+_keyed_generator = app_config.ANONYMIZATION_GENERATOR == "keyed"
+
+
+class Anonymizer:
+    def __init__(
+        self,
+        name: str,
+        anonymize_columns: Callable,
+        uses_generator_key: bool = False,
+    ):
+        self.name = name
+        self.uses_generator_key = uses_generator_key
+        self._anonymize_columns = anonymize_columns
+
+    def anonymize(
+        self,
+        context: AnonymizationContext,
+        primary_keys: list,
+        columns: dict[str, list],
+    ) -> dict[str, list]:
+        """
+        This function anonymizes a batch of rows given as column arrays.
+
+        Parameters
+        ----------
+        context : AnonymizationContext
+            Context of anonymization run.
+
+        primary_keys : list
+            Primary key values of rows.
+
+        columns : dict[str, list]
+            Values of each column to anonymize, in the order of primary keys.
+
+        Returns
+        -------
+        dict[str, list]
+            Anonymized values of each column.
+        """
+
+        return self._anonymize_columns(
+            context=context, primary_keys=primary_keys, columns=columns
+        )
+
+
+class TableAnonymizers:
+    def __init__(self, anonymizers: list[tuple[Anonymizer, list[str]]]):
+        self.anonymizers = anonymizers
+
+    @property
+    def columns_names(self) -> list[str]:
+        # A column may be set on more than one anonymization record
+        return list(
+            dict.fromkeys(
+                column_name
+                for _, columns_names in self.anonymizers
+                for column_name in columns_names
+            )
+        )
+
+    def anonymize_rows(
+        self, context: AnonymizationContext, rows: list[dict], timings: list = None
+    ) -> list[dict]:
+        """
+        This function anonymizes the given rows in place with every
+        anonymizer of the table.
+
+        Parameters
+        ----------
+        context : AnonymizationContext
+            Context of anonymization run.
+
+        rows : list[dict]
+            Rows to anonymize.
+
+        timings : list
+            If given, the time of each anonymizer is appended to it.
+
+        Returns
+        -------
+        list[dict]
+            Anonymized rows.
+        """
+
+        primary_keys = [row[context.primary_key_name] for row in rows]
+
+        for anonymizer, columns_names in self.anonymizers:
+            started = time.perf_counter()
+
+            anonymized_columns = anonymizer.anonymize(
+                context=context,
+                primary_keys=primary_keys,
+                columns={
+                    column_name: [row[column_name] for row in rows]
+                    for column_name in columns_names
+                },
+            )
+
+            if timings is not None:
+                timings.append(
+                    {
+                        "anonymization_type": anonymizer.name,
+                        "columns": columns_names,
+                        "seconds": time.perf_counter() - started,
+                    }
+                )
+
+            for column_name, values in anonymized_columns.items():
+                for row, value in zip(rows, values):
+                    row[column_name] = value
+
+        return rows
+
+
+_anonymizers = {
+    anonymizer.name: anonymizer
+    for anonymizer in [
+        Anonymizer(
+            "cpf_anonymizer",
+            cpf_anonymizer_service.anonymization_columns,
+            uses_generator_key=_keyed_generator,
+        ),
+        Anonymizer(
+            "date_anonymizer",
+            date_anonymizer_service.anonymization_columns,
+            uses_generator_key=_keyed_generator,
+        ),
+        Anonymizer(
+            "date_cryptopan_anonymizer",
+            date_cryptopan_anonymizer_service.anonymization_columns,
+        ),
+        Anonymizer(
+            "email_anonymizer",
+            email_anonymizer_service.anonymization_columns,
+            uses_generator_key=_keyed_generator,
+        ),
+        Anonymizer("ip_anonymizer", ip_anonymizer_service.anonymization_columns),
+        Anonymizer(
+            "named_entities_anonymizer",
+            named_entities_anonymizer_service.anonymization_columns,
+            uses_generator_key=_keyed_generator,
+        ),
+        Anonymizer(
+            "rg_anonymizer",
+            rg_anonymizer_service.anonymization_columns,
+            uses_generator_key=_keyed_generator,
+        ),
+    ]
+}
+
+
+def get_anonymizer(anonymization_type_name: str) -> Anonymizer:
+    anonymizer = _anonymizers.get(anonymization_type_name)
+
+    if anonymizer is None:
+        raise DefaultException("anonymizer_not_found", code=404)
+
+    return anonymizer
+
+
+def get_table_anonymizers(table_id: int) -> TableAnonymizers:
+    """
+    This function resolves the anonymizer of each anonymization record
+    of a table, once for a whole run.
+
+    Parameters
+    ----------
+    table_id : int
+        Table ID.
+
+    Returns
+    -------
+    TableAnonymizers
+        Anonymizers of table and their columns.
+    """
+
+    anonymization_records = (
+        AnonymizationRecord.query.filter_by(table_id=table_id)
+        .order_by(AnonymizationRecord.id)
+        .all()
+    )
+
+    if not anonymization_records:
+        raise DefaultException("anonymization_record_not_found", code=404)
+
+    anonymization_types = {
+        anonymization_type.id: anonymization_type
+        for anonymization_type in AnonymizationType.query.filter(
+            AnonymizationType.id.in_(
+                {record.anonymization_type_id for record in anonymization_records}
+            )
+        )
+    }
+
+    table_anonymizers = TableAnonymizers(
+        anonymizers=[
+            (
+                get_anonymizer(
+                    anonymization_type_name=anonymization_types[
+                        anonymization_record.anonymization_type_id
+                    ].name
+                ),
+                anonymization_record.columns,
+            )
+            for anonymization_record in anonymization_records
+            if anonymization_record.columns
+        ]
+    )
+
+    # Missing key fails before the run, not on its first batch
+    if any(
+        anonymizer.uses_generator_key for anonymizer, _ in table_anonymizers.anonymizers
+    ):
+        get_generator_key()
+
+    return table_anonymizers
+
+
+def get_anonymization_context(
+    table: Table, primary_key_name: str
+) -> AnonymizationContext:
+    """
+    This function creates the context of an anonymization run of a table,
+    with its anonymizers resolved.
+
+    Parameters
+    ----------
+    table : Table
+        Table to anonymize.
+
+    primary_key_name : str
+        Primary key column name of Client Database table.
+
+    Returns
+    -------
+    AnonymizationContext
+        Context of anonymization run.
+    """
+
+    return AnonymizationContext(
+        database_id=table.database_id,
+        table_name=table.name,
+        primary_key_name=primary_key_name,
+        table_anonymizers=get_table_anonymizers(table_id=table.id),
+    )
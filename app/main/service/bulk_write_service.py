@@ -0,0 +1,450 @@
+import io
+
+from sqlalchemy import (
+    Column,
+    Index,
+    LargeBinary,
+    MetaData,
+    Table,
+    Text,
+    bindparam,
+    delete,
+    inspect,
+    insert,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Update
+
+# Max rows of a single multi-row INSERT statement
+_MULTI_ROW_INSERT_SIZE = 1000
+
+# Length of a sha256 line hash, also the indexed prefix of TEXT on MySQL
+_LINE_HASH_SIZE = 64
+
+
+class BulkWriter:
+    def __init__(self, engine: Engine, table: Table):
+        self.table = table
+        self.connection = engine.connect()
+
+    def write(self, rows: list[dict]) -> None:
+        """
+        This function inserts the given rows in one transaction, with the
+        fastest path available for the dialect.
+
+        Parameters
+        ----------
+        rows : list[dict]
+            Rows to insert, with a value for each column of the table.
+
+        Returns
+        -------
+        None
+        """
+
+        if not rows:
+            return
+
+        with self.connection.begin():
+            _load_rows(connection=self.connection, table=self.table, rows=rows)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class BulkUpdater:
+    def __init__(
+        self,
+        connection: Connection,
+        table: Table,
+        primary_key_name: str,
+        columns_names: list[str],
+    ):
+        self.connection = connection
+        self.table = table
+        self.primary_key_name = primary_key_name
+        self.columns_names = columns_names
+        self.staging_table = None
+
+        if _supports_staging(dialect=connection.dialect):
+            self.staging_table = _create_staging_table(
+                connection=connection,
+                table=table,
+                primary_key_name=primary_key_name,
+                columns_names=columns_names,
+            )
+
+    def update(self, rows: list[dict]) -> None:
+        """
+        This function updates the columns of the given rows, matched by
+        primary key, on the transaction of the connection.
+
+        Parameters
+        ----------
+        rows : list[dict]
+            Rows to update, with primary key and a value for each column.
+
+        Returns
+        -------
+        None
+        """
+
+        if not rows:
+            return
+
+        if self.staging_table is None:
+            self._update_many(rows)
+        else:
+            self._update_from_staging(rows)
+
+    def _update_from_staging(self, rows: list[dict]) -> None:
+        _load_rows(
+            connection=self.connection,
+            table=self.staging_table,
+            rows=[
+                {column.name: row[column.name] for column in self.staging_table.columns}
+                for row in rows
+            ],
+        )
+
+        self.connection.execute(self._update_statement())
+
+        self.connection.execute(delete(self.staging_table))
+
+    def _update_statement(self) -> Update:
+        primary_key_column = _get_column(
+            table=self.table, column_name=self.primary_key_name
+        )
+        staging_primary_key_column = self.staging_table.c[self.primary_key_name]
+
+        # UPDATE ... FROM on PostgreSQL, UPDATE ... JOIN on MySQL
+        if self.connection.dialect.name in ["postgresql", "mysql"]:
+            return (
+                update(self.table)
+                .values(
+                    {
+                        _get_column(table=self.table, column_name=column_name): (
+                            self.staging_table.c[column_name]
+                        )
+                        for column_name in self.columns_names
+                    }
+                )
+                .where(primary_key_column == staging_primary_key_column)
+            )
+
+        # Correlated subqueries elsewhere, still a single statement
+        return (
+            update(self.table)
+            .values(
+                {
+                    _get_column(table=self.table, column_name=column_name): (
+                        select(self.staging_table.c[column_name])
+                        .where(staging_primary_key_column == primary_key_column)
+                        .scalar_subquery()
+                    )
+                    for column_name in self.columns_names
+                }
+            )
+            .where(primary_key_column.in_(select(staging_primary_key_column)))
+        )
+
+    def _update_many(self, rows: list[dict]) -> None:
+        self.connection.execute(
+            update(self.table).where(
+                _get_column(table=self.table, column_name=self.primary_key_name)
+                == bindparam(f"b_{self.primary_key_name}")
+            ),
+            [
+                {
+                    f"b_{self.primary_key_name}": row[self.primary_key_name],
+                    **{
+                        column_name: row[column_name]
+                        for column_name in self.columns_names
+                    },
+                }
+                for row in rows
+            ],
+        )
+
+    def close(self) -> None:
+        if self.staging_table is not None:
+            _drop_staging_table(
+                connection=self.connection, staging_table=self.staging_table
+            )
+            self.staging_table = None
+
+
+def update_rows(
+    connection: Connection,
+    table: Table,
+    primary_key_name: str,
+    columns_names: list[str],
+    rows: list[dict],
+) -> None:
+    """
+    This function updates the columns of the given rows, matched by
+    primary key, with a single set-based UPDATE where available.
+
+    Parameters
+    ----------
+    connection : Connection
+        Connection of database, updated on its current transaction.
+
+    table : Table
+        Table to update.
+
+    primary_key_name : str
+        Primary key column name.
+
+    columns_names : list[str]
+        Names of columns to update.
+
+    rows : list[dict]
+        Rows to update, with primary key and a value for each column.
+
+    Returns
+    -------
+    None
+    """
+
+    if not rows:
+        return
+
+    bulk_updater = BulkUpdater(
+        connection=connection,
+        table=table,
+        primary_key_name=primary_key_name,
+        columns_names=columns_names,
+    )
+
+    try:
+        bulk_updater.update(rows=rows)
+    finally:
+        bulk_updater.close()
+
+
+def _load_rows(connection: Connection, table: Table, rows: list[dict]) -> None:
+    # Fastest insert path available for the dialect
+    if connection.dialect.name == "postgresql":
+        _copy(connection=connection, table=table, rows=rows)
+    elif connection.dialect.name == "mysql":
+        _insert_multi_row(connection=connection, table=table, rows=rows)
+    else:
+        _insert_many(connection=connection, table=table, rows=rows)
+
+
+def _copy(connection: Connection, table: Table, rows: list[dict]) -> None:
+    columns_names = [column.name for column in table.columns]
+    preparer = connection.dialect.identifier_preparer
+
+    statement = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        preparer.format_table(table),
+        ", ".join(preparer.quote(column_name) for column_name in columns_names),
+    )
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(
+            ",".join(_to_csv_value(row[column_name]) for column_name in columns_names)
+        )
+        buffer.write("\n")
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_multi_row(connection: Connection, table: Table, rows: list[dict]) -> None:
+    for index in range(0, len(rows), _MULTI_ROW_INSERT_SIZE):
+        connection.execute(
+            insert(table).values(rows[index : index + _MULTI_ROW_INSERT_SIZE])
+        )
+
+
+def _insert_many(connection: Connection, table: Table, rows: list[dict]) -> None:
+    connection.execute(insert(table), rows)
+
+
+def _get_column(table: Table, column_name: str) -> Column:
+    # Columns of tables from create_table_connection are a plain list
+    for column in table.columns:
+        if column.name == column_name:
+            return column
+
+    return None
+
+
+def _supports_staging(dialect) -> bool:
+    return dialect.name in ["postgresql", "mysql", "sqlite"]
+
+
+def _create_staging_table(
+    connection: Connection,
+    table: Table,
+    primary_key_name: str,
+    columns_names: list[str],
+) -> Table:
+    # Temporary tables are private to the connection, so one name is enough
+    staging_table = Table(
+        f"{table.name}_staging",
+        MetaData(),
+        Column(
+            primary_key_name,
+            _generic_type(_get_column(table=table, column_name=primary_key_name).type),
+            primary_key=True,
+            autoincrement=False,
+        ),
+        *[
+            Column(
+                column_name,
+                _generic_type(_get_column(table=table, column_name=column_name).type),
+            )
+            for column_name in columns_names
+        ],
+        prefixes=["TEMPORARY"],
+    )
+
+    staging_table.create(bind=connection)
+
+    return staging_table
+
+
+def _drop_staging_table(connection: Connection, staging_table: Table) -> None:
+    # Plain DROP TABLE commits the open transaction on MySQL
+    if connection.dialect.name == "mysql":
+        connection.execute(
+            text(
+                "DROP TEMPORARY TABLE "
+                + connection.dialect.identifier_preparer.format_table(staging_table)
+            )
+        )
+    else:
+        staging_table.drop(bind=connection)
+
+
+def _to_csv_value(value) -> str:
+    # Unquoted empty field is NULL, quoted empty field is an empty string
+    if value is None:
+        return ""
+
+    # Binary cells in bytea hex format
+    if isinstance(value, bytes):
+        return '"\\x{}"'.format(value.hex())
+
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+def _generic_type(column_type):
+    try:
+        return column_type.as_generic()
+    except NotImplementedError:
+        return column_type
+
+
+def create_cloud_table(
+    engine: Engine,
+    table_name: str,
+    primary_key_column: Column,
+    columns_names: list[str],
+    binary: bool = False,
+) -> Table:
+    """
+    This function creates the cloud table of encrypted columns, indexed
+    by line hash, or reflects it when it already exists.
+
+    Parameters
+    ----------
+    engine : Engine
+        Engine of Cloud Database.
+
+    table_name : str
+        Table name on Cloud Database.
+
+    primary_key_column : Column
+        Primary key column of Client Database table.
+
+    columns_names : list[str]
+        Names of encrypted columns, without primary key.
+
+    binary : bool
+        True to store encrypted cells as binary instead of base64 text.
+
+    Returns
+    -------
+    Table
+        Cloud table.
+    """
+
+    metadata = MetaData()
+
+    if inspect(engine).has_table(table_name):
+        return Table(table_name, metadata, autoload_with=engine)
+
+    table = Table(
+        table_name,
+        metadata,
+        Column(
+            primary_key_column.name,
+            _generic_type(primary_key_column.type),
+            primary_key=True,
+            autoincrement=False,
+        ),
+        *[
+            Column(column_name, LargeBinary if binary else Text)
+            for column_name in columns_names
+        ],
+        Column("line_hash", Text),
+        Index(
+            _line_hash_index_name(table_name=table_name),
+            "line_hash",
+            mysql_length=_LINE_HASH_SIZE,
+        ),
+    )
+
+    metadata.create_all(engine)
+
+    return table
+
+
+def create_line_hash_index(engine: Engine, table_name: str) -> bool:
+    """
+    This function adds the line hash index to a cloud table created
+    without it.
+
+    Parameters
+    ----------
+    engine : Engine
+        Engine of Cloud Database.
+
+    table_name : str
+        Table name on Cloud Database.
+
+    Returns
+    -------
+    bool
+        True if the index was created, False if it already exists.
+    """
+
+    for index in inspect(engine).get_indexes(table_name):
+        if index["column_names"] == ["line_hash"]:
+            return False
+
+    table = Table(table_name, MetaData(), autoload_with=engine)
+
+    Index(
+        _line_hash_index_name(table_name=table_name),
+        table.c.line_hash,
+        mysql_length=_LINE_HASH_SIZE,
+    ).create(bind=engine)
+
+    return True
+
+
+def _line_hash_index_name(table_name: str) -> str:
+    return f"ix_{table_name}_line_hash"
@@ -0,0 +1,83 @@
+import base64
+
+import rsa
+from Crypto.Random import get_random_bytes
+
+from app.main import db
+from app.main.config import app_config
+from app.main.exceptions import DefaultException
+from app.main.model import DataKey
+from app.main.service.database_key_service import KeyCache, get_private_key
+
+_DATA_KEY_SIZE = 32
+
+# Unwrapped data keys by (database_id, data_key_id)
+_data_keys_cache = KeyCache(max_size=app_config.KEYS_CACHE_SIZE)
+
+
+class EnvelopeKey:
+    def __init__(self, data_key_id: int, data_key: bytes):
+        self.data_key_id = data_key_id
+        self.data_key = data_key
+
+
+class DataKeyRing:
+    def __init__(self, database_id: int):
+        self.database_id = database_id
+
+    @property
+    def private_key(self) -> rsa.PrivateKey:
+        return get_private_key(database_id=self.database_id)
+
+    def get_data_key(self, data_key_id: int) -> bytes:
+        data_key = _data_keys_cache.get((self.database_id, data_key_id))
+
+        if data_key is None:
+            data_key = unwrap_data_key(
+                database_id=self.database_id,
+                data_key_id=data_key_id,
+                private_key=self.private_key,
+            )
+            _data_keys_cache.put((self.database_id, data_key_id), data_key)
+
+        return data_key
+
+
+def generate_data_key(database_id: int, public_key: rsa.PublicKey) -> EnvelopeKey:
+    # Generating random AES-256 data key
+    data_key = get_random_bytes(_DATA_KEY_SIZE)
+
+    # Wrap data key with rsa public key of database
+    wrapped_key = rsa.encrypt(data_key, public_key)
+
+    new_data_key = DataKey(
+        database_id=database_id,
+        wrapped_key=str(base64.b64encode(wrapped_key))[2:-1],
+    )
+
+    try:
+        db.session.add(new_data_key)
+        db.session.commit()
+    except:
+        db.session.rollback()
+        raise DefaultException("data_key_not_created", code=500)
+
+    return EnvelopeKey(data_key_id=new_data_key.id, data_key=data_key)
+
+
+def unwrap_data_key(
+    database_id: int, data_key_id: int, private_key: rsa.PrivateKey
+) -> bytes:
+    data_key = DataKey.query.filter_by(id=data_key_id, database_id=database_id).first()
+
+    if not data_key:
+        raise DefaultException("data_key_not_found", code=404)
+
+    # Convert from string (base64) to bytes
+    wrapped_key = base64.b64decode(data_key.wrapped_key.encode())
+
+    return rsa.decrypt(wrapped_key, private_key)
+
+
+def invalidate_data_keys(database_id: int) -> None:
+    _data_keys_cache.invalidate(database_id=database_id)
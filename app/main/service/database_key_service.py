@@ -1,11 +1,48 @@
 import base64
+import threading
+from collections import OrderedDict
 
 import rsa
 
+from app.main.config import app_config
 from app.main.model import DatabaseKey
 
 from app.main.exceptions import DefaultException
 
+_keys_cache_size = app_config.KEYS_CACHE_SIZE
+
+
+class KeyCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, database_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._items if key[0] == database_id]:
+                del self._items[key]
+
+
+# Parsed rsa keys by (database_id, "public" | "private")
+_keys_cache = KeyCache(max_size=_keys_cache_size)
+
 
 def get_database_keys_by_database_id(database_id: int) -> None:
     database_keys = DatabaseKey.query.filter_by(database_id=database_id).first()
@@ -40,3 +77,37 @@ def load_keys(publicKeyStr, privateKeyStr):
     privateKey = rsa.PrivateKey.load_pkcs1(privateKeyByte)
 
     return publicKey, privateKey
+
+
+def get_public_key(database_id: int) -> rsa.PublicKey:
+    public_key = _keys_cache.get((database_id, "public"))
+
+    if public_key is None:
+        database_keys = get_database_keys_by_database_id(database_id=database_id)
+
+        # Transform from string base64 to Byte
+        public_key_byte = base64.b64decode(database_keys.public_key.encode())
+        public_key = rsa.PublicKey.load_pkcs1(public_key_byte)
+
+        _keys_cache.put((database_id, "public"), public_key)
+
+    return public_key
+
+
+def get_private_key(database_id: int) -> rsa.PrivateKey:
+    private_key = _keys_cache.get((database_id, "private"))
+
+    if private_key is None:
+        database_keys = get_database_keys_by_database_id(database_id=database_id)
+
+        # Transform from string base64 to Byte
+        private_key_byte = base64.b64decode(database_keys.private_key.encode())
+        private_key = rsa.PrivateKey.load_pkcs1(private_key_byte)
+
+        _keys_cache.put((database_id, "private"), private_key)
+
+    return private_key
+
+
+def invalidate_database_keys(database_id: int) -> None:
+    _keys_cache.invalidate(database_id=database_id)
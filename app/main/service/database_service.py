@@ -10,15 +10,18 @@ from app.main.config import Config
 from app.main.exceptions import DefaultException, ValidationException
 from app.main.model import (
     AnonymizationRecord,
+    DataKey,
     Database,
     DatabaseKey,
     SqlLog,
     Table,
     User,
 )
+from app.main.service.data_key_service import invalidate_data_keys
 from app.main.service.database_key_service import (
     generate_keys,
     get_database_keys_by_database_id,
+    invalidate_database_keys,
 )
 from app.main.service.valid_database_service import get_valid_database
 
@@ -88,6 +91,7 @@ def save_new_database(data: dict[str, str], current_user: User) -> None:
             username=username,
             port=port,
             password=data.get("password"),
+            anonymization_workers=data.get("anonymization_workers"),
             valid_database=valid_database,
             user=current_user,
         )
@@ -112,6 +116,9 @@ def save_new_database(data: dict[str, str], current_user: User) -> None:
 
     db.session.commit()
 
+    invalidate_database_keys(database_id=new_database.id)
+    invalidate_data_keys(database_id=new_database.id)
+
 
 def update_database(database_id: int, current_user: User, data: dict[str, str]) -> None:
     database = get_database(
@@ -143,6 +150,7 @@ def update_database(database_id: int, current_user: User, data: dict[str, str])
     database.username = new_username
     database.port = new_port
     database.password = data.get("password")
+    database.anonymization_workers = data.get("anonymization_workers")
 
     if not data.get("password"):
         raise DefaultException("Input_payload_validation_failed", code=400)
@@ -162,6 +170,13 @@ def delete_database(database_id: int, current_user: User) -> None:
             db.session.delete(database_keys)
             db.session.flush()
 
+        data_keys = DataKey.query.filter(DataKey.database_id == database_id).all()
+
+        if data_keys:
+            for data_key in data_keys:
+                db.session.delete(data_key)
+                db.session.flush()
+
         sql_logs = SqlLog.query.filter(SqlLog.database_id == database_id).all()
 
         if sql_logs:
@@ -169,7 +184,7 @@ def delete_database(database_id: int, current_user: User) -> None:
                 db.session.delete(sql_log)
                 db.session.flush()
 
-        tables = Table.quegry.filter(Table.database_id == database_id).all()
+        tables = Table.query.filter(Table.database_id == database_id).all()
 
         if tables:
             for table in tables:
@@ -191,6 +206,9 @@ def delete_database(database_id: int, current_user: User) -> None:
     db.session.delete(database)
     db.session.commit()
 
+    invalidate_database_keys(database_id=database_id)
+    invalidate_data_keys(database_id=database_id)
+
 
 def get_database(
     database_id: int,
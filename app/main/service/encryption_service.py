@@ -1,16 +1,51 @@
 import base64
 
-import pandas as pd
 import rsa
-from sqlalchemy import create_engine, func, insert, select, update
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from sqlalchemy import bindparam, create_engine, func, insert, inspect, select, update
 from sqlalchemy_utils import create_database, database_exists, drop_database
+from werkzeug.datastructures import ImmutableMultiDict
 
 from app.main import db
 from app.main.config import app_config
 from app.main.exceptions import DefaultException, ValidationException
-from app.main.model import DatabaseKey, Table, User
+from app.main.model import STORAGE_FORMAT_OPTIONS, Table, User
+from app.main.service.bulk_write_service import (
+    BulkWriter,
+    create_cloud_table,
+    create_line_hash_index,
+    update_rows,
+)
+from app.main.service.data_key_service import (
+    DataKeyRing,
+    EnvelopeKey,
+    generate_data_key,
+)
+from app.main.service.global_service import (
+    TableConnection,
+    create_table_connection,
+    get_cloud_database_url,
+    get_primary_key_name,
+)
 
 _batch_selection_size = app_config.BATCH_SELECTION_SIZE
+_encryption_batch_size = app_config.ENCRYPTION_BATCH_SIZE
+_encryption_workers = app_config.ENCRYPTION_WORKERS
+_encryption_queue_size = app_config.ENCRYPTION_QUEUE_SIZE
+_cell_encryption_mode = app_config.CELL_ENCRYPTION_MODE
+_cloud_storage_format = app_config.CLOUD_STORAGE_FORMAT
+
+# Prefix of cells sealed with a data key. It can not appear on legacy
+# cells, which are plain base64 of an rsa ciphertext.
+_ENVELOPE_PREFIX = "v2:"
+_DATA_KEY_ID_SIZE = 8
+_NONCE_SIZE = 12
+_TAG_SIZE = 16
+
+# Leading byte of cells on binary cloud tables
+_BINARY_RSA_PREFIX = b"\x01"
+_BINARY_ENVELOPE_PREFIX = b"\x02"
 
 
 def _calculate_progress(
@@ -38,12 +73,131 @@ def decrypt(encrypted_message, key):
     return rsa.decrypt(ciphertext, key).decode()
 
 
+def encrypt_envelope(message, key: EnvelopeKey):
+    sealed_message = _seal_envelope(message, key)
+
+    return _ENVELOPE_PREFIX + str(base64.b64encode(sealed_message))[2:-1]
+
+
+def decrypt_envelope(encrypted_message, key_ring: DataKeyRing):
+    # Convert from string (base64) to bytes
+    sealed_message = base64.b64decode(
+        encrypted_message[len(_ENVELOPE_PREFIX) :].encode()
+    )
+
+    return _open_envelope(sealed_message, key_ring)
+
+
+def _seal_envelope(message, key: EnvelopeKey) -> bytes:
+    # Seal message with data key
+    cipher = AES.new(key.data_key, AES.MODE_GCM, nonce=get_random_bytes(_NONCE_SIZE))
+    ciphertext, tag = cipher.encrypt_and_digest(message.encode())
+
+    # Pack data key id, nonce, ciphertext and tag
+    return (
+        key.data_key_id.to_bytes(_DATA_KEY_ID_SIZE, "big")
+        + cipher.nonce
+        + ciphertext
+        + tag
+    )
+
+
+def _open_envelope(sealed_message: bytes, key_ring: DataKeyRing) -> str:
+    # Unpack data key id, nonce, ciphertext and tag
+    data_key_id = int.from_bytes(sealed_message[:_DATA_KEY_ID_SIZE], "big")
+    nonce = sealed_message[_DATA_KEY_ID_SIZE : _DATA_KEY_ID_SIZE + _NONCE_SIZE]
+    ciphertext = sealed_message[_DATA_KEY_ID_SIZE + _NONCE_SIZE : -_TAG_SIZE]
+    tag = sealed_message[-_TAG_SIZE:]
+
+    cipher = AES.new(
+        key_ring.get_data_key(data_key_id=data_key_id), AES.MODE_GCM, nonce=nonce
+    )
+
+    return cipher.decrypt_and_verify(ciphertext, tag).decode()
+
+
+def encrypt_cell(message, key, binary: bool = False):
+    if binary:
+        return encrypt_binary(message, key)
+
+    if isinstance(key, EnvelopeKey):
+        return encrypt_envelope(message, key)
+
+    return encrypt(message, key)
+
+
+def decrypt_cell(encrypted_message, key):
+    if isinstance(encrypted_message, (bytes, bytearray, memoryview)):
+        return decrypt_binary(bytes(encrypted_message), key)
+
+    if encrypted_message.startswith(_ENVELOPE_PREFIX):
+        return decrypt_envelope(encrypted_message, key)
+
+    if isinstance(key, DataKeyRing):
+        key = key.private_key
+
+    return decrypt(encrypted_message, key)
+
+
+def encrypt_binary(message, key) -> bytes:
+    if isinstance(key, EnvelopeKey):
+        return _BINARY_ENVELOPE_PREFIX + _seal_envelope(message, key)
+
+    return _BINARY_RSA_PREFIX + rsa.encrypt(message.encode(), key)
+
+
+def decrypt_binary(encrypted_message: bytes, key) -> str:
+    prefix = encrypted_message[:1]
+
+    if prefix == _BINARY_ENVELOPE_PREFIX:
+        return _open_envelope(encrypted_message[1:], key)
+
+    if prefix != _BINARY_RSA_PREFIX:
+        raise ValueError("Unknown binary cell format")
+
+    if isinstance(key, DataKeyRing):
+        key = key.private_key
+
+    return rsa.decrypt(encrypted_message[1:], key).decode()
+
+
+def get_encryption_key(
+    database_id: int, table: Table = None, new_data_key: bool = False
+):
+    public_key = get_public_key(database_id=database_id)
+
+    if _cell_encryption_mode == "envelope":
+        # Current data key of table, so row and incremental encryption do
+        # not add a data key on each call
+        if table is not None and table.data_key_id is not None and not new_data_key:
+            return EnvelopeKey(
+                data_key_id=table.data_key_id,
+                data_key=get_decryption_key(database_id=database_id).get_data_key(
+                    data_key_id=table.data_key_id
+                ),
+            )
+
+        envelope_key = generate_data_key(database_id=database_id, public_key=public_key)
+
+        if table is not None:
+            table.data_key_id = envelope_key.data_key_id
+            db.session.commit()
+
+        return envelope_key
+
+    return public_key
+
+
+def get_decryption_key(database_id: int) -> DataKeyRing:
+    return DataKeyRing(database_id=database_id)
+
+
 def encrypt_list(data_list, key):
     encrypted_list = []
 
     for data in data_list:
         data = str(data)
-        encrypted_list.append(encrypt(data, key))
+        encrypted_list.append(encrypt_cell(data, key))
 
     return encrypted_list
 
@@ -53,25 +207,74 @@ def decrypt_list(data_list, key):
 
     for data in data_list:
         data = str(data)
-        decrypted_list.append(decrypt(data, key))
+        decrypted_list.append(decrypt_cell(data, key))
 
     return decrypted_list
 
 
-def encrypt_dict(data_dict, key):
+def encrypt_dict(data_dict, key, binary: bool = False):
     for keys in data_dict.keys():
-        data_dict[keys] = encrypt(str(data_dict[keys]), key)
+        data_dict[keys] = encrypt_cell(str(data_dict[keys]), key, binary)
 
     return data_dict
 
 
 def decrypt_dict(data_dict, key):
     for keys in data_dict.keys():
-        data_dict[keys] = decrypt(data_dict[keys], key)
+        data_dict[keys] = decrypt_cell(data_dict[keys], key)
 
     return data_dict
 
 
+def _encrypt_rows(
+    rows: list[dict], key, primary_key_name: str, columns_names: list[str], binary: bool
+) -> list[dict]:
+    # Run on encryption pipeline workers
+    for row in rows:
+        primary_key_value = row.pop(primary_key_name)
+
+        # Hash of row as on Client Database, replaced once anonymized
+        line_hash = calculate_row_hash(
+            record=[row[column_name] for column_name in columns_names]
+        )
+
+        encrypt_dict(data_dict=row, key=key, binary=binary)
+        row[primary_key_name] = primary_key_value
+        row["line_hash"] = line_hash
+
+    return rows
+
+
+def _read_batches(
+    table_connection: TableConnection,
+    batch_size: int,
+    primary_key_name: str,
+    checkpoint=None,
+    watermark=None,
+):
+    # Run on encryption pipeline reader thread, with its own connection
+    primary_key_column = table_connection.get_column(column_name=primary_key_name)
+
+    statement = select(table_connection.table).order_by(primary_key_column)
+
+    if checkpoint is not None:
+        statement = statement.where(primary_key_column > checkpoint)
+
+    if watermark is not None:
+        statement = statement.where(primary_key_column <= watermark)
+
+    with table_connection.engine.connect() as connection:
+        results_proxy = connection.execution_options(stream_results=True).execute(
+            statement
+        )
+
+        results = results_proxy.fetchmany(batch_size)
+
+        while results:
+            yield [row._asdict() for row in results]
+            results = results_proxy.fetchmany(batch_size)
+
+
 def encrypt_database_row(
     database_id: int,
     table_id: int,
@@ -98,13 +301,8 @@ def encrypt_database_row(
     if not database_exists(url=cloud_database_engine.url):
         create_database(url=cloud_database_engine.url)
 
-    # Load rsa keys
-    database_keys = get_database_keys_by_database_id(database_id=database_id)
-
-    public_key, _ = load_keys(
-        publicKeyStr=database_keys.public_key,
-        privateKeyStr=database_keys.private_key,
-    )
+    # Get key sealing the rows
+    encryption_key = get_encryption_key(database_id=database_id, table=table)
 
     # Get primary key name
     primary_key_name = get_primary_key_name(
@@ -120,47 +318,51 @@ def encrypt_database_row(
     cloud_table_connection = create_table_connection(
         database_url=cloud_database_engine.url,
         table_name=table.name,
-        columns_list=columns_list,
+        columns_list=columns_list + ["line_hash"],
     )
 
-    # Encrypt database rows
+    if update_database:
+        statement = update(cloud_table_connection.table).where(
+            cloud_table_connection.get_column(column_name=primary_key_name)
+            == bindparam(f"b_{primary_key_name}")
+        )
+    else:
+        statement = insert(cloud_table_connection.table)
+
+    # Encrypt database rows, one executemany per chunk in a single transaction
     try:
-        # Update database is true update on cloud database
-        if update_database:
-            for row in rows_to_encrypt:
-                row = {key: row[key] for key in columns_list}
+        for index in range(0, len(rows_to_encrypt), _encryption_batch_size):
+            encrypted_rows = []
+
+            for row in rows_to_encrypt[index : index + _encryption_batch_size]:
+                # Update database is true update on cloud database
+                if update_database:
+                    row = {key: row[key] for key in columns_list}
 
                 primary_key_value = row[primary_key_name]
 
                 row.pop(primary_key_name, None)
 
-                row = encrypt_dict(data_dict=row, key=public_key)
-
-                statement = (
-                    update(cloud_table_connection.table)
-                    .where(
-                        cloud_table_connection.get_column(column_name=primary_key_name)
-                        == primary_key_value
-                    )
-                    .values(row)
+                line_hash = calculate_row_hash(
+                    record=[row[column_name] for column_name in columns_list[1:]]
                 )
 
-                cloud_table_connection.session.execute(statement)
-                cloud_table_connection.session.flush()
-        else:
-            for row in rows_to_encrypt:
-                primary_key_value = row[primary_key_name]
-
-                row.pop(primary_key_name, None)
-
-                row = encrypt_dict(data_dict=row, key=public_key)
+                row = encrypt_dict(
+                    data_dict=row,
+                    key=encryption_key,
+                    binary=table.cloud_storage_format == "binary",
+                )
 
-                row[primary_key_name] = primary_key_value
+                if update_database:
+                    row[f"b_{primary_key_name}"] = primary_key_value
+                else:
+                    row[primary_key_name] = primary_key_value
+                    row["line_hash"] = line_hash
 
-                statement = insert(cloud_table_connection.table).values(row)
+                encrypted_rows.append(row)
 
-                cloud_table_connection.session.execute(statement)
-                cloud_table_connection.session.flush()
+            cloud_table_connection.session.execute(statement, encrypted_rows)
+            cloud_table_connection.session.flush()
 
         cloud_table_connection.session.commit()
 
@@ -174,7 +376,78 @@ def encrypt_database_row(
             cloud_table_connection.close()
 
 
-def encrypt_database_table(database_id: int, table_id: int, current_user: User) -> None:
+def encrypt_database_table(
+    database_id: int,
+    table_id: int,
+    current_user: User,
+    storage_format: str = _cloud_storage_format,
+) -> dict[str, any]:
+    return _encrypt_database_table(
+        database_id=database_id,
+        table_id=table_id,
+        current_user=current_user,
+        mode="full",
+        storage_format=storage_format,
+    )
+
+
+def get_storage_format(params: ImmutableMultiDict) -> str:
+    storage_format = params.get(
+        "storage_format", type=str, default=_cloud_storage_format
+    )
+
+    if not storage_format in STORAGE_FORMAT_OPTIONS:
+        raise ValidationException(
+            errors={"storage_format": "invalid storage format"},
+            message="Input payload validation failed",
+        )
+
+    return storage_format
+
+
+def resume_encrypt_database_table(
+    database_id: int, table_id: int, current_user: User
+) -> dict[str, any]:
+    table = get_table(
+        database_id=database_id, table_id=table_id, current_user=current_user
+    )
+
+    if table.encryption_checkpoint is None:
+        raise DefaultException("encryption_checkpoint_not_found", code=409)
+
+    return _encrypt_database_table(
+        database_id=database_id,
+        table_id=table_id,
+        current_user=current_user,
+        mode="resume",
+    )
+
+
+def incremental_encrypt_database_table(
+    database_id: int, table_id: int, current_user: User
+) -> dict[str, any]:
+    table = get_table(
+        database_id=database_id, table_id=table_id, current_user=current_user
+    )
+
+    if table.encryption_checkpoint is not None or not table.encrypted:
+        raise DefaultException("table_not_encrypted", code=409)
+
+    return _encrypt_database_table(
+        database_id=database_id,
+        table_id=table_id,
+        current_user=current_user,
+        mode="incremental",
+    )
+
+
+def _encrypt_database_table(
+    database_id: int,
+    table_id: int,
+    current_user: User,
+    mode: str,
+    storage_format: str = None,
+) -> dict[str, any]:
     table = get_table(
         database_id=database_id, table_id=table_id, current_user=current_user
     )
@@ -193,22 +466,13 @@ def encrypt_database_table(database_id: int, table_id: int, current_user: User)
     try:
         client_table_connection = None
         cloud_database_engine = None
+        cloud_writer = None
+        updated_rows = 0
 
-        # Create cloud database if not exist
         cloud_database_engine = create_engine(
             url=get_cloud_database_url(database_id=database_id)
         )
 
-        if database_exists(url=cloud_database_engine.url):
-            drop_database(url=cloud_database_engine.url)
-
-        create_database(url=cloud_database_engine.url)
-
-        # Create client table connection
-        client_table_connection = create_table_connection(
-            database_url=database.url, table_name=table.name
-        )
-
         # Get primary key name
         primary_key_name = get_primary_key_name(
             database_id=database_id, table_name=table.name
@@ -219,25 +483,94 @@ def encrypt_database_table(database_id: int, table_id: int, current_user: User)
             database_id=database_id, table_id=table.id, current_user=current_user
         )["sensitive_column_names"]
 
-        # Load rsa keys
-        database_keys = get_database_keys_by_database_id(database_id=database_id)
+        # Create client table connection
+        client_table_connection = create_table_connection(
+            database_url=database.url,
+            table_name=table.name,
+            columns_list=columns_list,
+        )
+
+        primary_key_column = client_table_connection.get_column(
+            column_name=primary_key_name
+        )
+
+        if mode == "resume":
+            checkpoint = _parse_primary_key_value(
+                column=primary_key_column, value=table.encryption_checkpoint
+            )
 
-        public_key, _ = load_keys(
-            publicKeyStr=database_keys.public_key,
-            privateKeyStr=database_keys.private_key,
+            # Remove rows written after last committed checkpoint
+            _delete_cloud_rows_after_checkpoint(
+                cloud_database_url=cloud_database_engine.url,
+                table_name=table.name,
+                primary_key_name=primary_key_name,
+                checkpoint=checkpoint,
+            )
+        elif mode == "incremental":
+            # Rows after the last encrypted primary key are new rows
+            checkpoint = _get_cloud_watermark(
+                cloud_database_url=cloud_database_engine.url,
+                table_name=table.name,
+                primary_key_name=primary_key_name,
+            )
+        else:
+            checkpoint = None
+
+            # Create empty cloud database
+            if database_exists(url=cloud_database_engine.url):
+                drop_database(url=cloud_database_engine.url)
+
+            create_database(url=cloud_database_engine.url)
+
+            table.encryption_checkpoint = None
+            table.cloud_storage_format = storage_format
+            db.session.commit()
+
+        # Storage format of cloud table, kept until next full encryption
+        binary = table.cloud_storage_format == "binary"
+
+        # Create cloud table and its writer, reused by all batches
+        cloud_writer = BulkWriter(
+            engine=cloud_database_engine,
+            table=create_cloud_table(
+                engine=cloud_database_engine,
+                table_name=table.name,
+                primary_key_column=primary_key_column,
+                columns_names=columns_list[1:],
+                binary=binary,
+            ),
         )
 
-        # Proxy to get data on batch
-        results_proxy = client_table_connection.session.execute(
-            select(client_table_connection.table)
+        # Get key sealing the table, a new one on full encryption
+        encryption_key = get_encryption_key(
+            database_id=database_id, table=table, new_data_key=mode == "full"
         )
 
-        # Getting rows database
-        results = results_proxy.fetchmany(_batch_selection_size)
+        # Re-encrypt rows changed before the watermark
+        if mode == "incremental" and checkpoint is not None:
+            updated_rows = _encrypt_changed_rows(
+                table=table,
+                client_table_connection=client_table_connection,
+                cloud_database_url=cloud_database_engine.url,
+                cloud_writer=cloud_writer,
+                primary_key_name=primary_key_name,
+                sensitive_columns=columns_list[1:],
+                watermark=checkpoint,
+                encryption_key=encryption_key,
+                binary=binary,
+            )
 
         # Start number row selected
         number_row_selected = 0
 
+        if checkpoint is not None:
+            number_row_selected = (
+                client_table_connection.session.query(func.count())
+                .select_from(client_table_connection.table)
+                .filter(primary_key_column <= checkpoint)
+                .scalar()
+            )
+
         # Get number row total
         number_row_total = (
             client_table_connection.session.query(func.count())
@@ -245,35 +578,16 @@ def encrypt_database_table(database_id: int, table_id: int, current_user: User)
             .scalar()
         )
 
-        # Encrypt database table
-        while results:
-            from_db = [row._asdict() for row in results]
-
-            # Create dataframe with data original database
-            dataframe_db = pd.DataFrame(from_db, columns=columns_list)
-
-            # Create columns names without id
-            columns_names = columns_list.copy()
-            columns_names.remove(primary_key_name)
-
-            # Encrypt each column
-            for column in columns_names:
-                dataframe_db[column] = encrypt_list(
-                    list(dataframe_db[column]), public_key
-                )
-
-            # Add column hash
-            dataframe_db["line_hash"] = [None] * len(dataframe_db)
+        def write_batch(rows: list[dict], encrypted_rows: list[dict]) -> None:
+            nonlocal number_row_selected
 
             # Send data to database
-            dataframe_db.to_sql(
-                table.name,
-                cloud_database_engine.connect(),
-                if_exists="append",
-                index=False,
-            )
+            cloud_writer.write(rows=encrypted_rows)
+
+            number_row_selected += len(rows)
 
-            number_row_selected += _batch_selection_size
+            # Save watermark of committed batch along with progress
+            table.encryption_checkpoint = str(rows[-1][primary_key_name])
 
             _calculate_progress(
                 table=table,
@@ -281,24 +595,427 @@ def encrypt_database_table(database_id: int, table_id: int, current_user: User)
                 number_row_total=number_row_total,
             )
 
-            # Getting next rows database
-            results = results_proxy.fetchmany(_batch_selection_size)
+        # Encrypt database table: read, encrypt on workers and write
+        pipeline_stats = run_batch_pipeline(
+            batches=_read_batches(
+                table_connection=client_table_connection,
+                batch_size=_encryption_batch_size,
+                primary_key_name=primary_key_name,
+                checkpoint=checkpoint,
+            ),
+            process_batch=_encrypt_rows,
+            process_args=(encryption_key, primary_key_name, columns_list[1:], binary),
+            write_batch=write_batch,
+            workers=_encryption_workers,
+            queue_size=_encryption_queue_size,
+        )
 
         table.encryption_progress = 100
+        table.encryption_checkpoint = None
 
     except:
-        table.encryption_progress = 0
+        db.session.rollback()
+
+        # Keep progress of a resumable or already encrypted table
+        if table.encryption_checkpoint is None and mode != "incremental":
+            table.encryption_progress = 0
+
         raise DefaultException("table_not_encrypted", code=500)
 
     finally:
         if client_table_connection is not None:
             client_table_connection.close()
 
+        if cloud_writer is not None:
+            cloud_writer.close()
+
         if cloud_database_engine is not None:
             cloud_database_engine.dispose()
 
         db.session.commit()
 
+    return pipeline_stats.to_dict() | {"updated_rows": updated_rows}
+
+
+def _parse_primary_key_value(column, value):
+    try:
+        return column.type.python_type(value)
+    except:
+        return value
+
+
+def _get_cloud_watermark(
+    cloud_database_url: str, table_name: str, primary_key_name: str
+):
+    if not database_exists(url=cloud_database_url):
+        raise DefaultException("table_not_encrypted", code=409)
+
+    cloud_table_connection = create_table_connection(
+        database_url=cloud_database_url,
+        table_name=table_name,
+        columns_list=[primary_key_name],
+    )
+
+    try:
+        return cloud_table_connection.session.query(
+            func.max(cloud_table_connection.get_column(column_name=primary_key_name))
+        ).scalar()
+    finally:
+        cloud_table_connection.close()
+
+
+def _encrypt_changed_rows(
+    table: Table,
+    client_table_connection: TableConnection,
+    cloud_database_url: str,
+    cloud_writer: BulkWriter,
+    primary_key_name: str,
+    sensitive_columns: list[str],
+    watermark,
+    encryption_key,
+    binary: bool,
+) -> int:
+    """
+    This function re-encrypts client rows up to the watermark whose
+    sensitive values no longer match the line hash stored on Cloud
+    Database, and inserts the ones missing there. A row not anonymized yet
+    is encrypted again as is. On an anonymized row, only the columns
+    changed on Client Database are merged into the original row, which is
+    then encrypted again and anonymized again on Client Database. Rows
+    without line hash, encrypted before hashes were stored on encryption,
+    are compared with their original row and get their line hash.
+
+    Parameters
+    ----------
+    table : Table
+        Table of rows.
+
+    client_table_connection : TableConnection
+        Client table connection, with primary key and sensitive columns.
+
+    cloud_database_url : str
+        Cloud Database URL.
+
+    cloud_writer : BulkWriter
+        Writer of cloud table, used for missing rows.
+
+    primary_key_name : str
+        Primary key name.
+
+    sensitive_columns : list[str]
+        Sensitive column names, in line hash order.
+
+    watermark : any
+        Last primary key on Cloud Database.
+
+    encryption_key : EnvelopeKey | rsa.PublicKey
+        Key sealing the rows.
+
+    binary : bool
+        True if cloud table stores binary cells.
+
+    Returns
+    -------
+    int
+        Number of rows updated or inserted.
+    """
+
+    cloud_table_connection = create_table_connection(
+        database_url=cloud_database_url,
+        table_name=client_table_connection.table_name,
+        columns_list=[primary_key_name, "line_hash"],
+    )
+
+    cloud_primary_key_column = cloud_table_connection.get_column(
+        column_name=primary_key_name
+    )
+
+    # Get columns types of Client Database from reflected table
+    columns_types = {
+        column.name: str(column.type).split("(")[0]
+        for column in client_table_connection.table.columns
+    }
+
+    decryption_key = get_decryption_key(database_id=table.database_id)
+    context = None
+
+    # Anonymized rows of Client Database, written once the scan is over
+    anonymized_rows = []
+    updated_rows = 0
+
+    try:
+        for rows in _read_batches(
+            table_connection=client_table_connection,
+            batch_size=_encryption_batch_size,
+            primary_key_name=primary_key_name,
+            watermark=watermark,
+        ):
+            # Line hashes of rows on Cloud Database
+            cloud_rows_hash = dict(
+                cloud_table_connection.session.execute(
+                    select(
+                        cloud_primary_key_column,
+                        cloud_table_connection.get_column(column_name="line_hash"),
+                    ).where(
+                        cloud_primary_key_column.in_(
+                            [row[primary_key_name] for row in rows]
+                        )
+                    )
+                ).fetchall()
+            )
+
+            client_rows = {}
+            missing_rows = []
+
+            for row in rows:
+                if not row[primary_key_name] in cloud_rows_hash:
+                    missing_rows.append(row)
+                    continue
+
+                primary_key_value = row.pop(primary_key_name)
+
+                if cloud_rows_hash[primary_key_value] == calculate_row_hash(
+                    record=[row[column_name] for column_name in sensitive_columns]
+                ):
+                    continue
+
+                client_rows[primary_key_value] = row
+
+            missing_rows = _encrypt_rows(
+                rows=missing_rows,
+                key=encryption_key,
+                primary_key_name=primary_key_name,
+                columns_names=sensitive_columns,
+                binary=binary,
+            )
+
+            changed_rows = []
+            hashed_rows = []
+
+            if client_rows:
+                # Original rows of changed rows, from Cloud Database
+                original_rows = cloud_table_connection.session.execute(
+                    select(
+                        *[
+                            cloud_writer.table.c[column_name]
+                            for column_name in [primary_key_name, *sensitive_columns]
+                        ]
+                    ).where(
+                        cloud_writer.table.c[primary_key_name].in_(client_rows.keys())
+                    )
+                )
+
+                for original_row in original_rows:
+                    original_row = original_row._asdict()
+                    primary_key_value = original_row.pop(primary_key_name)
+                    client_row = client_rows[primary_key_value]
+                    line_hash = cloud_rows_hash[primary_key_value]
+
+                    original_row = decrypt_dict(
+                        data_dict=original_row, key=decryption_key
+                    )
+                    original_line_hash = calculate_row_hash(
+                        record=[
+                            original_row[column_name]
+                            for column_name in sensitive_columns
+                        ]
+                    )
+                    client_line_hash = calculate_row_hash(
+                        record=[
+                            client_row[column_name] for column_name in sensitive_columns
+                        ]
+                    )
+
+                    # Row not anonymized yet, Client Database has its values
+                    if line_hash is None or line_hash == original_line_hash:
+                        if client_line_hash == original_line_hash:
+                            hashed_rows.append(
+                                {
+                                    f"b_{primary_key_name}": primary_key_value,
+                                    "line_hash": client_line_hash,
+                                }
+                            )
+                            continue
+
+                        row = encrypt_dict(
+                            data_dict=client_row, key=encryption_key, binary=binary
+                        )
+                        row[f"b_{primary_key_name}"] = primary_key_value
+                        row["line_hash"] = client_line_hash
+                        changed_rows.append(row)
+                        continue
+
+                    if context is None:
+                        context = get_anonymization_context(
+                            table=table, primary_key_name=primary_key_name
+                        )
+
+                    original_row = _fix_row_types(
+                        row=original_row, columns_types=columns_types
+                    )
+                    original_row[primary_key_name] = primary_key_value
+
+                    # Columns changed on Client Database are the ones no
+                    # longer matching the anonymized original values
+                    anonymized_row = original_row.copy()
+                    context.anonymize_rows(rows=[anonymized_row])
+
+                    for column_name in sensitive_columns:
+                        if str(anonymized_row[column_name]) != str(
+                            client_row[column_name]
+                        ):
+                            original_row[column_name] = client_row[column_name]
+
+                    anonymized_row = original_row.copy()
+                    context.anonymize_rows(rows=[anonymized_row])
+                    anonymized_rows.append(anonymized_row)
+
+                    row = encrypt_dict(
+                        data_dict={
+                            column_name: original_row[column_name]
+                            for column_name in sensitive_columns
+                        },
+                        key=encryption_key,
+                        binary=binary,
+                    )
+                    row[f"b_{primary_key_name}"] = primary_key_value
+                    row["line_hash"] = calculate_row_hash(
+                        record=[
+                            anonymized_row[column_name]
+                            for column_name in sensitive_columns
+                        ]
+                    )
+                    changed_rows.append(row)
+
+            for cloud_rows in (changed_rows, hashed_rows):
+                if cloud_rows:
+                    cloud_table_connection.session.execute(
+                        update(cloud_writer.table).where(
+                            cloud_writer.table.c[primary_key_name]
+                            == bindparam(f"b_{primary_key_name}")
+                        ),
+                        cloud_rows,
+                    )
+
+            cloud_table_connection.session.commit()
+
+            cloud_writer.write(rows=missing_rows)
+
+            updated_rows += len(changed_rows) + len(missing_rows)
+
+        # Client rows are updated after the scan, which holds its own
+        # connection on the table
+        if anonymized_rows:
+            update_rows(
+                connection=client_table_connection.session.connection(),
+                table=client_table_connection.table,
+                primary_key_name=primary_key_name,
+                columns_names=context.table_anonymizers.columns_names,
+                rows=anonymized_rows,
+            )
+            client_table_connection.session.commit()
+
+    finally:
+        cloud_table_connection.close()
+
+    return updated_rows
+
+
+def _delete_cloud_rows_after_checkpoint(
+    cloud_database_url: str, table_name: str, primary_key_name: str, checkpoint
+) -> None:
+    cloud_table_connection = create_table_connection(
+        database_url=cloud_database_url,
+        table_name=table_name,
+        columns_list=[primary_key_name],
+    )
+
+    try:
+        cloud_table_connection.session.query(cloud_table_connection.table).filter(
+            cloud_table_connection.get_column(column_name=primary_key_name) > checkpoint
+        ).delete(synchronize_session=False)
+
+        cloud_table_connection.session.commit()
+    finally:
+        cloud_table_connection.close()
+
+
+def create_cloud_line_hash_indexes() -> int:
+    """
+    This function adds the line hash index to cloud tables encrypted
+    before it was created along with the table.
+
+    Returns
+    -------
+    int
+        Number of indexes created.
+    """
+
+    created_indexes = 0
+
+    for table in Table.query.filter(Table.encryption_progress > 0).all():
+        cloud_database_engine = create_engine(
+            url=get_cloud_database_url(database_id=table.database_id)
+        )
+
+        try:
+            if not database_exists(url=cloud_database_engine.url):
+                continue
+
+            if not inspect(cloud_database_engine).has_table(table.name):
+                continue
+
+            if create_line_hash_index(
+                engine=cloud_database_engine, table_name=table.name
+            ):
+                created_indexes += 1
+        finally:
+            cloud_database_engine.dispose()
+
+    return created_indexes
+
+
+def rehash_cloud_line_hashes() -> int:
+    """
+    This function stores again the line hash of every row of encrypted
+    tables, from its current values on Client Database. Line hashes stored
+    before values were hashed as read from Client Database do not match
+    the rows anymore.
+
+    Returns
+    -------
+    int
+        Number of tables rehashed.
+    """
+
+    rehashed_tables = 0
+
+    for table in Table.query.filter(Table.encryption_progress > 0).all():
+        cloud_database_engine = create_engine(
+            url=get_cloud_database_url(database_id=table.database_id)
+        )
+
+        try:
+            if not database_exists(url=cloud_database_engine.url):
+                continue
+
+            if not inspect(cloud_database_engine).has_table(table.name):
+                continue
+        finally:
+            cloud_database_engine.dispose()
+
+        cloud_table_connection = generate_hash_column(
+            client_database_id=table.database_id,
+            client_database_url=get_database(database_id=table.database_id).url,
+            table=table,
+            update_progress=False,
+        )
+        cloud_table_connection.close()
+
+        rehashed_tables += 1
+
+    return rehashed_tables
+
 
 def get_encryption_progress(
     database_id: int, table_id: int, current_user: User
@@ -319,20 +1036,33 @@ def decrypt_row(
     search_type = data.get("search_type")
     search_value = data.get("search_value")
 
-    table = get_table(
-        database_id=database_id, table_id=table_id, current_user=current_user
-    )
+    if not search_type in ["primary_key", "row_hash"]:
+        raise ValidationException(
+            errors={"search_type": "invalid search type"},
+            message="Input payload validation failed",
+        )
 
-    client_database = get_database(
-        database_id=database_id, current_user=current_user, verify_connection=True
-    )
+    if search_type == "row_hash":
+        search_value = _get_primary_key_by_row_hash(
+            database_id=database_id,
+            table_id=table_id,
+            row_hash=search_value,
+            current_user=current_user,
+        )
 
-    # Get cloud database url
-    cloud_database_url = get_cloud_database_url(database_id=database_id)
+    return decrypt_rows(
+        database_id=database_id,
+        table_id=table_id,
+        primary_keys=[search_value],
+        current_user=current_user,
+    )[0]
 
-    # Create cloud table connection
-    cloud_table_connection = create_table_connection(
-        database_url=cloud_database_url, table_name=table.name
+
+def _get_primary_key_by_row_hash(
+    database_id: int, table_id: int, row_hash: str, current_user: User = None
+):
+    table = get_table(
+        database_id=database_id, table_id=table_id, current_user=current_user
     )
 
     # Get primary key name
@@ -340,130 +1070,174 @@ def decrypt_row(
         database_id=database_id, table_name=table.name
     )
 
+    # Create cloud table connection
+    cloud_table_connection = create_table_connection(
+        database_url=get_cloud_database_url(database_id=database_id),
+        table_name=table.name,
+        columns_list=[primary_key_name, "line_hash"],
+    )
+
     try:
-        # Searching to row on Cloud Database
-        if search_type == "primary_key":
-            search_value = int(search_value)
-            query_sensitive_data = (
-                cloud_table_connection.session.query(cloud_table_connection.table)
-                .filter(
-                    cloud_table_connection.get_column(column_name=primary_key_name)
-                    == search_value
-                )
-                .all()
+        # Searching to row on Cloud Database, by line hash index
+        primary_key_value = (
+            cloud_table_connection.session.query(
+                cloud_table_connection.get_column(column_name=primary_key_name)
             )
-        elif search_type == "row_hash":
-            query_sensitive_data = (
-                cloud_table_connection.session.query(cloud_table_connection.table)
-                .filter(
-                    cloud_table_connection.get_column(column_name=primary_key_name)
-                    == search_value
-                )
-                .all()
-            )
-        else:
-            raise ValidationException(
-                errors={"search_type": "invalid search type"},
-                message="Input payload validation failed",
+            .filter(
+                cloud_table_connection.get_column(column_name="line_hash") == row_hash
             )
+            .limit(1)
+            .scalar()
+        )
+    finally:
+        cloud_table_connection.close()
 
-        if not query_sensitive_data:
-            raise DefaultException("row_not_found", code=404)
+    if primary_key_value is None:
+        raise DefaultException("row_not_found", code=404)
 
-        # Transform sensitive data query to dictionary
-        dict_sensitive_data = [row._asdict() for row in query_sensitive_data][0]
+    return primary_key_value
 
-        # Remove primary key and hash value
-        remove_primary_key_response = dict_sensitive_data.pop(primary_key_name, None)
-        remove_line_hash_response = dict_sensitive_data.pop("line_hash", None)
 
-        if remove_primary_key_response == None or remove_line_hash_response == None:
-            raise DefaultException("row_not_decrypted", code=500)
+def decrypt_rows(
+    database_id: int,
+    table_id: int,
+    primary_keys: list,
+    current_user: User = None,
+) -> list[dict[str, any]]:
+    table = get_table(
+        database_id=database_id, table_id=table_id, current_user=current_user
+    )
 
-        # Load rsa keys
-        database_keys = get_database_keys_by_database_id(database_id=database_id)
+    client_database = get_database(
+        database_id=database_id, current_user=current_user, verify_connection=True
+    )
 
-        if not database_keys:
-            raise DefaultException("row_not_decrypted", code=500)
+    # Get cloud database url
+    cloud_database_url = get_cloud_database_url(database_id=database_id)
 
-        _, private_key = load_keys(
-            publicKeyStr=database_keys.public_key,
-            privateKeyStr=database_keys.private_key,
-        )
+    # Get primary key name
+    primary_key_name = get_primary_key_name(
+        database_id=database_id, table_name=table.name
+    )
 
-        # Decrypt sensitive data
-        dict_decrypted_sensitive_data = decrypt_dict(
-            data_dict=dict_sensitive_data, key=private_key
-        )
+    cloud_table_connection = None
+    client_table_connection = None
 
-        # Create client table connection
+    try:
+        # Create cloud and client table connections, shared by all chunks
+        cloud_table_connection = create_table_connection(
+            database_url=cloud_database_url, table_name=table.name
+        )
         client_table_connection = create_table_connection(
             database_url=client_database.url, table_name=table.name
         )
 
-        # Searching to row on Client Database
-        query_non_sensitive_data = (
-            client_table_connection.session.query(client_table_connection.table)
-            .filter(
-                client_table_connection.get_column(column_name=primary_key_name)
-                == search_value
-            )
-            .all()
+        cloud_primary_key_column = cloud_table_connection.get_column(
+            column_name=primary_key_name
+        )
+        client_primary_key_column = client_table_connection.get_column(
+            column_name=primary_key_name
         )
 
-        if not query_non_sensitive_data:
-            raise DefaultException("row_not_found", code=404)
+        # Convert primary keys to the column type, as sent on search values
+        primary_keys = [
+            _parse_primary_key_value(column=client_primary_key_column, value=value)
+            for value in primary_keys
+        ]
+
+        # Get columns types of Client Database from reflected table
+        columns_types = {
+            column.name: str(column.type).split("(")[0]
+            for column in client_table_connection.table.columns
+        }
+
+        # Get keys opening the rows
+        decryption_key = get_decryption_key(database_id=database_id)
+
+        decrypted_rows = {}
+        for index in range(0, len(primary_keys), _encryption_batch_size):
+            primary_keys_chunk = primary_keys[index : index + _encryption_batch_size]
+
+            # Searching to rows on Cloud Database
+            query_sensitive_data = cloud_table_connection.session.execute(
+                select(cloud_table_connection.table).where(
+                    cloud_primary_key_column.in_(primary_keys_chunk)
+                )
+            )
 
-        # Transform non-sensitive data query to dictionary
-        dict_result_data = [row._asdict() for row in query_non_sensitive_data][0]
+            dict_sensitive_data = {}
+            for row in query_sensitive_data:
+                row = row._asdict()
 
-        # Insert decrypted sensitive data in non-sensitive data dictionary
-        for key in dict_decrypted_sensitive_data.keys():
-            dict_result_data[key] = dict_decrypted_sensitive_data[key]
+                # Remove primary key and hash value
+                primary_key_value = row.pop(primary_key_name)
+                row.pop("line_hash", None)
 
-        # Get date type columns on news rows of Client Database
-        data_type_keys = []
-        for key in dict_result_data.keys():
-            type_data = str(type(dict_result_data[key]).__name__)
-            if type_data == "date":
-                data_type_keys.append(key)
+                dict_sensitive_data[primary_key_value] = row
 
-        # Fix columns date types of row
-        for key in data_type_keys:
-            dict_result_data[key] = dict_result_data[key].strftime("%Y-%m-%d")
+            # Searching to rows on Client Database
+            query_non_sensitive_data = client_table_connection.session.execute(
+                select(client_table_connection.table).where(
+                    client_primary_key_column.in_(primary_keys_chunk)
+                )
+            )
 
-        # Fix columns types of row
-        columns_types = get_database_columns_types(
-            database_id=database_id, table_name=table.name
-        )
+            for row in query_non_sensitive_data:
+                dict_result_data = row._asdict()
+                primary_key_value = dict_result_data[primary_key_name]
 
-        for key in columns_types.keys():
-            column_type = columns_types[key].split("(")[0]
+                if not primary_key_value in dict_sensitive_data:
+                    continue
+
+                # Insert decrypted sensitive data in non-sensitive data dictionary
+                dict_result_data.update(
+                    decrypt_dict(
+                        data_dict=dict_sensitive_data[primary_key_value],
+                        key=decryption_key,
+                    )
+                )
 
-            if column_type == "INTEGER":
-                dict_result_data[key] = int(dict_result_data[key])
-            elif column_type == "VARCHAR":
-                dict_result_data[key] = str(dict_result_data[key])
-            else:
-                pass
+                decrypted_rows[primary_key_value] = _fix_row_types(
+                    row=dict_result_data, columns_types=columns_types
+                )
 
-        return dict_result_data
     except:
         raise DefaultException("row_not_decrypted", code=500)
 
+    finally:
+        if cloud_table_connection is not None:
+            cloud_table_connection.close()
+
+        if client_table_connection is not None:
+            client_table_connection.close()
 
-from app.main.service.database_key_service import (
-    load_keys,
-    get_database_keys_by_database_id,
-)
-from app.main.service.database_service import (
-    get_database,
-    get_database_columns_types,
-    get_database_tables_names,
-)
-from app.main.service.global_service import (
-    create_table_connection,
-    get_cloud_database_url,
-    get_primary_key_name,
-)
+    if any(not primary_key in decrypted_rows for primary_key in primary_keys):
+        raise DefaultException("row_not_found", code=404)
+
+    return [decrypted_rows[primary_key] for primary_key in primary_keys]
+
+
+def _fix_row_types(row: dict[str, any], columns_types: dict[str, str]) -> dict:
+    for key, value in row.items():
+        if value is None:
+            continue
+
+        # Fix columns date types of row
+        if type(value).__name__ == "date":
+            row[key] = value.strftime("%Y-%m-%d")
+
+        # Fix columns types of row
+        elif columns_types.get(key) == "INTEGER":
+            row[key] = int(value)
+        elif columns_types.get(key) == "VARCHAR":
+            row[key] = str(value)
+
+    return row
+
+
+from app.main.service.anonymizer_registry_service import get_anonymization_context
+from app.main.service.database_key_service import get_public_key
+from app.main.service.database_service import get_database, get_database_tables_names
+from app.main.service.pipeline_service import run_batch_pipeline
+from app.main.service.sse_service import calculate_row_hash, generate_hash_column
 from app.main.service.table_service import get_sensitive_columns, get_table
@@ -0,0 +1,203 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from math import ceil
+from typing import Callable
+
+from flask import Flask, current_app
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import ImmutableMultiDict
+
+from app.main import db
+from app.main.config import app_config
+from app.main.exceptions import DefaultException
+from app.main.model import Job, User
+
+_DEFAULT_CONTENT_PER_PAGE = app_config.DEFAULT_CONTENT_PER_PAGE
+
+# In-process worker pool running queued jobs
+_executor = ThreadPoolExecutor(
+    max_workers=app_config.JOB_WORKERS, thread_name_prefix="job"
+)
+
+
+def enqueue_job(
+    operation: str,
+    function: Callable,
+    database_id: int,
+    table_id: int,
+    current_user: User,
+) -> Job:
+    """
+    This function persists a new job and submits it to the worker pool.
+    Only one queued or running job is allowed per table.
+
+    Parameters
+    ----------
+    operation : str
+        Operation name.
+
+    function : Callable
+        Service called as function(database_id, table_id, current_user).
+
+    database_id : int
+        Database ID.
+
+    table_id : int
+        Table ID.
+
+    current_user : User
+        User owning the job.
+
+    Returns
+    -------
+    Job
+        Queued job.
+    """
+
+    # Validate table and user permission before queuing
+    get_table(database_id=database_id, table_id=table_id, current_user=current_user)
+
+    new_job = Job(
+        user_id=current_user.id,
+        database_id=database_id,
+        table_id=table_id,
+        active_table_id=table_id,
+        operation=operation,
+        status="queued",
+    )
+
+    # Unique active table, so concurrent requests can not both insert
+    try:
+        db.session.add(new_job)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise DefaultException("job_already_running", code=409)
+    except:
+        db.session.rollback()
+        raise DefaultException("job_not_created", code=500)
+
+    _executor.submit(_run_job, current_app._get_current_object(), new_job.id, function)
+
+    return new_job
+
+
+def _run_job(app: Flask, job_id: int, function: Callable) -> None:
+    with app.app_context():
+        try:
+            job = Job.query.get(job_id)
+
+            job.status = "running"
+            job.started_at = datetime.now()
+            db.session.commit()
+
+            # Session of request is gone, query user on this thread
+            current_user = User.query.get(job.user_id)
+
+            try:
+                job.result = function(
+                    database_id=job.database_id,
+                    table_id=job.table_id,
+                    current_user=current_user,
+                )
+                job.status = "finished"
+            except DefaultException as error:
+                db.session.rollback()
+                job.status = "failed"
+                job.error = error.description
+            except:
+                db.session.rollback()
+                job.status = "failed"
+                job.error = "internal_error"
+
+            job.active_table_id = None
+            job.finished_at = datetime.now()
+            db.session.commit()
+
+        finally:
+            db.session.remove()
+
+
+def fail_interrupted_jobs() -> int:
+    """
+    This function marks as failed the jobs left queued or running by a
+    previous process, since the worker pool does not survive a restart.
+
+    Returns
+    -------
+    int
+        Number of jobs marked as failed.
+    """
+
+    # Jobs table does not exist yet before create_db
+    if not inspect(db.engine).has_table(Job.__tablename__):
+        return 0
+
+    try:
+        number_jobs = Job.query.filter(Job.status.in_(["queued", "running"])).update(
+            {
+                Job.status: "failed",
+                Job.error: "interrupted",
+                Job.active_table_id: None,
+                Job.finished_at: datetime.now(),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+    except:
+        db.session.rollback()
+        raise DefaultException("jobs_not_updated", code=500)
+
+    return number_jobs
+
+
+def get_jobs(params: ImmutableMultiDict, current_user: User) -> dict[str, any]:
+    page = params.get("page", type=int, default=1)
+    per_page = params.get("per_page", type=int, default=_DEFAULT_CONTENT_PER_PAGE)
+    status = params.get("status", type=str)
+
+    filters = [Job.user_id == current_user.id]
+
+    if status:
+        filters.append(Job.status == status)
+
+    pagination = (
+        Job.query.filter(*filters)
+        .order_by(Job.id.desc())
+        .paginate(page=page, per_page=per_page, error_out=False)
+    )
+
+    return {
+        "current_page": page,
+        "total_items": pagination.total,
+        "total_pages": ceil(pagination.total / per_page),
+        "items": pagination.items,
+    }
+
+
+def get_job_result(job_id: int, current_user: User) -> dict[str, any]:
+    job = get_job(job_id=job_id, current_user=current_user)
+
+    if job.status == "failed":
+        raise DefaultException(job.error, code=500)
+
+    if job.status != "finished":
+        raise DefaultException("job_not_finished", code=409)
+
+    return {"result": job.result}
+
+
+def get_job(job_id: int, current_user: User) -> Job:
+    job = Job.query.get(job_id)
+
+    if job is None:
+        raise DefaultException("job_not_found", code=404)
+
+    if job.user_id != current_user.id:
+        raise DefaultException("unauthorized_user", code=401)
+
+    return job
+
+
+from app.main.service.table_service import get_table
@@ -0,0 +1,190 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
+
+_END_OF_BATCHES = object()
+_QUEUE_TIMEOUT_SECONDS = 0.5
+
+# Workers start from a fresh interpreter, a fork of the server would copy
+# its threads' locks and its open database connections
+_PROCESS_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class PipelineStats:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.rows = 0
+        self.batches = 0
+        self.read_seconds = 0.0
+        self.process_seconds = 0.0
+        self.write_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def _stage(self, seconds: float) -> dict[str, float]:
+        return {
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds else None,
+        }
+
+    def to_dict(self) -> dict[str, any]:
+        return {
+            "workers": self.workers,
+            "rows": self.rows,
+            "batches": self.batches,
+            "total": self._stage(self.total_seconds),
+            "stages": {
+                "read": self._stage(self.read_seconds),
+                "process": self._stage(self.process_seconds),
+                "write": self._stage(self.write_seconds),
+            },
+        }
+
+
+def _timed_call(function: Callable, *args) -> tuple[any, float]:
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def _put(batch_queue: queue.Queue, item, stop_event: threading.Event) -> None:
+    # Block while queue is full, but give up when the pipeline is stopped
+    while not stop_event.is_set():
+        try:
+            batch_queue.put(item, timeout=_QUEUE_TIMEOUT_SECONDS)
+            return
+        except queue.Full:
+            continue
+
+
+def _read_stage(
+    batches: Iterator,
+    executor: ProcessPoolExecutor,
+    process_batch: Callable,
+    process_args: tuple,
+    batch_queue: queue.Queue,
+    stop_event: threading.Event,
+    stats: PipelineStats,
+) -> None:
+    try:
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            batch = next(batches, None)
+            stats.read_seconds += time.perf_counter() - started
+
+            if batch is None:
+                break
+
+            future = executor.submit(_timed_call, process_batch, batch, *process_args)
+            _put(batch_queue, (batch, future), stop_event)
+
+    except Exception as error:
+        _put(batch_queue, error, stop_event)
+
+    finally:
+        _put(batch_queue, _END_OF_BATCHES, stop_event)
+
+
+def run_batch_pipeline(
+    batches: Iterator,
+    process_batch: Callable,
+    write_batch: Callable,
+    process_args: tuple = (),
+    workers: int = 1,
+    queue_size: int = 2,
+) -> PipelineStats:
+    """
+    This function runs a three stage pipeline over batches: a reader
+    thread pulling batches, a process pool running process_batch and
+    the caller thread running write_batch, in order.
+
+    Parameters
+    ----------
+    batches : Iterator
+        Batches to process, pulled by the reader thread.
+
+    process_batch : Callable
+        Picklable function called as process_batch(batch, *process_args)
+        on the process pool.
+
+    write_batch : Callable
+        Function called as write_batch(batch, result) on the caller thread.
+
+    process_args : tuple
+        Extra picklable arguments of process_batch.
+
+    workers : int
+        Number of processes of the pool.
+
+    queue_size : int
+        Max number of batches read and not yet written.
+
+    Returns
+    -------
+    PipelineStats
+        Rows, batches and busy time of each stage. The process stage time
+        is summed over all workers.
+    """
+
+    workers = max(workers, 1)
+    stats = PipelineStats(workers=workers)
+    started = time.perf_counter()
+
+    batch_queue = queue.Queue(maxsize=max(queue_size, 1))
+    stop_event = threading.Event()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=_PROCESS_CONTEXT
+    ) as executor:
+        reader = threading.Thread(
+            target=_read_stage,
+            args=(
+                batches,
+                executor,
+                process_batch,
+                process_args,
+                batch_queue,
+                stop_event,
+                stats,
+            ),
+            daemon=True,
+        )
+        reader.start()
+
+        try:
+            while True:
+                item = batch_queue.get()
+
+                if item is _END_OF_BATCHES:
+                    break
+
+                if isinstance(item, Exception):
+                    raise item
+
+                batch, future = item
+                result, process_seconds = future.result()
+                stats.process_seconds += process_seconds
+
+                write_started = time.perf_counter()
+                write_batch(batch, result)
+                stats.write_seconds += time.perf_counter() - write_started
+
+                stats.rows += len(batch)
+                stats.batches += 1
+
+        finally:
+            stop_event.set()
+
+            # Release reader blocked on a full queue and pending batches
+            while not batch_queue.empty():
+                item = batch_queue.get_nowait()
+                if isinstance(item, tuple):
+                    item[1].cancel()
+
+            reader.join()
+
+    stats.total_seconds = time.perf_counter() - started
+
+    return stats
@@ -0,0 +1,70 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.types import SchemaType
+
+from app.main import db
+
+
+def upgrade_database_schema() -> list[str]:
+    """
+    This function adds the tables and columns of models missing on the
+    application database, without dropping or changing existing ones.
+
+    Returns
+    -------
+    list[str]
+        Names of added tables and columns, as table or table.column.
+    """
+
+    engine = db.engine
+    preparer = engine.dialect.identifier_preparer
+    existing_tables = set(inspect(engine).get_table_names())
+
+    # Missing tables, created with their constraints
+    upgrades = [
+        table_name
+        for table_name in db.Model.metadata.tables.keys()
+        if table_name not in existing_tables
+    ]
+    db.Model.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        for table_name, table in db.Model.metadata.tables.items():
+            if table_name not in existing_tables:
+                continue
+
+            existing_columns = {
+                column["name"] for column in inspect(connection).get_columns(table_name)
+            }
+
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+
+                # Enum types are created apart on PostgreSQL
+                if isinstance(column.type, SchemaType):
+                    column.type.create(bind=connection, checkfirst=True)
+
+                connection.execute(
+                    text(
+                        "ALTER TABLE {} ADD COLUMN {}".format(
+                            preparer.format_table(table),
+                            CreateColumn(column).compile(dialect=engine.dialect),
+                        )
+                    )
+                )
+
+                if column.unique:
+                    connection.execute(
+                        text(
+                            "CREATE UNIQUE INDEX {} ON {} ({})".format(
+                                preparer.quote(f"uq_{table_name}_{column.name}"),
+                                preparer.format_table(table),
+                                preparer.quote(column.name),
+                            )
+                        )
+                    )
+
+                upgrades.append(f"{table_name}.{column.name}")
+
+    return upgrades
@@ -1,6 +1,5 @@
 import hashlib
 
-import pandas as pd
 from sqlalchemy import func, select, update
 
 from app.main import db
@@ -26,28 +25,31 @@ def _calculate_progress(
     db.session.commit()
 
 
+def calculate_row_hash(record: list) -> str:
+    # Hash of sensitive values of a client row, compared by agents
+    new_record = str([str(value) for value in record])
+
+    return hashlib.sha256(new_record.encode("utf-8")).hexdigest()
+
+
 def update_hash_column(
     cloud_table_connection: TableConnection,
     primary_key_name: str,
-    primary_key_data: list,
-    raw_data: list,
+    columns_names: list[str],
+    rows: list[dict],
 ) -> None:
-    for primary_key_value, row in zip(primary_key_data, range(raw_data.shape[0])):
-        record = raw_data.iloc[row].values
-        record = list(record)
-
-        for index in range(len(record)):
-            record[index] = str(record[index])
-
-        new_record = str(record)
-
-        hashed_line = hashlib.sha256(new_record.encode("utf-8")).hexdigest()
+    for row in rows:
+        # Raw values, as hashed by incremental encryption, since a DataFrame
+        # turns integer columns with NULL values into floats
+        hashed_line = calculate_row_hash(
+            record=[row[column_name] for column_name in columns_names]
+        )
 
         statement = (
             update(cloud_table_connection.table)
             .where(
                 cloud_table_connection.get_column(column_name=primary_key_name)
-                == primary_key_value
+                == row[primary_key_name]
             )
             .values(line_hash=hashed_line)
         )
@@ -70,7 +72,7 @@ def generate_hash_rows(
     )
 
     # Get sensitve columns of table
-    client_columns_list = [primary_key_name] + get_sensitive_columns(
+    sensitive_columns = get_sensitive_columns(
         database_id=database_id, table_id=table.id, current_user=current_user
     )["sensitive_column_names"]
 
@@ -82,16 +84,11 @@ def generate_hash_rows(
         database_url=cloud_database_url, table_name=table.name
     )
 
-    # Transform query rows to dataframe
-    raw_data = pd.DataFrame(data=result_query)[client_columns_list]
-    primary_key_data = raw_data[primary_key_name]
-    raw_data.pop(primary_key_name)
-
     update_hash_column(
         cloud_table_connection=cloud_table_connection,
         primary_key_name=primary_key_name,
-        primary_key_data=primary_key_data,
-        raw_data=raw_data,
+        columns_names=sensitive_columns,
+        rows=result_query,
     )
 
     return cloud_table_connection
@@ -101,6 +98,7 @@ def generate_hash_column(
     client_database_id: int,
     client_database_url: str,
     table: Table,
+    update_progress: bool = True,
 ) -> TableConnection:
     # Get primary key name
     primary_key_name = get_primary_key_name(
@@ -108,9 +106,10 @@ def generate_hash_column(
     )
 
     # Get column names to encrypt along with primary key name
-    client_columns_list = [primary_key_name] + get_sensitive_columns(
+    sensitive_columns = get_sensitive_columns(
         database_id=client_database_id, table_id=table.id
     )["sensitive_column_names"]
+    client_columns_list = [primary_key_name] + sensitive_columns
 
     # Create client table connection
     client_table_connection = create_table_connection(
@@ -146,29 +145,21 @@ def generate_hash_column(
 
     # Generate hashs
     while results:
-        from_db = []
-
-        for result in results:
-            from_db.append(dict(result))
-
-        raw_data = pd.DataFrame(data=from_db)[client_columns_list]
-        primary_key_data = raw_data[primary_key_name]
-        raw_data.pop(primary_key_name)
-
         update_hash_column(
             cloud_table_connection=cloud_table_connection,
             primary_key_name=primary_key_name,
-            primary_key_data=primary_key_data,
-            raw_data=raw_data,
+            columns_names=sensitive_columns,
+            rows=[result._asdict() for result in results],
         )
 
         number_row_selected += _batch_selection_size
 
-        _calculate_progress(
-            table=table,
-            number_row_selected=number_row_selected,
-            number_row_total=number_row_total,
-        )
+        if update_progress:
+            _calculate_progress(
+                table=table,
+                number_row_selected=number_row_selected,
+                number_row_total=number_row_total,
+            )
 
         # Getting rows database
         results = results_proxy.fetchmany(_batch_selection_size)
@@ -9,7 +9,7 @@ from werkzeug.security import generate_password_hash
 from app.main import db
 from app.main.config import Config
 from app.main.exceptions import DefaultException
-from app.main.model import Database, User
+from app.main.model import Database, Job, User
 from app.main.service import token_generate
 from app.main.service.email_service import send_email_activation
 
@@ -83,6 +83,7 @@ def delete_user(user_id: int, current_user: User) -> None:
 
     _verify_user_relationship(user_id=user_id)
 
+    Job.query.filter_by(user_id=user_id).delete()
     db.session.delete(user)
     db.session.commit()
 
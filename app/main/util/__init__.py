@@ -7,6 +7,7 @@ from .auth_dto import *
 from .database_dto import *
 from .default_responses_dto import *
 from .encryption_dto import *
+from .job_dto import *
 from .password_dto import *
 from .sql_log_dto import *
 from .table_dto import *
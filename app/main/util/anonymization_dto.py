@@ -34,3 +34,39 @@ class AnonymizationDTO:
     anonymization_progress = api.model(
         "anonymization_progress", anonymization_progress_value
     )
+
+    anonymization_preview_row = api.model(
+        "anonymization_preview_row",
+        {
+            "before": fields.Raw(description="row before anonymization"),
+            "after": fields.Raw(description="row after anonymization"),
+        },
+    )
+
+    anonymization_preview_anonymizer = api.model(
+        "anonymization_preview_anonymizer",
+        {
+            "anonymization_type": fields.String(
+                description="anonymization type name", example="cpf_anonymizer"
+            ),
+            "columns": fields.List(
+                fields.String(description="column name"),
+                description="anonymized columns",
+            ),
+            "seconds": fields.Float(description="anonymizer time on sample"),
+        },
+    )
+
+    anonymization_preview = api.model(
+        "anonymization_preview",
+        {
+            "sample_type": fields.String(description="sample type", example="random"),
+            "primary_key_name": fields.String(description="primary key column name"),
+            "last_primary_key": fields.Raw(
+                description="primary key of last row, to start next keyset sample"
+            ),
+            "seconds": fields.Float(description="anonymization time on sample"),
+            "anonymizers": fields.List(fields.Nested(anonymization_preview_anonymizer)),
+            "rows": fields.List(fields.Nested(anonymization_preview_row)),
+        },
+    )
@@ -37,6 +37,14 @@ class DatabaseDTO:
         "password": fields.String(description="database password"),
     }
 
+    database_anonymization_workers = {
+        "anonymization_workers": fields.Integer(
+            description="parallel workers of table anonymization on database",
+            min=1,
+            example=4,
+        ),
+    }
+
     database_post = api.model(
         "database_post",
         database_valid_database_id
@@ -44,7 +52,8 @@ class DatabaseDTO:
         | database_host
         | database_username
         | database_port
-        | database_password,
+        | database_password
+        | database_anonymization_workers,
     )
 
     database_put = api.clone("database_put", database_post)
@@ -57,6 +66,7 @@ class DatabaseDTO:
         | database_username
         | database_port
         | database_password
+        | database_anonymization_workers
         | {
             "user": fields.Nested(
                 api.model(
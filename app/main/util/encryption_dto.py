@@ -27,6 +27,14 @@ class EncryptionDTO:
         "search_value": fields.String(resquired=True, description="search value"),
     }
 
+    encryption_primary_keys = {
+        "primary_keys": fields.List(
+            fields.Raw(description="primary key value"),
+            required=True,
+            description="primary keys of rows to decrypt",
+        ),
+    }
+
     encryption_progress_value = {
         "progress": fields.Integer(
             resquired=True, description="encryption progress value", min=0, max=100
@@ -43,4 +51,9 @@ class EncryptionDTO:
         encryption_search_type | encryption_search_value,
     )
 
+    encryption_decrypt_rows = api.model(
+        "decrypt_rows",
+        encryption_primary_keys,
+    )
+
     encryption_progress = api.model("encryption_progress", encryption_progress_value)
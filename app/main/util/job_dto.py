@@ -0,0 +1,67 @@
+from flask_restx import Namespace, fields
+
+from app.main.model.job_model import STATUS_OPTIONS
+
+
+class JobDTO:
+    api = Namespace("job", description="Job related operations")
+
+    job_id = {"id": fields.Integer(description="job id", example=1)}
+
+    job_database_id = {
+        "database_id": fields.Integer(description="database id", example=1)
+    }
+
+    job_table_id = {"table_id": fields.Integer(description="table id", example=1)}
+
+    job_operation = {
+        "operation": fields.String(description="job operation", example="encrypt_table")
+    }
+
+    job_status = {
+        "status": fields.String(
+            enum=STATUS_OPTIONS, description="job status", example="queued"
+        )
+    }
+
+    job_error = {"error": fields.String(description="job error message")}
+
+    job_dates = {
+        "created_at": fields.DateTime(description="job creation date"),
+        "started_at": fields.DateTime(description="job start date"),
+        "finished_at": fields.DateTime(description="job end date"),
+    }
+
+    job_response = api.model(
+        "job_response",
+        job_id
+        | job_database_id
+        | job_table_id
+        | job_operation
+        | job_status
+        | job_error
+        | job_dates,
+    )
+
+    job_created_response = api.model(
+        "job_created_response",
+        {
+            "message": fields.String(example="job_created"),
+            "job_id": fields.Integer(description="job id", example=1),
+        },
+    )
+
+    job_result_response = api.model(
+        "job_result_response",
+        {"result": fields.Raw(description="job result")},
+    )
+
+    job_list = api.model(
+        "job_list",
+        {
+            "current_page": fields.Integer(),
+            "total_items": fields.Integer(),
+            "total_pages": fields.Integer(),
+            "items": fields.List(fields.Nested(job_response)),
+        },
+    )
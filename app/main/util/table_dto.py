@@ -46,6 +46,12 @@ class TableDTO:
         )
     }
 
+    table_cloud_storage_format = {
+        "cloud_storage_format": fields.String(
+            description="storage format of encrypted cells on cloud table"
+        )
+    }
+
     table_encryption_status = {
         "encryption_status": fields.String(
             required=True, description="table encryption status", min_length=1
@@ -104,7 +110,8 @@ class TableDTO:
         | table_anonymization_progress
         | table_remove_anonymization_progress
         | table_encryption_status
-        | table_anonymization_status,
+        | table_anonymization_status
+        | table_cloud_storage_format,
     )
 
     table_list = api.model(
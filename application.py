@@ -8,8 +8,12 @@ from app.main import create_app, db
 from app.main.model import User
 from app.main.seeders.create_seed import create_seed
 from app.main.service import (
+    create_cloud_line_hash_indexes,
     create_default_anonymization_type,
     create_default_valid_database,
+    fail_interrupted_jobs,
+    rehash_cloud_line_hashes,
+    upgrade_database_schema,
 )
 
 env_name = os.environ.get("ENV_NAME", "dev")
@@ -40,8 +44,7 @@ app.app_context().push()
 def create_db():
     existing_tables = db.engine.table_names()
 
-    if not set(db.Model.metadata.tables.keys()) <= set(existing_tables):
-        db.drop_all()
+    if not set(db.Model.metadata.tables.keys()) & set(existing_tables):
         db.create_all()
         db.session.commit()
 
@@ -51,6 +54,17 @@ def create_db():
         if env_name in ["dev", "staging"]:
             create_seed(env_name=env_name)
 
+    # Existing database is only upgraded, a drop would lose the keys of
+    # its cloud databases
+    else:
+        upgrade_db.callback()
+
+
+@app.cli.command("upgrade_db")
+def upgrade_db():
+    upgrades = upgrade_database_schema()
+    print(f"{len(upgrades)} tables and columns added: {', '.join(upgrades)}")
+
 
 @app.cli.command("reset_db")
 def create_db():
@@ -80,5 +94,20 @@ def seeder_db():
             create_seed(env_name=env_name)
 
 
+@app.cli.command("create_line_hash_indexes")
+def create_line_hash_indexes():
+    created_indexes = create_cloud_line_hash_indexes()
+    print(f"{created_indexes} line hash indexes created")
+
+
+@app.cli.command("rehash_line_hashes")
+def rehash_line_hashes():
+    rehashed_tables = rehash_cloud_line_hashes()
+    print(f"{rehashed_tables} tables rehashed")
+
+
 if __name__ == "__main__":
+    # Jobs of a previous server process are never resumed
+    fail_interrupted_jobs()
+
     app.run(host="0.0.0.0")
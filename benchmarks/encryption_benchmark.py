@@ -0,0 +1,349 @@
+"""
+Throughput benchmark of encryption operations on local SQLite stand-ins.
+
+Client and cloud databases are SQLite files seeded with the layout of
+test_database_seeder, so no MySQL server is needed. Results are printed
+as JSON to compare optimizations run to run:
+
+    python benchmarks/encryption_benchmark.py --rows 10000 --output result.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TABLE_NAME = "clientes"
+OPERATIONS = [
+    "encrypt_database_table",
+    "encrypt_database_row",
+    "decrypt_row",
+    "decrypt_rows",
+    "remove_table_anonymizaiton",
+]
+
+# Sensitive columns of test table, as in anonymization_record_seeder
+ANONYMIZATION_RECORDS = {
+    "cpf_anonymizer": ["cpf"],
+    "date_anonymizer": ["data_de_nascimento"],
+    "email_anonymizer": ["email"],
+    "ip_anonymizer": ["ipv4", "ipv6"],
+    "named_entities_anonymizer": ["nome"],
+    "rg_anonymizer": ["rg"],
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", type=int, default=10000, help="rows of test table")
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=1000,
+        help="rows used by row operations (encrypt_database_row, decrypt_row, decrypt_rows)",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="rows per call of batch operations"
+    )
+    parser.add_argument(
+        "--operations",
+        nargs="+",
+        choices=OPERATIONS,
+        default=OPERATIONS,
+        help="operations to run, always in the listed order",
+    )
+    parser.add_argument("--seed", type=int, default=123, help="seed of fake data")
+    parser.add_argument(
+        "--workdir", default=None, help="directory of SQLite files (default: temp)"
+    )
+    parser.add_argument("--output", default=None, help="JSON file (default: stdout)")
+    return parser.parse_args()
+
+
+def load_application(workdir: str):
+    # Metadata database of the API on the work directory
+    os.environ["ENV_NAME"] = "test"
+    sys.path.insert(0, ROOT_DIR)
+
+    from app.main.config import TestingConfig
+
+    TestingConfig.SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(
+        workdir, "metadata.db"
+    )
+
+    import application
+
+    return application
+
+
+def patch_databases_urls(client_url: str, cloud_url: str) -> None:
+    from sqlalchemy.dialects.sqlite import base as sqlite_base
+    from sqlalchemy.types import String
+
+    from app.main.model import Database
+
+    mock.patch.object(Database, "url", new=property(lambda self: client_url)).start()
+
+    for module_name, module in list(sys.modules.items()):
+        if module_name.startswith("app.main.service") and hasattr(
+            module, "get_cloud_database_url"
+        ):
+            mock.patch.object(
+                module, "get_cloud_database_url", lambda database_id: cloud_url
+            ).start()
+
+    # SQLite DATE only binds date objects, MySQL also takes the date strings
+    # written back by remove_table_anonymizaiton
+    mock.patch.dict(sqlite_base.ischema_names, {"DATE": String}).start()
+
+
+def seed(rows: int, seed_value: int, client_url: str):
+    from sqlalchemy import create_engine
+
+    from app.main import db
+    from app.main.model import (
+        AnonymizationRecord,
+        AnonymizationType,
+        Database,
+        DatabaseKey,
+        Table,
+        User,
+        ValidDatabase,
+    )
+    from app.main.seeders import create_test_table, insert_data
+    from app.main.service import create_default_anonymization_type, generate_keys
+
+    db.drop_all()
+    db.create_all()
+    create_default_anonymization_type()
+
+    user = User(
+        username="benchmark",
+        email="benchmark@example.com",
+        password="benchmark",
+        status="active",
+    )
+    valid_database = ValidDatabase(name="SQLite", dialect="sqlite")
+    database = Database(
+        name="benchmark",
+        host="localhost",
+        username="benchmark",
+        port=0,
+        password="benchmark",
+        valid_database=valid_database,
+        user=user,
+    )
+    db.session.add_all([user, valid_database, database])
+    db.session.flush()
+
+    public_key, private_key = generate_keys()
+    db.session.add(
+        DatabaseKey(
+            database_id=database.id, public_key=public_key, private_key=private_key
+        )
+    )
+
+    table = Table(name=TABLE_NAME, database=database)
+    db.session.add(table)
+    db.session.flush()
+
+    for anonymization_type_name, columns in ANONYMIZATION_RECORDS.items():
+        anonymization_type = AnonymizationType.query.filter_by(
+            name=anonymization_type_name
+        ).first()
+        db.session.add(
+            AnonymizationRecord(
+                table_id=table.id,
+                anonymization_type_id=anonymization_type.id,
+                columns=columns,
+            )
+        )
+
+    db.session.commit()
+
+    # Client database, insert_data adds one row past num_of_rows
+    client_engine = create_engine(client_url)
+    create_test_table(engine_db=client_engine, table_name=TABLE_NAME)
+    insert_data(
+        engine_db=client_engine,
+        table_name=TABLE_NAME,
+        num_of_rows=rows - 1,
+        seed=seed_value,
+    )
+    client_engine.dispose()
+
+    return user, database, table
+
+
+def cumulative_peak_rss_mb() -> float:
+    # High water mark since the benchmark started, of this process plus its
+    # largest finished worker. It never goes down, so it is the peak of an
+    # operation and every operation run before it.
+    peak_rss = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+
+    # Bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return round(peak_rss / 1024**2, 1)
+
+    return round(peak_rss / 1024, 1)
+
+
+def measure(operation: str, calls: list, rows_per_call: list[int]) -> dict:
+    latencies = []
+
+    started = time.perf_counter()
+    for call, call_rows in zip(calls, rows_per_call):
+        call_started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - call_started) / call_rows)
+    seconds = time.perf_counter() - started
+
+    rows = sum(rows_per_call)
+    latencies_ms = np.array(latencies) * 1000
+
+    return {
+        "operation": operation,
+        "calls": len(calls),
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "row_latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 4),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 4),
+        },
+        "cumulative_peak_rss_mb": cumulative_peak_rss_mb(),
+    }
+
+
+def chunks(items: list, size: int) -> list[list]:
+    return [items[index : index + size] for index in range(0, len(items), size)]
+
+
+def run_benchmark(args: argparse.Namespace, user, database, table) -> list[dict]:
+    from app.main.service import (
+        decrypt_row,
+        decrypt_rows,
+        encrypt_database_row,
+        encrypt_database_table,
+        remove_table_anonymizaiton,
+    )
+
+    sample = list(range(1, min(args.sample, args.rows) + 1))
+    results = []
+
+    # Other operations read the cloud table
+    if not "encrypt_database_table" in args.operations:
+        encrypt_database_table(
+            database_id=database.id, table_id=table.id, current_user=user
+        )
+
+    for operation in args.operations:
+        if operation == "encrypt_database_table":
+            calls = [
+                lambda: encrypt_database_table(
+                    database_id=database.id, table_id=table.id, current_user=user
+                )
+            ]
+            rows_per_call = [args.rows]
+
+        elif operation == "encrypt_database_row":
+            rows_to_encrypt = decrypt_rows(
+                database_id=database.id, table_id=table.id, primary_keys=sample
+            )
+            calls = [
+                lambda batch=batch: encrypt_database_row(
+                    database_id=database.id,
+                    table_id=table.id,
+                    data={"rows_to_encrypt": batch, "update_database": True},
+                    current_user=user,
+                )
+                for batch in chunks(rows_to_encrypt, args.batch_size)
+            ]
+            rows_per_call = [len(batch) for batch in chunks(sample, args.batch_size)]
+
+        elif operation == "decrypt_row":
+            calls = [
+                lambda primary_key=primary_key: decrypt_row(
+                    database_id=database.id,
+                    table_id=table.id,
+                    data={"search_type": "primary_key", "search_value": primary_key},
+                )
+                for primary_key in sample
+            ]
+            rows_per_call = [1] * len(sample)
+
+        elif operation == "decrypt_rows":
+            calls = [
+                lambda batch=batch: decrypt_rows(
+                    database_id=database.id, table_id=table.id, primary_keys=batch
+                )
+                for batch in chunks(sample, args.batch_size)
+            ]
+            rows_per_call = [len(batch) for batch in chunks(sample, args.batch_size)]
+
+        else:
+            calls = [
+                lambda: remove_table_anonymizaiton(
+                    database_id=database.id, table_id=table.id, current_user=user
+                )
+            ]
+            rows_per_call = [args.rows]
+
+        results.append(measure(operation, calls, rows_per_call))
+
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="syspad_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+
+    client_url = "sqlite:///" + os.path.join(workdir, "client.db")
+    cloud_url = "sqlite:///" + os.path.join(workdir, "cloud.db")
+
+    for file_name in ["metadata.db", "client.db", "cloud.db"]:
+        if os.path.exists(os.path.join(workdir, file_name)):
+            os.remove(os.path.join(workdir, file_name))
+
+    load_application(workdir=workdir)
+    patch_databases_urls(client_url=client_url, cloud_url=cloud_url)
+
+    from app.main.config import app_config
+
+    user, database, table = seed(
+        rows=args.rows, seed_value=args.seed, client_url=client_url
+    )
+
+    report = {
+        "rows": args.rows,
+        "sample": args.sample,
+        "batch_size": args.batch_size,
+        "cell_encryption_mode": app_config.CELL_ENCRYPTION_MODE,
+        "encryption_workers": app_config.ENCRYPTION_WORKERS,
+        "encryption_batch_size": app_config.ENCRYPTION_BATCH_SIZE,
+        "results": run_benchmark(args=args, user=user, database=database, table=table),
+    }
+
+    output = json.dumps(report, indent=4)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()